@@ -79,8 +79,25 @@ PACKAGE_KEYS = [
 
 # Name of the hosted file describing the contents of the repository
 CONTENTS_FILENAME = 'Contents-%(arch)s.gz'
-PACKAGES_FILENAME = 'Packages.gz'
-SOURCES_FILENAME = 'Sources.gz'
+PACKAGES_FILENAME = 'Packages'
+SOURCES_FILENAME = 'Sources'
+RELEASE_FILENAME = 'Release'
+RELEASE_SIGNATURE_FILENAME = 'Release.gpg'
+INRELEASE_FILENAME = 'InRelease'
+
+# Extensions of the compressed variants an index may be available as; the
+# empty extension is the uncompressed index
+COMPRESSION_GZ = '.gz'
+COMPRESSION_BZ2 = '.bz2'
+COMPRESSION_XZ = '.xz'
+COMPRESSION_NONE = ''
+
+# Compression used when the Release file doesn't tell which are available
+DEFAULT_COMPRESSION = COMPRESSION_GZ
+
+# Compressed variants published next to every uncompressed index; those this
+# Python can't write are left out
+PUBLISH_COMPRESSIONS = (COMPRESSION_GZ, COMPRESSION_XZ)
 
 # -- progress states ----------------------------------------------------------
 
@@ -96,11 +113,35 @@ CONFIG_REPO = [CONFIG_URL, CONFIG_DIST, CONFIG_COMPONENT, CONFIG_ARCH]
 
 URL_BASE = '%(url)s/dists/%(dist)s'
 URL_COMPONENT_BASE = URL_BASE + '/%(component)s'
-URLS = {
-    'packages': URL_COMPONENT_BASE + '/binary-%(arch)s/' + PACKAGES_FILENAME,
-    'sources': URL_COMPONENT_BASE + '/source/' + SOURCES_FILENAME
+RELEASE_URL = URL_BASE + '/' + RELEASE_FILENAME
+
+# Location of the uncompressed indexes relative to the dist, as they are
+# listed in the Release file
+INDEX_PATHS = {
+    'packages': '%(component)s/binary-%(arch)s/' + PACKAGES_FILENAME,
+    'sources': '%(component)s/source/' + SOURCES_FILENAME
 }
 
+# Location of the uncompressed Contents index of a component and architecture
+# relative to the dist; only its CONTENTS_FILENAME variant is published
+CONTENTS_PATH = '%(component)s/Contents-%(arch)s'
+
+# Location of the Contents index of all components of the dist, as older
+# archives publish it
+DIST_CONTENTS_PATH = 'Contents-%(arch)s'
+
+# Prefix of the locations of the description translations of a component,
+# followed by the language, e.g. main/i18n/Translation-en
+TRANSLATION_PREFIX = '%(component)s/i18n/Translation-'
+
+# Indexes that are synced and published as they are instead of being parsed
+# into units; they are only fetched if the Release file lists them
+EXTRA_INDEX_TYPES = ('contents', 'translation')
+
+# Key of the scratchpad of a repository holding the extra indexes of the last
+# sync, which the distributor publishes
+SCRATCHPAD_EXTRA_INDEXES = 'extra_indexes'
+
 DEB_FILENAME = 'pool/%(component)s/%(prefix)s/%(source_name)s/%(name)s'
 
 # Key template for a package
@@ -115,11 +156,158 @@ CONFIG_QUERIES = 'queries'
 CONFIG_REMOVE_MISSING = 'remove_missing'
 DEFAULT_REMOVE_MISSING = False
 
+# Number of versions of each package (per architecture) to keep from the feed;
+# older versions are dropped before anything is downloaded. 0 keeps them all.
+CONFIG_RETAIN_VERSIONS = 'retain_versions'
+DEFAULT_RETAIN_VERSIONS = 0
+
+# Maximum size in bytes of the cache of parsed indexes kept in the importer's
+# working directory. Unchanged indexes are loaded from it instead of being
+# parsed again. 0 disables the cache.
+CONFIG_INDEX_CACHE_SIZE = 'index_cache_size'
+DEFAULT_INDEX_CACHE_SIZE = 128 * 1024 * 1024
+
+# Number of processes indexes that aren't cached are parsed in; 0 starts one
+# per CPU and 1 parses them one after another in the sync process
+CONFIG_PARSE_WORKERS = 'parse_workers'
+DEFAULT_PARSE_WORKERS = 1
+
+# Number of downloads over HTTP run at once, each over its own connection; 1
+# downloads one file after another over a single connection
+CONFIG_MAX_DOWNLOADS = 'max_downloads'
+DEFAULT_MAX_DOWNLOADS = 1
+
+# How files of a local (file://) feed are put in Pulp's storage. 'auto' clones
+# them where the file system supports it, hardlinks them where it doesn't
+# and copies them otherwise; 'reflink' never shares a file with the feed and
+# 'copy' always copies.
+CONFIG_LOCAL_PLACEMENT = 'local_placement'
+PLACEMENT_AUTO = 'auto'
+PLACEMENT_REFLINK = 'reflink'
+PLACEMENT_COPY = 'copy'
+PLACEMENTS = (PLACEMENT_AUTO, PLACEMENT_REFLINK, PLACEMENT_COPY)
+DEFAULT_LOCAL_PLACEMENT = PLACEMENT_AUTO
+
+# Number of threads the files of a local (file://) feed are read, verified
+# and placed in; 1 ingests them one after another
+CONFIG_LOCAL_WORKERS = 'local_workers'
+DEFAULT_LOCAL_WORKERS = 1
+
+# Most bytes of files of a local feed being ingested at once by those threads
+CONFIG_LOCAL_INFLIGHT_BYTES = 'local_inflight_bytes'
+DEFAULT_LOCAL_INFLIGHT_BYTES = 256 * 1024 * 1024
+
+# Number of processes the packages of an uploaded bundle are read in; 0
+# starts one per CPU and 1 reads them one after another in the Pulp process
+CONFIG_UPLOAD_WORKERS = 'upload_workers'
+DEFAULT_UPLOAD_WORKERS = 1
+
+# Where the timings and counters of syncs are sent as they are recorded, a
+# statsd daemon (statsd://host[:port]) or a local file (file:///path); they
+# are only included in the sync report if not set
+CONFIG_METRICS_SINK = 'metrics_sink'
+
+# Whether syncs are run under cProfile. The stats are written to the working
+# directory of the repository and the functions taking the most time are
+# listed in the sync report.
+CONFIG_PROFILE_SYNC = 'profile_sync'
+DEFAULT_PROFILE_SYNC = False
+
+# Number of functions listed in the report of a profiled sync
+CONFIG_PROFILE_HOTSPOTS = 'profile_hotspots'
+DEFAULT_PROFILE_HOTSPOTS = 25
+
+# Which of EXTRA_INDEX_TYPES to sync along with the Packages and Sources
+# indexes
+CONFIG_EXTRA_INDEXES = 'extra_indexes'
+DEFAULT_EXTRA_INDEXES = EXTRA_INDEX_TYPES
+
+# Which of the compressed variants of an index listed in the Release file to
+# download. 'bandwidth' takes the smallest one, 'cpu' the one cheapest to
+# decompress. Compressions this Python can't read are skipped.
+CONFIG_INDEX_COMPRESSION = 'index_compression'
+COMPRESSION_PREFERENCES = {
+    'bandwidth': (COMPRESSION_XZ, COMPRESSION_BZ2, COMPRESSION_GZ, COMPRESSION_NONE),
+    'cpu': (COMPRESSION_NONE, COMPRESSION_GZ, COMPRESSION_BZ2, COMPRESSION_XZ),
+}
+DEFAULT_INDEX_COMPRESSION = 'bandwidth'
+
 # -- distributor configuration keys -------------------------------------------
 
-# Controls if packages will be served insecurely or not
-CONFIG_SERVE_INSECURE = 'serve_https'
-DEFAULT_SERVE_INSECURE = True
+# Controls if the repository will be served over HTTP
+CONFIG_SERVE_HTTP = 'serve_http'
+DEFAULT_SERVE_HTTP = True
+
+# Controls if the repository will be served over HTTPS
+CONFIG_SERVE_HTTPS = 'serve_https'
+DEFAULT_SERVE_HTTPS = False
+
+# Name the client extension uses for CONFIG_SERVE_HTTPS
+CONFIG_SERVE_INSECURE = CONFIG_SERVE_HTTPS
+DEFAULT_SERVE_INSECURE = DEFAULT_SERVE_HTTPS
+
+# Name of the distribution the repository is published as, i.e. the
+# directory under dists/ clients point their sources.list entries at
+CONFIG_PUBLISH_DIST = 'publish_dist'
+DEFAULT_PUBLISH_DIST = 'stable'
+
+# Component packages whose pool location doesn't name one are published in
+DEFAULT_PUBLISH_COMPONENT = 'main'
+
+# Whether to keep the indexes of the previous publish and only write those
+# again whose packages changed
+CONFIG_INCREMENTAL_PUBLISH = 'incremental_publish'
+DEFAULT_INCREMENTAL_PUBLISH = False
+
+# How packages are linked into the pool of a published repository. Hardlinks
+# keep working if Pulp's storage is moved but need the working directory to
+# be on the same file system; otherwise symlinks are used.
+CONFIG_POOL_LINK = 'pool_link'
+POOL_LINK_SYMLINK = 'symlink'
+POOL_LINK_HARDLINK = 'hardlink'
+POOL_LINKS = (POOL_LINK_SYMLINK, POOL_LINK_HARDLINK)
+DEFAULT_POOL_LINK = POOL_LINK_SYMLINK
+
+# Whether to also publish every index under by-hash/SHA256/<digest> and
+# announce it with Acquire-By-Hash in the Release file
+CONFIG_BY_HASH = 'by_hash'
+DEFAULT_BY_HASH = True
+
+# The by-hash indexes of previous publishes are kept for this many publishes,
+# or for this many seconds after they were replaced, whichever is longer
+CONFIG_BY_HASH_GENERATIONS = 'by_hash_generations'
+DEFAULT_BY_HASH_GENERATIONS = 3
+CONFIG_BY_HASH_GRACE = 'by_hash_grace'
+DEFAULT_BY_HASH_GRACE = 24 * 60 * 60
+
+# Number of processes the indexes are compressed in; 0 starts one per CPU and
+# 1 compresses them one after another in the publish process
+CONFIG_COMPRESS_WORKERS = 'compress_workers'
+DEFAULT_COMPRESS_WORKERS = 1
+
+# Whether to generate a Contents-<arch>.gz index of the files in the packages
+# of every component and architecture
+CONFIG_GENERATE_CONTENTS = 'generate_contents'
+DEFAULT_GENERATE_CONTENTS = False
+
+# Number of processes the file lists of the packages are read in; 0 starts
+# one per CPU and 1 reads them one after another in the publish process
+CONFIG_CONTENTS_WORKERS = 'contents_workers'
+DEFAULT_CONTENTS_WORKERS = 1
+
+# Maximum size in bytes of the cache of package file lists kept in the
+# distributor's working directory, keyed by the SHA256 of the package. Only
+# packages missing from it are read. 0 disables the cache.
+CONFIG_CONTENTS_CACHE_SIZE = 'contents_cache_size'
+DEFAULT_CONTENTS_CACHE_SIZE = 256 * 1024 * 1024
+
+# ID or fingerprint of the GPG key to sign the Release file with, writing
+# Release.gpg and InRelease next to it; unsigned if not set
+CONFIG_GPG_KEY = 'gpg_key'
+
+# GnuPG home directory holding the signing key; the one of the user Pulp
+# runs as if not set
+CONFIG_GPG_HOME = 'gpg_home'
 
 # Local directory the web server will serve for HTTP repositories
 CONFIG_HTTP_DIR = 'http_dir'
@@ -0,0 +1,295 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright © 2013 Bouvet ASA
+#
+# This software is licensed to you under the GNU General Public
+# License as published by the Free Software Foundation; either version
+# 2 of the License (GPLv2) or (at your option) any later version.
+# There is NO WARRANTY for this software, express or implied,
+# including the implied warranties of MERCHANTABILITY,
+# NON-INFRINGEMENT, or FITNESS FOR A PARTICULAR PURPOSE. You should
+# have received a copy of GPLv2 along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+
+"""
+Reads the members of .deb files without unpacking them to disk.
+
+A .deb is an ar archive holding debian-binary, a control tarball and a data
+tarball. The archive is read front to back without seeking and the tarballs
+are streamed straight out of it, so only the members that are asked for are
+decompressed and the checksums of the whole file can be computed in the same
+read.
+"""
+
+import bz2
+import hashlib
+import os
+import tarfile
+import zlib
+
+from pulp_deb.common import constants, utils
+
+
+# -- constants ----------------------------------------------------------------
+
+AR_MAGIC = '!<arch>\n'
+
+AR_HEADER_SIZE = 60
+
+# Size of the chunks members are decompressed in
+CHUNK_SIZE = 64 * 1024
+
+CONTROL_PREFIX = 'control.tar'
+DATA_PREFIX = 'data.tar'
+
+# Name of the file holding the package fields in the control tarball
+CONTROL_FILENAME = 'control'
+
+# Checksums computed by inspect(), keyed by the name of their index field
+CHECKSUMS = (('md5sum', 'md5'), ('sha1', 'sha1'), ('sha256', 'sha256'))
+
+
+# -- exceptions ---------------------------------------------------------------
+
+class InvalidDebFile(ValueError):
+    pass
+
+
+# -- public -------------------------------------------------------------------
+
+def iter_members(fileobj):
+    """
+    Iterates over the members of an ar archive, reading it sequentially.
+
+    The file objects yielded only read the member they belong to and are only
+    valid until the iteration moves on; whatever is left of the member is
+    read past then.
+
+    :param fileobj: archive opened for reading in binary mode; it doesn't
+                    have to support seeking
+    :type  fileobj: file
+
+    :return: iterator of (name, file object) pairs
+    :rtype:  iterator
+
+    :raise InvalidDebFile: if the file is not an ar archive
+    """
+    if fileobj.read(len(AR_MAGIC)) != AR_MAGIC:
+        raise InvalidDebFile('not an ar archive')
+
+    while True:
+        header = fileobj.read(AR_HEADER_SIZE)
+        if not header:
+            return
+        if len(header) < AR_HEADER_SIZE or header[58:60] != '`\n':
+            raise InvalidDebFile('truncated or corrupt ar member header')
+
+        # GNU ar terminates names with a slash
+        name = header[0:16].rstrip(' ').rstrip('/')
+        try:
+            size = int(header[48:58])
+        except ValueError:
+            raise InvalidDebFile('invalid size of ar member %s' % name)
+
+        member = MemberFile(fileobj, size)
+        yield name, member
+
+        # Members are aligned to even offsets
+        member.skip()
+        if size % 2:
+            fileobj.read(1)
+
+
+def open_member(member, name):
+    """
+    Opens a tarball member of a .deb for streaming reads, decompressing it as
+    its name says.
+
+    :param member: file object of the member, see iter_members()
+    :param name: name of the member, e.g. data.tar.xz
+    :type  name: str
+
+    :return: the tarball opened for streaming
+    :rtype:  tarfile.TarFile
+
+    :raise InvalidDebFile: if the compression isn't supported
+    """
+    extension = os.path.splitext(name)[1]
+    if extension == '.tar':
+        stream = member
+    elif extension == constants.COMPRESSION_GZ:
+        # 32 + window size makes zlib read the gzip header
+        stream = DecompressingFile(member, zlib.decompressobj(32 + zlib.MAX_WBITS))
+    elif extension == constants.COMPRESSION_BZ2:
+        stream = DecompressingFile(member, bz2.BZ2Decompressor())
+    elif extension == constants.COMPRESSION_XZ and utils.lzma is not None:
+        stream = DecompressingFile(member, utils.lzma.LZMADecompressor())
+    else:
+        raise InvalidDebFile('unsupported compression of %s' % name)
+    return tarfile.open(fileobj=stream, mode='r|')
+
+
+def file_list(path):
+    """
+    Lists the files a .deb installs, as they are listed in Contents indexes:
+    without the leading ./ and without directories.
+
+    :param path: path of the .deb
+    :type  path: str
+
+    :return: paths of the files and symlinks in the data tarball
+    :rtype:  list
+
+    :raise InvalidDebFile: if the .deb can't be read
+    """
+    fileobj = open(path, 'rb')
+    try:
+        for name, member in iter_members(fileobj):
+            if not name.startswith(DATA_PREFIX):
+                continue
+            tar = open_member(member, name)
+            try:
+                return [_normalize(i.name) for i in tar if not i.isdir()]
+            except (tarfile.TarError, IOError, EOFError, zlib.error), e:
+                raise InvalidDebFile('corrupt data tarball: %s' % e)
+        raise InvalidDebFile('no data tarball')
+    finally:
+        fileobj.close()
+
+
+def inspect(path):
+    """
+    Reads the control file of a .deb and computes the checksums of the whole
+    file in a single read of it. Only the control tarball is decompressed.
+
+    :param path: path of the .deb
+    :type  path: str
+
+    :return: the content of the control file, and the size and checksums of
+             the .deb keyed by their index field names (size, md5sum, sha1,
+             sha256)
+    :rtype:  tuple of (str, dict)
+
+    :raise InvalidDebFile: if the .deb can't be read or has no control file
+    """
+    fileobj = HashingReader(open(path, 'rb'))
+    try:
+        control = None
+        for name, member in iter_members(fileobj):
+            if control is None and name.startswith(CONTROL_PREFIX):
+                control = _read_control(member, name)
+
+        # Anything trailing the last member counts towards the checksums
+        while fileobj.read(CHUNK_SIZE):
+            pass
+    finally:
+        fileobj.close()
+
+    if control is None:
+        raise InvalidDebFile('no control file')
+    return control, fileobj.checksums()
+
+
+# -- public classes -----------------------------------------------------------
+
+class MemberFile(object):
+    """
+    Reads the content of one ar member from the current position of the
+    archive.
+    """
+
+    def __init__(self, fileobj, size):
+        self.fileobj = fileobj
+        self.size = size
+        self.position = 0
+
+    def read(self, size=-1):
+        remaining = self.size - self.position
+        if size < 0 or size > remaining:
+            size = remaining
+        if size == 0:
+            return ''
+        data = self.fileobj.read(size)
+        if len(data) < size:
+            raise InvalidDebFile('truncated ar member')
+        self.position += len(data)
+        return data
+
+    def skip(self):
+        """
+        Reads past the rest of the member.
+        """
+        while self.read(CHUNK_SIZE):
+            pass
+
+
+class HashingReader(object):
+    """
+    Reads from a file while keeping its size and checksums.
+    """
+
+    def __init__(self, fileobj):
+        self.fileobj = fileobj
+        self.size = 0
+        self._hashes = [(f, hashlib.new(a)) for f, a in CHECKSUMS]
+
+    def read(self, size=-1):
+        data = self.fileobj.read(size)
+        self.size += len(data)
+        for field, h in self._hashes:
+            h.update(data)
+        return data
+
+    def close(self):
+        self.fileobj.close()
+
+    def checksums(self):
+        checksums = dict([(f, h.hexdigest()) for f, h in self._hashes])
+        checksums['size'] = self.size
+        return checksums
+
+
+class DecompressingFile(object):
+    """
+    Reads a compressed stream through a decompressor object, such as
+    bz2.BZ2Decompressor.
+    """
+
+    def __init__(self, fileobj, decompressor):
+        self.fileobj = fileobj
+        self.decompressor = decompressor
+        self.buffer = ''
+        self.position = 0
+
+    def read(self, size=-1):
+        while size < 0 or len(self.buffer) - self.position < size:
+            data = self.fileobj.read(CHUNK_SIZE)
+            if not data:
+                break
+            self.buffer = self.buffer[self.position:] + self.decompressor.decompress(data)
+            self.position = 0
+
+        if size < 0:
+            size = len(self.buffer) - self.position
+        data = self.buffer[self.position:self.position + size]
+        self.position += len(data)
+        return data
+
+
+# -- private ------------------------------------------------------------------
+
+def _read_control(member, name):
+    tar = open_member(member, name)
+    try:
+        for info in tar:
+            if _normalize(info.name) == CONTROL_FILENAME and info.isfile():
+                return tar.extractfile(info).read()
+    except (tarfile.TarError, IOError, EOFError, zlib.error), e:
+        raise InvalidDebFile('corrupt control tarball: %s' % e)
+    raise InvalidDebFile('no control file in %s' % name)
+
+
+def _normalize(name):
+    if name.startswith('./'):
+        name = name[2:]
+    return name.lstrip('/')
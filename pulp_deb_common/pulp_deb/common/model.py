@@ -1,5 +1,13 @@
 import copy
-from debian.deb822 import Packages, Sources
+import heapq
+import itertools
+import marshal
+import mmap
+import multiprocessing
+import os
+import re
+from debian.deb822 import Packages, Release, Sources
+from debian.debian_support import Version
 
 from pulp.common.compat import json
 from pulp_deb.common import constants, utils
@@ -16,12 +24,23 @@ SUPPORTED = {
 KEY_TO_NAME = [('source', 'Packages'), ('binary', 'Sources')]
 
 
+# Lines that are empty or only whitespace, which end a paragraph
+PARAGRAPH_SEPARATOR = re.compile(r'\n(?:[ \t\r]*\n)+')
+
+# A field: its name, the rest of its first line with trailing whitespace
+# left out, and any continuation lines as they are. Comment lines aren't
+# matched, so they're skipped.
+FIELD = re.compile(r'^([^:\s#][^:\s]*)[ \t]*:[ \t]*((?:[^\n]*\S)?)[ \t\r]*'
+                   r'((?:\n[ \t]+\S[^\n]*)*)$', re.M)
+
+
 def get_deb822_cls(obj):
     """
     Get the deb822 class to use based on obj
     """
     if isinstance(obj, basestring):
-        key = obj.split('/')[-1][:-len('.gz')]
+        # NOTE: Strip any compression extension
+        key = os.path.basename(obj).split('.')[0]
     elif isinstance(obj, dict):
         # NOTE: Support a resource object
         if 'type' in obj:
@@ -61,6 +80,238 @@ def _iter_paragraphs_path(obj, empty_on_io=False):
     return type_cls.iter_paragraphs(content)
 
 
+def parse_index(obj, empty_on_io=False, timings=None):
+    """
+    Parse an index into compact records
+
+    A record is a plain dict of each field in a paragraph to its value as
+    written in the index, which is cheap to store and load again. Use
+    record_key() to identify it and the deb822 class of the index to turn it
+    back into a paragraph.
+
+    Uncompressed index files are mapped into memory and scanned with
+    scan_records() rather than read into lines for the deb822 classes.
+
+    :param obj: Index as a path, a resource or already read content
+    :type obj: str, dict or list
+
+    :param timings: If given, the seconds spent reading and decompressing
+                    ('decompress') and parsing ('parse') the index, and the
+                    size of its content ('bytes') are set in it
+    :type timings: dict
+
+    :return: One record per paragraph
+    :rtype: list
+    """
+    start = utils.monotonic()
+    mapping = _map_index(obj)
+    if mapping is not None:
+        read = utils.monotonic()
+        try:
+            records = scan_records(mapping)
+            size = len(mapping)
+        finally:
+            mapping.close()
+    else:
+        content = get_index_content(obj, empty_on_io=empty_on_io)
+        read = utils.monotonic()
+
+        paragraphs = get_deb822_cls(obj).iter_paragraphs(content)
+        records = [dict([(k, p.get_as_string(k)) for k in p]) for p in paragraphs]
+        size = sum([len(line) for line in content])
+
+    if timings is not None:
+        timings['decompress'] = read - start
+        timings['parse'] = utils.monotonic() - read
+        timings['bytes'] = size
+    return records
+
+
+def scan_records(content):
+    """
+    Scan the content of an index into records, see parse_index()
+
+    Paragraphs are found by searching the content for blank lines and their
+    fields are matched within it in place, so the only strings made are the
+    names and values of the fields. This is what parse_index() does with
+    uncompressed index files, mapped into memory rather than read.
+
+    :param content: The index as written
+    :type content: str or mmap.mmap
+
+    :return: One record per paragraph, with the values as the deb822
+             classes give them
+    :rtype: list
+    """
+    records = []
+    start = 0
+    end = len(content)
+    separators = PARAGRAPH_SEPARATOR.finditer(content)
+    while start < end:
+        separator = next(separators, None)
+        stop = separator.start() if separator is not None else end
+
+        record = {}
+        for field in FIELD.finditer(content, start, stop):
+            name, value, continuation = field.groups()
+            record[name] = _decode(value + continuation)
+        if record:
+            records.append(record)
+
+        start = separator.end() if separator is not None else end
+    return records
+
+
+def parse_indexes(resources, workers=1, timings=None):
+    """
+    Parse several indexes into records
+
+    With more than one worker the indexes are parsed concurrently in a pool
+    of processes; the records are sent back marshalled as that's much faster
+    to load in the parent than pickle.
+
+    :param resources: Indexes, see parse_index()
+    :type resources: list
+
+    :param workers: Number of processes to parse in
+    :type workers: int
+
+    :param timings: If given, the timings of each index are appended to it,
+                    see parse_index()
+    :type timings: list
+
+    :return: The records of each index, in the order of resources
+    :rtype: list
+    """
+    workers = min(workers, len(resources))
+    if workers <= 1:
+        parsed = []
+        for r in resources:
+            index_timings = {}
+            parsed.append(parse_index(r, timings=index_timings))
+            if timings is not None:
+                timings.append(index_timings)
+        return parsed
+
+    pool = multiprocessing.Pool(workers)
+    try:
+        try:
+            parsed = pool.map(_parse_index_marshalled, resources, chunksize=1)
+            pool.close()
+        except:
+            pool.terminate()
+            raise
+    finally:
+        pool.join()
+
+    records = []
+    for p in parsed:
+        index_records, index_timings = marshal.loads(p)
+        records.append(index_records)
+        if timings is not None:
+            timings.append(index_timings)
+    return records
+
+
+def _map_index(obj):
+    """
+    Map an index into memory if it's an uncompressed file with content
+
+    :param obj: Index as a path, a resource or already read content
+    :type obj: str, dict or list
+
+    :return: The mapping or None if the index has to be read
+    :rtype: mmap.mmap
+    """
+    if isinstance(obj, basestring):
+        path = obj
+    elif isinstance(obj, dict) and 'content' not in obj and 'path' in obj:
+        path = obj['path']
+    else:
+        return None
+    if os.path.splitext(path)[1] != constants.COMPRESSION_NONE:
+        return None
+
+    try:
+        fh = open(path, 'rb')
+    except IOError:
+        return None
+    try:
+        # Empty files can't be mapped
+        if not os.fstat(fh.fileno()).st_size:
+            return None
+        return mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+    finally:
+        fh.close()
+
+
+def _decode(value):
+    """
+    Decode a value of an index as the deb822 classes do, as UTF-8 unless it
+    isn't valid UTF-8
+    """
+    try:
+        return value.decode('utf-8')
+    except UnicodeDecodeError:
+        return value.decode('latin-1')
+
+
+def _parse_index_marshalled(resource):
+    timings = {}
+    records = parse_index(resource, timings=timings)
+    return marshal.dumps((records, timings))
+
+
+def record_key(record):
+    """
+    Get what identifies a record within an index
+    """
+    return (record.get('Package'), record.get('Version'),
+            record.get('Architecture'))
+
+
+def diff_records(old, new):
+    """
+    Compare two versions of the records of an index
+
+    :return: Keys of records added and removed, see record_key()
+    :rtype: tuple
+    """
+    old_keys = set([record_key(r) for r in old])
+    new_keys = set([record_key(r) for r in new])
+    return new_keys - old_keys, old_keys - new_keys
+
+
+def latest_packages(packages, count):
+    """
+    Keep only the newest versions of each package
+
+    Packages are grouped by (name, architecture) in a single pass and the
+    count highest versions of each group, by Debian version ordering, are
+    kept. Groups that are already small enough are passed through untouched.
+
+    :param packages: Packages to filter
+    :type packages: list
+
+    :param count: Number of versions to keep per (name, architecture)
+    :type count: int
+
+    :return: The retained packages
+    :rtype: list
+    """
+    groups = {}
+    for pkg in packages:
+        groups.setdefault((pkg.name, pkg.architecture), []).append(pkg)
+
+    latest = []
+    for group in groups.values():
+        if len(group) > count:
+            group = heapq.nlargest(count, group,
+                                   key=lambda p: Version(p['version']))
+        latest.extend(group)
+    return latest
+
+
 class Model(object):
     def __init__(self, **kw):
         self.data = kw
@@ -167,25 +418,118 @@ class Distribution(Model):
     A distribution - typically in pulp sense a repo
     """
     def __init__(self, **kw):
+        # Packages of all components in the order they were added, and by
+        # key and by name; kept up to date as components add packages
+        self._packages = []
+        self._packages_by_key = {}
+        self._packages_by_name = {}
+
         components = list()
+        self._components_by_name = {}
         for values in kw.get('components', {}):
+            if values['name'] in self._components_by_name:
+                raise ValueError('Multiple components with the same name is not allowed')
             cmpt = Component(
                 dist=self,
                 **values)
-            if values['name'] in components:
-                raise ValueError('Multiple components with the same name is now allowed')
             components.append(cmpt)
+            self._components_by_name[values['name']] = cmpt
         kw['components'] = components
         super(Distribution, self).__init__(**kw)
+        # Files listed in the Release file, see update_from_release()
+        self.release_files = None
+
+    def get_release_resource(self):
+        """
+        Get the resource of the Release file of this Distribution
+
+        :return: Resource dict
+        :rtype: dict
+        """
+        data = self.get_resource_data(type='release')
+        data['url'] = constants.RELEASE_URL % data
+        return data
+
+    def update_from_release(self, data):
+        """
+        Update the list of files available in this Distribution from it's
+        Release file
+
+        :param data: The Release file as a path, a resource or read content
+        :type data: str, dict or list
+        """
+        release = Release(get_index_content(data))
+
+        files = {}
+        for field in ('md5sum', 'sha1', 'sha256'):
+            for entry in release.get(field) or []:
+                info = files.setdefault(entry['name'], {'size': int(entry['size'])})
+                info[field] = entry[field]
+        self.release_files = files
+
+    def get_compression(self, path, preference=None):
+        """
+        Pick which compressed variant of an index to use
 
-    def update_from_resources(self, resources):
+        :param path: Path of the uncompressed index relative to the dist
+        :type path: str
+
+        :param preference: Extensions in order of preference, see
+                           constants.COMPRESSION_PREFERENCES
+        :type preference: list
+
+        :return: Extension of the variant to use, '' for uncompressed
+        :rtype: str
+        """
+        if not self.release_files:
+            return constants.DEFAULT_COMPRESSION
+
+        preference = preference or constants.COMPRESSION_PREFERENCES[
+            constants.DEFAULT_INDEX_COMPRESSION]
+        for extension in preference:
+            if path + extension in self.release_files and \
+                    utils.supported_compression(extension):
+                return extension
+        return constants.DEFAULT_COMPRESSION
+
+    def update_from_resources(self, resources, predicate=None, workers=1):
         """
         Update each component in this Distribution from it's own indexes
+
+        :param predicate: Only paragraphs for which this returns True are
+                          added, see pulp_deb.common.query
+        :type predicate: callable
+
+        :param workers: Number of processes to parse the indexes in
+        :type workers: int
         """
+        if workers > 1:
+            parsed = parse_indexes(resources, workers=workers)
+            for resource, records in zip(resources, parsed):
+                self.update_from_records(resource, records, predicate=predicate)
+            return
+
         for resource in resources:
             cmpt_name = resource['component']
             cmpt = self.get_component(cmpt_name)
-            cmpt.update_from_index(resource)
+            cmpt.update_from_index(resource, predicate=predicate)
+
+    def update_from_records(self, resource, records, predicate=None):
+        """
+        Update the component of an index from records parsed from it
+
+        :param resource: The index resource the records were parsed from
+        :type resource: dict
+
+        :param records: Records as returned by parse_index()
+        :type records: list
+
+        :param predicate: Only records for which this returns True are added
+        :type predicate: callable
+        """
+        cmpt = self.get_component(resource['component'])
+        cmpt.update_from_records(records, get_deb822_cls(resource),
+                                 predicate=predicate)
 
     def get_package_resources(self):
         resources = []
@@ -199,10 +543,38 @@ class Distribution(Model):
 
     @property
     def packages(self):
-        data = []
-        for cmpt in self.components:
-            data.extend(cmpt.packages)
-        return data
+        """
+        All packages of the components, which mustn't be modified
+
+        :rtype: list
+        """
+        return self._packages
+
+    def get_package(self, key):
+        """
+        Get a package by its key, see Package.key
+
+        :return: The package or None if there's none with the key
+        :rtype: Package
+        """
+        return self._packages_by_key.get(key)
+
+    def get_packages(self, name, architecture=None):
+        """
+        Get the versions of a package
+
+        :param architecture: Architecture as the index gives it, e.g. 'any'
+                             for most source packages; the versions of every
+                             architecture are returned if it's not given
+        :type architecture: str
+
+        :return: The packages in the order they were added
+        :rtype: list
+        """
+        packages = self._packages_by_name.get(name, ())
+        if architecture is None:
+            return list(packages)
+        return [p for p in packages if p.architecture == architecture]
 
     def get_resource_data(self, **kw):
         """
@@ -217,19 +589,76 @@ class Distribution(Model):
         data.update(kw)
         return data
 
-    def get_indexes(self):
+    def get_indexes(self, preference=None, extra=()):
         """
         Get the indexes that represents this Distribution from the underlying
         Components
 
+        :param preference: Compressions in order of preference, see
+                           get_compression()
+        :type preference: list
+
+        :param extra: Which of constants.EXTRA_INDEX_TYPES to include, as far
+                      as the Release file lists them
+        :type extra: list
+
         :return: List of resources
         :rtype: list
         """
         indexes = []
         for c in self.components:
-            indexes.extend(c.get_indexes())
+            indexes.extend(c.get_indexes(preference=preference, extra=extra))
+
+        if 'contents' in extra:
+            arches = set(['all'])
+            for c in self.components:
+                arches.update(c['arch'])
+            for arch in sorted(arches):
+                path = constants.DIST_CONTENTS_PATH % {'arch': arch}
+                indexes.extend(self.get_listed_indexes(
+                    'contents', [path], preference, arch=arch))
         return indexes
 
+    def get_listed_indexes(self, index_type, paths, preference=None, **kw):
+        """
+        Get resources for those of the given indexes that the Release file
+        lists, in the preferred compression it lists them in
+
+        :param paths: Paths of the uncompressed indexes relative to the dist
+        :type paths: list
+
+        :return: List of resources, with the path of the file to fetch
+                 relative to the dist as 'relative_path'
+        :rtype: list
+        """
+        resources = []
+        for path in paths:
+            compression = self.get_compression(path, preference)
+            if path + compression not in (self.release_files or {}):
+                continue
+            data = self.get_resource_data(type=index_type, **kw)
+            data['relative_path'] = path + compression
+            data['url'] = constants.URL_BASE % data + '/' + data['relative_path']
+            resources.append(data)
+        return resources
+
+    def get_listed_paths(self, prefix):
+        """
+        Get the uncompressed paths of the indexes the Release file lists
+        under a prefix
+
+        :rtype: list
+        """
+        paths = set()
+        for name in self.release_files or {}:
+            if not name.startswith(prefix):
+                continue
+            base, extension = os.path.splitext(name)
+            if extension in utils.DECOMPRESSORS:
+                name = base
+            paths.add(name)
+        return sorted(paths)
+
     def get_component(self, name):
         """
         Get a component by name
@@ -237,9 +666,7 @@ class Distribution(Model):
         :return: A Component object representing the wanted component
         :rtype: Component
         """
-        for cmpt in self.components:
-            if cmpt['name'] == name:
-                return cmpt
+        return self._components_by_name.get(name)
 
     def add_package(self, component_name, package):
         """
@@ -262,6 +689,14 @@ class Distribution(Model):
         for pkg in packages:
             self.add_package(component_name, pkg)
 
+    def _index_package(self, package):
+        """
+        Index a package a component has added
+        """
+        self._packages.append(package)
+        self._packages_by_key[package.key] = package
+        self._packages_by_name.setdefault(package.name, []).append(package)
+
 
 class Component(Model):
     """
@@ -283,6 +718,8 @@ class Component(Model):
         obj = package if isinstance(package, Package) else Package(
             component=self, **package)
         self.data['packages'].append(obj)
+        if self.dist is not None:
+            self.dist._index_package(obj)
 
     def add_packages(self, packages):
         """
@@ -294,16 +731,40 @@ class Component(Model):
         for p in packages:
             self.add_package(p)
 
-    def update_from_index(self, data, **kw):
+    def update_from_index(self, data, predicate=None, **kw):
         """
         Updates this instance with packages in the given Packages file.
 
+        :param predicate: Only paragraphs for which this returns True are
+                          added. It's applied while the index is parsed so
+                          paragraphs filtered out never become Packages.
+        :type predicate: callable
+
         :return: object representing the repository and all it's packages
         :rtype: Repository
         """
         packages = _iter_paragraphs_path(data, **kw)
+        if predicate is not None:
+            packages = itertools.ifilter(predicate, packages)
         self.add_packages([{'deb822': p} for p in packages])
 
+    def update_from_records(self, records, type_cls, predicate=None):
+        """
+        Updates this instance with packages from records of an index.
+
+        :param records: Records as returned by parse_index()
+        :type records: list
+
+        :param type_cls: The deb822 class of the index the records are from
+        :type type_cls: class
+
+        :param predicate: Only records for which this returns True are added
+        :type predicate: callable
+        """
+        if predicate is not None:
+            records = itertools.ifilter(predicate, records)
+        self.add_packages([{'deb822': type_cls(r)} for r in records])
+
     def update_from_indexes(self, data, **kw):
         """
         Update from a list of indexes
@@ -314,25 +775,45 @@ class Component(Model):
         for i in data:
             self.update_from_index(i, **kw)
 
-    def get_indexes(self):
+    def get_indexes(self, preference=None, extra=()):
         """
         Return all indexes related to this Component under a Distribution
 
+        :param preference: Compressions in order of preference, see
+                           Distribution.get_compression()
+        :type preference: list
+
+        :param extra: Which of constants.EXTRA_INDEX_TYPES to include, see
+                      Distribution.get_indexes()
+        :type extra: list
+
         :return: A list of index resources
         :rtype: list
         """
-        resources = []
-
-        data = self.get_resource_data(type='sources')
-        data['url'] = constants.URLS['sources'] % data
-        resources.append(data)
-
+        resources = [self._index_resource('sources', preference)]
         for arch in self.data['arch']:
-            data = self.get_resource_data(type='packages', arch=arch)
-            data['url'] = constants.URLS['packages'] % data
-            resources.append(data)
+            resources.append(self._index_resource('packages', preference, arch=arch))
+
+        name = self['name']
+        if 'contents' in extra:
+            for arch in sorted(set(self.data['arch']) | set(['all'])):
+                path = constants.CONTENTS_PATH % {'component': name, 'arch': arch}
+                resources.extend(self.dist.get_listed_indexes(
+                    'contents', [path], preference, component=name, arch=arch))
+        if 'translation' in extra:
+            prefix = constants.TRANSLATION_PREFIX % {'component': name}
+            paths = self.dist.get_listed_paths(prefix)
+            resources.extend(self.dist.get_listed_indexes(
+                'translation', paths, preference, component=name))
         return resources
 
+    def _index_resource(self, index_type, preference, **kw):
+        data = self.get_resource_data(type=index_type, **kw)
+        path = constants.INDEX_PATHS[index_type] % data
+        compression = self.dist.get_compression(path, preference)
+        data['url'] = constants.URL_BASE % data + '/' + path + compression
+        return data
+
     def update_from_json(self, json_string):
         """
         Updates this metadata instance with packages found in the given JSON
@@ -372,8 +853,12 @@ class Package(Model):
         if isinstance(deb822, (Packages, Sources)):
             self.data = deb822
         else:
+            # The deb822 constructors parse multivalued fields (Files,
+            # Checksums-*) from text; units store them already split
             type_cls = get_deb822_cls(kw)
-            self.data = type_cls(kw)
+            split = dict([(k, v) for k, v in kw.items() if isinstance(v, list)])
+            self.data = type_cls(dict([(k, v) for k, v in kw.items() if k not in split]))
+            self.data.update(split)
 
     @property
     def package_type(self):
@@ -390,6 +875,10 @@ class Package(Model):
     def name(self):
         return self['package']
 
+    @property
+    def architecture(self):
+        return self.data.get('architecture')
+
     @property
     def prefix(self):
         pkg = self.name
@@ -401,7 +890,9 @@ class Package(Model):
         """
         Get the key representing this package
         """
-        return constants.DEB_KEY % self.to_dict()
+        # Only the fields of the key are looked up, the data is case
+        # insensitive
+        return constants.DEB_KEY % dict([(k, self[k]) for k in UNIT_KEYS])
 
     @property
     def files(self):
@@ -485,7 +976,7 @@ class Package(Model):
         for this package. This is how the package will be inventoried in Pulp.
         """
         data = self.to_dict()
-        metadata = [(k, v) for k, v in data.items() if k not in UNIT_KEYS]
+        metadata = dict([(k, v) for k, v in data.items() if k not in UNIT_KEYS])
         return metadata
 
     def get_resources(self, resource_data=None):
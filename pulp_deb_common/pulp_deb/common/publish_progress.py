@@ -16,7 +16,7 @@ Contains classes and functions related to tracking the progress of a package
 distributor.
 """
 
-from pulp_deb.common import reporting
+from pulp_deb.common import constants, reporting
 from pulp_deb.common.constants import STATE_NOT_STARTED, STATE_SUCCESS
 
 
@@ -66,6 +66,7 @@ class PublishProgressReport(object):
         r.metadata_error_message = m['error_message']
         r.metadata_exception = m['error']
         r.metadata_traceback = m['traceback']
+        r.metadata_compression_times = m.get('compression_times')
 
         m = report['publishing']
         r.publish_http = m['http']
@@ -93,6 +94,7 @@ class PublishProgressReport(object):
         self.metadata_error_message = None
         self.metadata_exception = None
         self.metadata_traceback = None
+        self.metadata_compression_times = None # seconds spent per compression
 
         # Publishing
         self.publish_http = STATE_NOT_STARTED
@@ -161,7 +163,7 @@ class PublishProgressReport(object):
         """
         self.packages_error_count += 1
         self.packages_individual_errors = self.packages_individual_errors or {}
-        error_key = '%s-%s-%s' % (unit.unit_key['name'], unit.unit_key['version'], unit.unit_key['author'])
+        error_key = constants.DEB_KEY % unit.unit_key
         self.packages_individual_errors[error_key] = reporting.format_traceback(traceback)
 
 # -- report creation methods ----------------------------------------------
@@ -187,6 +189,7 @@ class PublishProgressReport(object):
             'error_message' : self.metadata_error_message,
             'error' : reporting.format_exception(self.metadata_exception),
             'traceback' : reporting.format_traceback(self.metadata_traceback),
+            'compression_times' : self.metadata_compression_times,
             }
         return metadata_report
 
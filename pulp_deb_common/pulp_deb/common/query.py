@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright © 2013 Bouvet ASA
+#
+# This software is licensed to you under the GNU General Public
+# License as published by the Free Software Foundation; either version
+# 2 of the License (GPLv2) or (at your option) any later version.
+# There is NO WARRANTY for this software, express or implied,
+# including the implied warranties of MERCHANTABILITY,
+# NON-INFRINGEMENT, or FITNESS FOR A PARTICULAR PURPOSE. You should
+# have received a copy of GPLv2 along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+
+"""
+Compiles the queries configured on a repository into a single predicate that
+is evaluated against each index paragraph as it is parsed.
+
+A query is a whitespace separated list of terms that must all match. A
+paragraph is kept if any of the queries match it. Terms look like:
+
+    libfoo*                 the package name matches the glob
+    name=libfoo*            a field matches the glob
+    section!=debug          a field does not match the glob
+    name~^lib(foo|bar)$     a field matches the regular expression
+    version>=1.2-1          the version compares using Debian ordering;
+                            one of <<, <=, =, !=, >=, >> (< and > are
+                            accepted as the strict forms)
+
+For the architecture field each of the listed architectures is tried, so
+arch=amd64 also matches a source paragraph listing "amd64 i386".
+"""
+
+import fnmatch
+import re
+
+from debian.debian_support import Version
+
+from pulp_deb.common import constants
+
+
+# -- constants ----------------------------------------------------------------
+
+FIELD_ALIASES = {
+    'name': 'Package',
+    'arch': 'Architecture',
+}
+
+# Paragraph fields keyed by their lowercased name, to get the canonical
+# spelling used in the indexes
+FIELDS = dict([(k.lower(), k) for k in constants.PACKAGE_KEYS])
+
+VERSION_OPERATORS = {
+    '<<': lambda c: c < 0,
+    '<': lambda c: c < 0,
+    '<=': lambda c: c <= 0,
+    '=': lambda c: c == 0,
+    '!=': lambda c: c != 0,
+    '>=': lambda c: c >= 0,
+    '>>': lambda c: c > 0,
+    '>': lambda c: c > 0,
+}
+
+TERM_RE = re.compile(
+    r'^(?P<field>[A-Za-z][A-Za-z0-9-]*)(?P<op><<|>>|<=|>=|!=|=|~|<|>)(?P<value>.+)$')
+
+MULTIPLE_VALUED = ('Architecture',)
+
+
+# -- exceptions ---------------------------------------------------------------
+
+class InvalidQuery(ValueError):
+    def __init__(self, query, *args):
+        ValueError.__init__(self, query, *args)
+        self.query = query
+
+
+# -- public -------------------------------------------------------------------
+
+def compile_queries(queries):
+    """
+    Compiles a list of queries into a single predicate.
+
+    :param queries: Queries as given in the repository configuration
+    :type queries: list
+
+    :return: callable taking a paragraph and returning whether to keep it, or
+             None if there is nothing to filter on
+    :rtype: callable or None
+
+    :raise InvalidQuery: if one of the queries can't be parsed
+    """
+    compiled = []
+    for q in queries or []:
+        if not isinstance(q, basestring):
+            raise InvalidQuery(q)
+        if q.strip():
+            compiled.append(_compile_query(q))
+    if not compiled:
+        return None
+
+    def predicate(paragraph):
+        for terms in compiled:
+            for term in terms:
+                if not term(paragraph):
+                    break
+            else:
+                return True
+        return False
+    return predicate
+
+
+# -- private ------------------------------------------------------------------
+
+def _compile_query(query):
+    return [_compile_term(query, t) for t in query.split()]
+
+
+def _compile_term(query, term):
+    match = TERM_RE.match(term)
+    if match is None:
+        # A bare term is a glob on the package name
+        field, op, value = 'name', '=', term
+    else:
+        field, op, value = match.group('field', 'op', 'value')
+
+    field = _field_name(field)
+
+    if field == 'Version':
+        if op == '~':
+            raise InvalidQuery(query, term)
+        accept = VERSION_OPERATORS[op]
+        try:
+            version = Version(value)
+        except ValueError:
+            raise InvalidQuery(query, term)
+
+        def test(paragraph):
+            found = paragraph.get(field)
+            if found is None:
+                return False
+            try:
+                return accept(cmp(Version(found), version))
+            except ValueError:
+                # A paragraph with a malformed version never matches
+                return False
+        return test
+
+    if op == '~':
+        try:
+            matcher = re.compile(value).search
+        except re.error:
+            raise InvalidQuery(query, term)
+    elif op in ('=', '!='):
+        matcher = re.compile(fnmatch.translate(value)).match
+    else:
+        raise InvalidQuery(query, term)
+
+    negate = op == '!='
+    multiple = field in MULTIPLE_VALUED
+
+    def test(paragraph):
+        found = paragraph.get(field)
+        if found is None:
+            return negate
+        values = found.split() if multiple else [found]
+        matched = any(matcher(v) for v in values)
+        return matched != negate
+    return test
+
+
+def _field_name(field):
+    field = field.lower()
+    field = FIELD_ALIASES.get(field, field)
+    return FIELDS.get(field.lower(), '-'.join([i.title() for i in field.split('-')]))
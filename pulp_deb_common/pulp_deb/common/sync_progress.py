@@ -95,6 +95,14 @@ class SyncProgressReport(object):
         self.packages_exception = None
         self.packages_traceback = None
 
+        # Timings and counters of the phases of the sync, see
+        # pulp_deb.plugins.metrics.Metrics.report()
+        self.metrics = None
+
+        # Stats file and hotspots of a profiled sync, see
+        # pulp_deb.plugins.profiling.Profiler.report()
+        self.profile = None
+
     # -- public methods -------------------------------------------------------
 
     def update_progress(self):
@@ -126,6 +134,10 @@ class SyncProgressReport(object):
             'finished_count' : self.packages_finished_count,
             'error_count' : self.packages_error_count,
         }
+        if self.metrics is not None:
+            details['metrics'] = self.metrics
+        if self.profile is not None:
+            details['profile'] = self.profile
 
         # Determine if the report was successful or failed
         all_step_states = (self.metadata_state, self.packages_state)
@@ -159,7 +171,7 @@ class SyncProgressReport(object):
         """
         self.packages_error_count += 1
         self.packages_individual_errors = self.packages_individual_errors or {}
-        self.packages_individual_errors[package.key()] = {
+        self.packages_individual_errors[package.key] = {
             'exception' : reporting.format_exception(exception),
             'traceback' : reporting.format_traceback(traceback),
         }
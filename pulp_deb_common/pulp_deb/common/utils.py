@@ -1,11 +1,107 @@
+import bz2
+import ctypes
+import ctypes.util
 import gzip
+import hashlib
+import importlib
+import os
+import time
+
+# xz support comes with Python 3.3; on older versions it's only there if
+# backports.lzma is installed
+try:
+    import lzma
+except ImportError:
+    try:
+        from backports import lzma
+    except ImportError:
+        lzma = None
+
+from pulp_deb.common import constants
+
+
+# Size of the chunks files are read in when they are hashed
+CHUNK_SIZE = 1024 * 1024
+
+# Classes giving a streaming file object for each compression, by extension
+DECOMPRESSORS = {
+    constants.COMPRESSION_GZ: gzip.GzipFile,
+    constants.COMPRESSION_BZ2: bz2.BZ2File,
+    constants.COMPRESSION_XZ: lzma.LZMAFile if lzma is not None else None,
+}
+
+
+def monotonic():
+    """
+    Read a high resolution clock that never goes backwards, for timing
+    operations; only differences between its readings are meaningful
+
+    :return: Seconds since an arbitrary point
+    :rtype: float
+    """
+    global _monotonic
+    if _monotonic is None:
+        # Looked up on first use rather than on import, as finding the
+        # library runs ldconfig
+        _monotonic = _clock_gettime_monotonic()
+    return _monotonic()
+
+
+def lazy_import(name):
+    """
+    Get a stand-in for a module that imports it when one of its attributes
+    is first used, for modules that are slow to import and only needed on
+    some code paths. An ImportError is raised on that first use.
+
+    :param name: Full name of the module
+    :type name: str
+
+    :return: The stand-in, which can be used as the module
+    :rtype: object
+    """
+    return _LazyModule(name)
+
+
+def supported_compression(extension):
+    """
+    Check if files compressed as the extension says can be read
+
+    :param extension: File extension, '' for uncompressed files
+    :type extension: str
+
+    :rtype: bool
+    """
+    return extension == constants.COMPRESSION_NONE or \
+        DECOMPRESSORS.get(extension) is not None
+
+
+def open_index(path):
+    """
+    Open a possibly compressed file for reading, decompressing it on the fly
+    according to its extension
+
+    :param path: Path of the file
+    :type path: str
+
+    :return: A file object giving the decompressed content
+    :rtype: file
+    """
+    extension = os.path.splitext(path)[1]
+    if extension not in DECOMPRESSORS:
+        return open(path)
+
+    decompressor = DECOMPRESSORS[extension]
+    if decompressor is None:
+        raise RuntimeError('Reading %s files is not supported' % extension)
+    return decompressor(path)
 
 
 def _read(f, empty_on_io=False, as_list=True):
     """
     Read a file to a string or a list
 
-    :param f: Either a 'file' object or a filename
+    :param f: Either a 'file' object or a filename, which is decompressed if
+              it ends with .gz, .bz2 or .xz
     :type f: str or file
 
     :param empty_on_io: Return empty on IOError
@@ -18,12 +114,8 @@ def _read(f, empty_on_io=False, as_list=True):
     :rtype: list or string
     """
     try:
-        fh = None
         if isinstance(f, basestring):
-            fh = open(f)
-
-        if fh is not None and f.endswith('.gz'):
-            fh = gzip.GzipFile(fileobj=fh)
+            fh = open_index(f)
         elif isinstance(f, file):
             fh = f
         else:
@@ -34,3 +126,77 @@ def _read(f, empty_on_io=False, as_list=True):
         else:
             raise
     return fh.readlines() if as_list else fh.read()
+
+
+def file_digest(path, algorithm='sha256'):
+    """
+    Calculate the hex digest of a file without reading it all into memory
+
+    :param path: Path of the file
+    :type path: str
+
+    :param algorithm: Any algorithm hashlib supports
+    :type algorithm: str
+
+    :return: The hex digest
+    :rtype: str
+    """
+    digest = hashlib.new(algorithm)
+    fh = open(path, 'rb')
+    try:
+        for chunk in iter(lambda: fh.read(CHUNK_SIZE), ''):
+            digest.update(chunk)
+    finally:
+        fh.close()
+    return digest.hexdigest()
+
+
+class _LazyModule(object):
+    """
+    Module imported on first attribute access, see lazy_import()
+    """
+
+    def __init__(self, name):
+        self.__dict__['_name'] = name
+        self.__dict__['_module'] = None
+
+    def __getattr__(self, attr):
+        if self._module is None:
+            self.__dict__['_module'] = importlib.import_module(self._name)
+        return getattr(self._module, attr)
+
+    def __repr__(self):
+        return '<lazily imported module %r>' % self._name
+
+
+def _clock_gettime_monotonic():
+    """
+    Get a monotonic clock reading function on Pythons without
+    time.monotonic(), falling back to the wall clock
+    """
+    if hasattr(time, 'monotonic'):
+        return time.monotonic
+
+    class timespec(ctypes.Structure):
+        _fields_ = [('tv_sec', ctypes.c_long), ('tv_nsec', ctypes.c_long)]
+
+    try:
+        librt = ctypes.CDLL(ctypes.util.find_library('rt') or 'libc.so.6', use_errno=True)
+        clock_gettime = librt.clock_gettime
+    except (OSError, AttributeError):
+        return time.time
+    clock_gettime.argtypes = [ctypes.c_int, ctypes.POINTER(timespec)]
+
+    def monotonic():
+        t = timespec()
+        if clock_gettime(_CLOCK_MONOTONIC, ctypes.byref(t)) != 0:
+            return time.time()
+        return t.tv_sec + t.tv_nsec * 1e-9
+    return monotonic
+
+
+# CLOCK_MONOTONIC of <time.h> on Linux
+_CLOCK_MONOTONIC = 1
+
+# Clock reading function behind monotonic(), set on its first use
+_monotonic = None
@@ -0,0 +1,262 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright © 2013 Bouvet ASA
+#
+# This software is licensed to you under the GNU General Public
+# License as published by the Free Software Foundation; either version
+# 2 of the License (GPLv2) or (at your option) any later version.
+# There is NO WARRANTY for this software, express or implied,
+# including the implied warranties of MERCHANTABILITY,
+# NON-INFRINGEMENT, or FITNESS FOR A PARTICULAR PURPOSE. You should
+# have received a copy of GPLv2 along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+
+"""
+Generates synthetic Debian archives on local disk for the benchmarks.
+
+An archive can be generated again in a later generation, in which a share of
+its packages have been replaced by new versions, to benchmark syncing the
+changes of a feed.
+"""
+
+import gzip
+import hashlib
+import os
+import random
+
+
+# -- constants ----------------------------------------------------------------
+
+SECTIONS = ['admin', 'devel', 'libs', 'net', 'python', 'utils', 'web']
+
+RELEASE_HASHES = (('MD5Sum', 'md5'), ('SHA1', 'sha1'), ('SHA256', 'sha256'))
+
+BINARY_TEMPLATE = """Package: %(name)s
+Source: %(source)s
+Version: %(version)s
+Architecture: %(arch)s
+Maintainer: Synthetic Maintainer <synthetic@example.com>
+Installed-Size: %(installed_size)d
+Depends: libc6 (>= 2.15), %(depends)s
+Section: %(section)s
+Priority: optional
+Filename: %(filename)s
+Size: %(size)d
+MD5sum: %(md5sum)s
+SHA1: %(sha1)s
+SHA256: %(sha256)s
+Description: synthetic package %(name)s
+ A synthetic package generated for benchmarking. Like most real packages
+ it comes with a long description spanning a few lines.
+ .
+ It does nothing at all.
+
+"""
+
+SOURCE_TEMPLATE = """Package: %(source)s
+Binary: %(name)s
+Version: %(version)s
+Maintainer: Synthetic Maintainer <synthetic@example.com>
+Architecture: any
+Standards-Version: 3.9.3
+Format: 3.0 (quilt)
+Directory: %(directory)s
+Files:
+ %(md5sum)s %(size)d %(source)s_%(version)s.dsc
+ %(md5sum)s %(size)d %(source)s_%(version)s.orig.tar.gz
+Checksums-Sha1:
+ %(sha1)s %(size)d %(source)s_%(version)s.dsc
+ %(sha1)s %(size)d %(source)s_%(version)s.orig.tar.gz
+Checksums-Sha256:
+ %(sha256)s %(size)d %(source)s_%(version)s.dsc
+ %(sha256)s %(size)d %(source)s_%(version)s.orig.tar.gz
+Section: %(section)s
+Priority: optional
+
+"""
+
+
+# -- public -------------------------------------------------------------------
+
+def generate_archive(root, dist='synthetic', components=('main',),
+                     arches=('amd64',), packages=1000, seed=0, generation=0,
+                     churn=0.0, pool=False):
+    """
+    Writes the indexes and Release file of a synthetic archive under root.
+
+    Each component gets the same number of packages for every architecture
+    and a Sources index with one source per package. The indexes are written
+    both uncompressed and gzipped.
+
+    :param root: directory to create the archive in
+    :type  root: str
+    :param packages: number of packages per component and architecture
+    :type  packages: int
+    :param seed: seed for the random parts, to get the same archive again
+    :type  seed: int
+    :param generation: how many times the archive has changed; generation 0
+                       is the archive as first generated
+    :type  generation: int
+    :param churn: share of the packages that get a new version in each
+                  generation
+    :type  churn: float
+    :param pool: whether to also write the files of the packages to the
+                 pool, for syncing the archive; they are small and their
+                 sizes and checksums are listed in the indexes
+    :type  pool: bool
+
+    :return: the dist configuration of the archive, as the importer takes it
+    :rtype:  dict
+    """
+    rand = random.Random(seed)
+    revisions = _revisions(seed, packages, generation, churn)
+    pool_root = root if pool else None
+    index_files = []
+
+    for component in components:
+        for arch in arches:
+            paragraphs = [_binary_paragraph(rand, component, arch, n, revisions.get(n),
+                                            pool_root)
+                          for n in range(packages)]
+            path = '%s/binary-%s/Packages' % (component, arch)
+            index_files.extend(write_index(root, dist, path, paragraphs))
+
+        paragraphs = [_source_paragraph(rand, component, n, revisions.get(n), pool_root)
+                      for n in range(packages)]
+        path = '%s/source/Sources' % component
+        index_files.extend(write_index(root, dist, path, paragraphs))
+
+    write_release(root, dist, components, arches, index_files)
+
+    return {
+        'url': 'file://' + root,
+        'name': dist,
+        'components': [{'name': c, 'arch': list(arches)} for c in components],
+    }
+
+
+def write_index(root, dist, path, paragraphs):
+    """
+    Writes an index uncompressed and gzipped.
+
+    :return: paths of the written files, relative to the dist directory
+    :rtype:  list
+    """
+    dist_dir = os.path.join(root, 'dists', dist)
+    full_path = os.path.join(dist_dir, path)
+    if not os.path.exists(os.path.dirname(full_path)):
+        os.makedirs(os.path.dirname(full_path))
+
+    content = ''.join(paragraphs)
+    f = open(full_path, 'w')
+    f.write(content)
+    f.close()
+
+    f = gzip.open(full_path + '.gz', 'w')
+    f.write(content)
+    f.close()
+    return [path, path + '.gz']
+
+
+def write_release(root, dist, components, arches, index_files):
+    """
+    Writes the Release file listing the checksums of the given indexes.
+    """
+    dist_dir = os.path.join(root, 'dists', dist)
+    lines = [
+        'Origin: Synthetic',
+        'Suite: %s' % dist,
+        'Codename: %s' % dist,
+        'Architectures: %s' % ' '.join(arches),
+        'Components: %s' % ' '.join(components),
+    ]
+    for field, algorithm in RELEASE_HASHES:
+        lines.append('%s:' % field)
+        for path in index_files:
+            f = open(os.path.join(dist_dir, path), 'rb')
+            data = f.read()
+            f.close()
+            digest = hashlib.new(algorithm, data).hexdigest()
+            lines.append(' %s %d %s' % (digest, len(data), path))
+
+    f = open(os.path.join(dist_dir, 'Release'), 'w')
+    f.write('\n'.join(lines) + '\n')
+    f.close()
+
+
+# -- private ------------------------------------------------------------------
+
+def _revisions(seed, packages, generation, churn):
+    """
+    Returns the generation each churned package got its current version in,
+    keyed by the number of the package.
+    """
+    revisions = {}
+    count = int(packages * churn)
+    for g in range(1, generation + 1):
+        rand = random.Random('%s-%d' % (seed, g))
+        for n in rand.sample(xrange(packages), count):
+            revisions[n] = g
+    return revisions
+
+
+def _package_data(rand, component, n, revision=None):
+    name = 'synth%06d' % n
+    if n % 3 == 0:
+        name = 'lib' + name
+    source = name
+    prefix = source[0:4] if source.startswith('lib') else source[0]
+    version = '%d.%d-%d' % (rand.randint(0, 9), rand.randint(0, 99), rand.randint(1, 5))
+    if revision:
+        version += '+g%d' % revision
+    return {
+        'name': name,
+        'source': source,
+        'version': version,
+        'section': rand.choice(SECTIONS),
+        'installed_size': rand.randint(10, 50000),
+        'size': rand.randint(1000, 5000000),
+        'depends': 'synth%06d' % rand.randint(0, max(n, 1)),
+        'directory': 'pool/%s/%s/%s' % (component, prefix, source),
+        'md5sum': hashlib.md5(name + version).hexdigest(),
+        'sha1': hashlib.sha1(name + version).hexdigest(),
+        'sha256': hashlib.sha256(name + version).hexdigest(),
+    }
+
+
+def _binary_paragraph(rand, component, arch, n, revision=None, pool_root=None):
+    data = _package_data(rand, component, n, revision)
+    data['arch'] = arch
+    data['filename'] = '%(directory)s/%(name)s_%(version)s_%(arch)s.deb' % data
+    if pool_root is not None:
+        _write_pool_files(pool_root, data, [data['filename']])
+    return BINARY_TEMPLATE % data
+
+
+def _source_paragraph(rand, component, n, revision=None, pool_root=None):
+    data = _package_data(rand, component, n, revision)
+    if pool_root is not None:
+        names = ['%(source)s_%(version)s.dsc' % data, '%(source)s_%(version)s.orig.tar.gz' % data]
+        _write_pool_files(pool_root, data, [data['directory'] + '/' + f for f in names])
+    return SOURCE_TEMPLATE % data
+
+
+def _write_pool_files(root, data, paths):
+    """
+    Writes the files of a package with the same small content, updating the
+    size and checksums of data to match it.
+    """
+    content = ('%(name)s %(version)s\n' % data) * (16 + len(data['name']) * 8)
+    data['size'] = len(content)
+    for field, algorithm in (('md5sum', 'md5'), ('sha1', 'sha1'), ('sha256', 'sha256')):
+        data[field] = hashlib.new(algorithm, content).hexdigest()
+
+    for path in paths:
+        full_path = os.path.join(root, path)
+        if os.path.exists(full_path):
+            continue
+        if not os.path.exists(os.path.dirname(full_path)):
+            os.makedirs(os.path.dirname(full_path))
+        f = open(full_path, 'wb')
+        f.write(content)
+        f.close()
@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright © 2013 Bouvet ASA
+#
+# This software is licensed to you under the GNU General Public
+# License as published by the Free Software Foundation; either version
+# 2 of the License (GPLv2) or (at your option) any later version.
+# There is NO WARRANTY for this software, express or implied,
+# including the implied warranties of MERCHANTABILITY,
+# NON-INFRINGEMENT, or FITNESS FOR A PARTICULAR PURPOSE. You should
+# have received a copy of GPLv2 along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+
+"""
+Measures syncing a synthetic archive over HTTP, from a local mirror made to
+behave like a remote one (see mirror.py).
+
+The archive is synced, indexes and packages, with each of the given numbers
+of concurrent downloads, both from a mirror keeping connections alive and
+from one closing them after every response, to show what connection reuse
+and parallel downloads gain. Each sync goes through the importer as Pulp
+runs it, with Pulp stood in for as in bench_sync.py, so the packages are
+downloaded the way a real sync downloads them. Each run prints one JSON
+record; with --output it's also appended to a file, one record a line.
+
+The pulp_deb plugins have to be installed for their downloaders to be found.
+
+    python test/benchmark/bench_download.py --packages 200 --latency 0.02 \\
+        --concurrency 1,4,8 --output bench-download.jsonl
+"""
+
+import json
+import optparse
+import os
+import platform
+import shutil
+import tempfile
+import time
+
+import archive
+import bench_sync
+import mirror
+from pulp.plugins.config import PluginCallConfiguration
+
+from pulp_deb.common import constants
+from pulp_deb.plugins.importers import sync
+
+
+# -- public -------------------------------------------------------------------
+
+def main():
+    parser = optparse.OptionParser()
+    parser.add_option('--components', type='int', default=1)
+    parser.add_option('--arches', type='int', default=1)
+    parser.add_option('--packages', type='int', default=200,
+                      help='packages per component and architecture')
+    parser.add_option('--concurrency', default='1,2,4,8',
+                      help='comma separated numbers of concurrent downloads')
+    parser.add_option('--latency', type='float', default=0.02,
+                      help='seconds the mirror waits before answering a request')
+    parser.add_option('--bandwidth', type='int', default=None,
+                      help='bytes per second the mirror sends each response at')
+    parser.add_option('--error-rate', type='float', default=0.0,
+                      help='share of the requests the mirror fails')
+    parser.add_option('--output', help='file to append the JSON record to')
+    options, args = parser.parse_args()
+
+    root = tempfile.mkdtemp(prefix='bench-download')
+    try:
+        results = run(root, options)
+    finally:
+        shutil.rmtree(root)
+
+    record = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'revision': bench_sync._revision(),
+        'python': platform.python_version(),
+        'options': {
+            'components': options.components,
+            'arches': options.arches,
+            'packages': options.packages,
+            'latency': options.latency,
+            'bandwidth': options.bandwidth,
+            'error_rate': options.error_rate,
+        },
+        'results': results,
+    }
+    print json.dumps(record, indent=2, sort_keys=True)
+    if options.output:
+        f = open(options.output, 'a')
+        f.write(json.dumps(record, sort_keys=True) + '\n')
+        f.close()
+
+
+def run(root, options):
+    """
+    Syncs the archive generated under root at every concurrency, from a
+    mirror keeping connections alive and from one that doesn't.
+
+    :return: the measurements of each run, keyed by keep_alive and then by
+             concurrency
+    :rtype:  dict
+    """
+    feed = os.path.join(root, 'feed')
+    components = ['component%d' % i for i in range(options.components)]
+    arches = ['arch%d' % i for i in range(options.arches)]
+    dist_config = archive.generate_archive(feed, components=components, arches=arches,
+                                           packages=options.packages, pool=True)
+    concurrencies = [int(c) for c in options.concurrency.split(',')]
+
+    results = {}
+    for keep_alive in (True, False):
+        server = mirror.MirrorServer(feed, latency=options.latency, bandwidth=options.bandwidth,
+                                     error_rate=options.error_rate, keep_alive=keep_alive)
+        with server:
+            by_concurrency = results['keep_alive' if keep_alive else 'close'] = {}
+            for concurrency in concurrencies:
+                sync_dir = tempfile.mkdtemp(prefix='sync', dir=root)
+                try:
+                    server.reset_stats()
+                    by_concurrency[str(concurrency)] = _sync(
+                        sync_dir, dict(dist_config, url=server.url), concurrency)
+                    by_concurrency[str(concurrency)].update(server.stats())
+                finally:
+                    shutil.rmtree(sync_dir)
+
+    return results
+
+
+# -- private ------------------------------------------------------------------
+
+def _sync(sync_dir, dist_config, concurrency):
+    """
+    Syncs the archive at the URL of dist_config into a new repository under
+    sync_dir.
+    """
+    repo = bench_sync.Repository('bench', os.path.join(sync_dir, 'working'))
+    os.makedirs(repo.working_dir)
+    conduit = bench_sync.BenchConduit(os.path.join(sync_dir, 'storage'))
+    config = PluginCallConfiguration({}, {
+        constants.CONFIG_DIST: dist_config,
+        constants.CONFIG_MAX_DOWNLOADS: concurrency,
+    })
+
+    start = time.time()
+    report = sync.PackageSyncRun(repo, conduit, config, lambda: False).perform_sync()
+    result = bench_sync._throughput(time.time() - start, len(conduit.units), 'units')
+    result['success'] = report['success']
+    return result
+
+
+if __name__ == '__main__':
+    main()
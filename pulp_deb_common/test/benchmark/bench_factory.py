@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright © 2013 Bouvet ASA
+#
+# This software is licensed to you under the GNU General Public
+# License as published by the Free Software Foundation; either version
+# 2 of the License (GPLv2) or (at your option) any later version.
+# There is NO WARRANTY for this software, express or implied,
+# including the implied warranties of MERCHANTABILITY,
+# NON-INFRINGEMENT, or FITNESS FOR A PARTICULAR PURPOSE. You should
+# have received a copy of GPLv2 along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+
+"""
+Measures looking up downloaders by url type, as a validation of the
+importer configuration and the start of a sync do: once to validate the
+feed and once for each time the sync creates a downloader. A lookup scanning
+the entry points every time, as stevedore's DriverManager does, is compared
+with the factory's registry, both for the first lookup of the process and
+for the ones after it.
+
+The pulp_deb plugins have to be installed for their downloaders to be found.
+
+    python test/benchmark/bench_factory.py --repeat 100
+"""
+
+import json
+import optparse
+import time
+
+from stevedore import driver
+
+from pulp_deb.plugins.importers.downloaders import factory
+
+
+# -- constants ----------------------------------------------------------------
+
+# Url types looked up by validating a configuration and syncing its feed
+STARTUP_LOOKUPS = ('file', 'file', 'file')
+
+
+# -- public -------------------------------------------------------------------
+
+def main():
+    parser = optparse.OptionParser()
+    parser.add_option('--repeat', type='int', default=100,
+                      help='validations and sync starts to time')
+    options, args = parser.parse_args()
+
+    def scan(url_type):
+        return driver.DriverManager(factory.NAMESPACE, url_type).driver
+
+    start = time.time()
+    factory.get_url_type_downloader('file')
+    first = time.time() - start
+
+    results = {
+        'lookups_per_start': len(STARTUP_LOOKUPS),
+        'first_lookup_seconds': first,
+        'seconds_per_start': {
+            'scan': _time_starts(scan, options.repeat),
+            'registry': _time_starts(factory.get_url_type_downloader, options.repeat),
+        },
+    }
+    print json.dumps(results, indent=2, sort_keys=True)
+
+
+# -- private ------------------------------------------------------------------
+
+def _time_starts(lookup, repeat):
+    start = time.time()
+    for i in range(repeat):
+        for url_type in STARTUP_LOOKUPS:
+            lookup(url_type)
+    return (time.time() - start) / repeat
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright © 2013 Bouvet ASA
+#
+# This software is licensed to you under the GNU General Public
+# License as published by the Free Software Foundation; either version
+# 2 of the License (GPLv2) or (at your option) any later version.
+# There is NO WARRANTY for this software, express or implied,
+# including the implied warranties of MERCHANTABILITY,
+# NON-INFRINGEMENT, or FITNESS FOR A PARTICULAR PURPOSE. You should
+# have received a copy of GPLv2 along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+
+"""
+Measures how long loading the plugins and the admin extension takes, as
+Pulp and the admin client do when they start. Each module is imported in a
+fresh interpreter, so nothing is already loaded, and the modules that are
+slow to import and only needed on some code paths (libcurl, the deb822
+parser, stevedore and debuggers) are listed if the import loaded them.
+
+Modules that can't be imported, e.g. the admin extension without the Pulp
+client installed, are reported with their error.
+
+    python test/benchmark/bench_import.py --repeat 5
+"""
+
+import json
+import optparse
+import os
+import subprocess
+import sys
+
+
+# -- constants ----------------------------------------------------------------
+
+# Modules Pulp and the admin client load
+MODULES = (
+    'pulp_deb.plugins.importers.importer',
+    'pulp_deb.plugins.distributors.distributor',
+    'pulp_deb.extensions.admin.repo.pulp_cli',
+)
+
+# Modules loading the above shouldn't bring in
+HEAVY_MODULES = ('pycurl', 'debian.deb822', 'stevedore', 'pkg_resources', 'ipdb')
+
+# Run in the fresh interpreter, printing the seconds the import took and
+# the heavy modules it loaded
+IMPORT_SCRIPT = '''
+import json, sys, time
+start = time.time()
+try:
+    __import__(%(module)r)
+    error = None
+except Exception, e:
+    error = '%%s: %%s' %% (e.__class__.__name__, e)
+seconds = time.time() - start
+print json.dumps({'seconds': seconds, 'error': error,
+                  'loaded': [m for m in %(heavy)r if m in sys.modules]})
+'''
+
+
+# -- public -------------------------------------------------------------------
+
+def main():
+    parser = optparse.OptionParser()
+    parser.add_option('--module', action='append',
+                      help='module to import; may be given multiple times')
+    parser.add_option('--repeat', type='int', default=5)
+    options, args = parser.parse_args()
+
+    results = {}
+    for module in options.module or MODULES:
+        runs = [_import(module) for i in range(options.repeat)]
+        results[module] = {
+            'seconds': min([r['seconds'] for r in runs]),
+            'error': runs[0]['error'],
+            'loaded': runs[0]['loaded'],
+        }
+    print json.dumps(results, indent=2, sort_keys=True)
+
+
+# -- private ------------------------------------------------------------------
+
+def _import(module):
+    """
+    Imports a module in a new interpreter with the path of this one.
+    """
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join([p for p in sys.path if p]))
+    script = IMPORT_SCRIPT % {'module': module, 'heavy': HEAVY_MODULES}
+    output = subprocess.Popen([sys.executable, '-c', script], env=env,
+                              stdout=subprocess.PIPE).communicate()[0]
+    return json.loads(output.splitlines()[-1])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright © 2013 Bouvet ASA
+#
+# This software is licensed to you under the GNU General Public
+# License as published by the Free Software Foundation; either version
+# 2 of the License (GPLv2) or (at your option) any later version.
+# There is NO WARRANTY for this software, express or implied,
+# including the implied warranties of MERCHANTABILITY,
+# NON-INFRINGEMENT, or FITNESS FOR A PARTICULAR PURPOSE. You should
+# have received a copy of GPLv2 along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+
+"""
+Compares parsing the indexes of a multi-component synthetic suite one after
+another with parsing them in a pool of processes.
+
+    python test/benchmark/bench_parse.py --components 4 --arches 6 --workers 4
+"""
+
+import json
+import optparse
+import shutil
+import tempfile
+import time
+
+import archive
+from pulp_deb.common import model
+
+
+def main():
+    parser = optparse.OptionParser()
+    parser.add_option('--components', type='int', default=4)
+    parser.add_option('--arches', type='int', default=6)
+    parser.add_option('--packages', type='int', default=2000,
+                      help='packages per component and architecture')
+    parser.add_option('--workers', type='int', action='append',
+                      help='worker counts to compare; may be given multiple times')
+    parser.add_option('--repeat', type='int', default=3)
+    options, args = parser.parse_args()
+
+    root = tempfile.mkdtemp(prefix='bench-parse')
+    try:
+        components = ['component%d' % i for i in range(options.components)]
+        arches = ['arch%d' % i for i in range(options.arches)]
+        dist_config = archive.generate_archive(root, components=components, arches=arches,
+                                               packages=options.packages)
+
+        dist = model.Distribution(**dist_config)
+        resources = dist.get_indexes()
+        for resource in resources:
+            resource['path'] = resource['url'][len('file://'):]
+
+        results = {
+            'indexes': len(resources),
+            'packages_per_index': options.packages,
+            'seconds': {},
+        }
+        for workers in options.workers or [1, 4]:
+            timings = []
+            for i in range(options.repeat):
+                start = time.time()
+                model.parse_indexes(resources, workers=workers)
+                timings.append(time.time() - start)
+            results['seconds'][workers] = min(timings)
+
+        print json.dumps(results, indent=2, sort_keys=True)
+    finally:
+        shutil.rmtree(root)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,239 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright © 2013 Bouvet ASA
+#
+# This software is licensed to you under the GNU General Public
+# License as published by the Free Software Foundation; either version
+# 2 of the License (GPLv2) or (at your option) any later version.
+# There is NO WARRANTY for this software, express or implied,
+# including the implied warranties of MERCHANTABILITY,
+# NON-INFRINGEMENT, or FITNESS FOR A PARTICULAR PURPOSE. You should
+# have received a copy of GPLv2 along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+
+"""
+Measures the stages of mirroring a synthetic archive from local disk: parsing
+its indexes, diffing them against the next generation of the archive, a full
+sync, an incremental sync of the next generation and a publish of the result.
+
+Pulp is stood in for by a conduit keeping the units in memory, so the numbers
+are those of the plugins alone. Each run prints one JSON record; with
+--output it's also appended to a file, one record a line, to track the
+numbers over time.
+
+    python test/benchmark/bench_sync.py --packages 2000 --churn 0.05 \\
+        --output bench-sync.jsonl
+"""
+
+import json
+import optparse
+import os
+import platform
+import shutil
+import subprocess
+import tempfile
+import time
+
+import archive
+from pulp.plugins.config import PluginCallConfiguration
+
+from pulp_deb.common import constants, model
+from pulp_deb.plugins.distributors import publish
+from pulp_deb.plugins.importers import sync
+
+
+# -- public classes -----------------------------------------------------------
+
+class Repository(object):
+    def __init__(self, repo_id, working_dir):
+        self.id = repo_id
+        self.working_dir = working_dir
+
+
+class Unit(object):
+    def __init__(self, type_id, unit_key, metadata, storage_path):
+        self.type_id = type_id
+        self.unit_key = unit_key
+        self.metadata = metadata
+        self.storage_path = storage_path
+
+
+class BenchConduit(object):
+    """
+    Stands in for the sync and publish conduits of one repository, keeping
+    its units in memory.
+    """
+
+    def __init__(self, storage_dir):
+        self.storage_dir = storage_dir
+        self.units = {}
+        self.scratchpad = {}
+
+    def init_unit(self, type_id, unit_key, metadata, relative_path):
+        storage_path = os.path.join(self.storage_dir, relative_path) if relative_path else ''
+        return Unit(type_id, unit_key, metadata, storage_path)
+
+    def save_unit(self, unit):
+        self.units[_unit_id(unit)] = unit
+
+    def remove_unit(self, unit):
+        self.units.pop(_unit_id(unit), None)
+
+    def link_unit(self, parent, child, bidirectional=False):
+        pass
+
+    def get_units(self, criteria=None, as_generator=False):
+        units = self.units.values()
+        return iter(units) if as_generator else units
+
+    def get_repo_scratchpad(self):
+        return self.scratchpad
+
+    def set_repo_scratchpad(self, value):
+        self.scratchpad = value
+
+    def set_progress(self, report):
+        pass
+
+    def build_success_report(self, summary, details):
+        return {'success': True, 'summary': summary, 'details': details}
+
+    def build_failure_report(self, summary, details):
+        return {'success': False, 'summary': summary, 'details': details}
+
+
+# -- public -------------------------------------------------------------------
+
+def main():
+    parser = optparse.OptionParser()
+    parser.add_option('--components', type='int', default=2)
+    parser.add_option('--arches', type='int', default=2)
+    parser.add_option('--packages', type='int', default=1000,
+                      help='packages per component and architecture')
+    parser.add_option('--churn', type='float', default=0.05,
+                      help='share of the packages with a new version in the next generation')
+    parser.add_option('--parse-workers', type='int', default=1)
+    parser.add_option('--output', help='file to append the JSON record to')
+    options, args = parser.parse_args()
+
+    root = tempfile.mkdtemp(prefix='bench-sync')
+    try:
+        results = run(root, options)
+    finally:
+        shutil.rmtree(root)
+
+    record = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'revision': _revision(),
+        'python': platform.python_version(),
+        'options': {
+            'components': options.components,
+            'arches': options.arches,
+            'packages': options.packages,
+            'churn': options.churn,
+            'parse_workers': options.parse_workers,
+        },
+        'results': results,
+    }
+    print json.dumps(record, indent=2, sort_keys=True)
+    if options.output:
+        f = open(options.output, 'a')
+        f.write(json.dumps(record, sort_keys=True) + '\n')
+        f.close()
+
+
+def run(root, options):
+    """
+    Runs every stage against archives generated under root.
+
+    :return: the measurements of each stage
+    :rtype:  dict
+    """
+    components = ['component%d' % i for i in range(options.components)]
+    arches = ['arch%d' % i for i in range(options.arches)]
+
+    feeds = []
+    for generation in (0, 1):
+        feed = os.path.join(root, 'feed%d' % generation)
+        feeds.append(archive.generate_archive(feed, components=components, arches=arches,
+                                              packages=options.packages, churn=options.churn,
+                                              generation=generation, pool=True))
+
+    results = {}
+
+    # Parsing and diffing the indexes
+    parsed = []
+    elapsed = 0
+    for dist_config in feeds:
+        resources = model.Distribution(**dist_config).get_indexes()
+        for resource in resources:
+            resource['path'] = resource['url'][len('file://'):]
+        start = time.time()
+        parsed.append(model.parse_indexes(resources, workers=options.parse_workers))
+        elapsed += time.time() - start
+    records = sum([len(r) for r in parsed[0]])
+    results['parse'] = _throughput(elapsed, records * len(feeds), 'records')
+
+    start = time.time()
+    added = removed = 0
+    for old, new in zip(parsed[0], parsed[1]):
+        a, r = model.diff_records(old, new)
+        added += len(a)
+        removed += len(r)
+    results['diff'] = _throughput(time.time() - start, records, 'records')
+    results['diff'].update({'added': added, 'removed': removed})
+
+    # Mirroring the archive, then its next generation
+    repo = Repository('bench', os.path.join(root, 'working'))
+    os.makedirs(repo.working_dir)
+    conduit = BenchConduit(os.path.join(root, 'storage'))
+
+    for name, dist_config in (('sync_full', feeds[0]), ('sync_incremental', feeds[1])):
+        config = PluginCallConfiguration({}, {
+            constants.CONFIG_DIST: dist_config,
+            constants.CONFIG_PARSE_WORKERS: options.parse_workers,
+        })
+        before = len(conduit.units)
+        start = time.time()
+        report = sync.PackageSyncRun(repo, conduit, config, lambda: False).perform_sync()
+        results[name] = _throughput(time.time() - start, len(conduit.units) - before, 'units')
+        results[name]['success'] = report['success']
+
+    config = PluginCallConfiguration({}, {
+        constants.CONFIG_HTTP_DIR: os.path.join(root, 'http'),
+        constants.CONFIG_PUBLISH_DIST: 'synthetic',
+    })
+    start = time.time()
+    publish.PackagePublishRun(repo, conduit, config).perform_publish()
+    results['publish'] = _throughput(time.time() - start, len(conduit.units), 'units')
+
+    return results
+
+
+# -- private ------------------------------------------------------------------
+
+def _unit_id(unit):
+    return unit.type_id, tuple(sorted(unit.unit_key.items()))
+
+
+def _throughput(seconds, count, unit):
+    return {'seconds': seconds, unit: count,
+            '%s_per_second' % unit: count / seconds if seconds else None}
+
+
+def _revision():
+    """
+    Returns the commit the benchmark ran on, if it's run from a git checkout.
+    """
+    try:
+        process = subprocess.Popen(['git', 'rev-parse', 'HEAD'], stdout=subprocess.PIPE,
+                                   stderr=subprocess.PIPE,
+                                   cwd=os.path.dirname(os.path.abspath(__file__)))
+        stdout, stderr = process.communicate()
+    except OSError:
+        return None
+    return stdout.strip() or None
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,227 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright © 2013 Bouvet ASA
+#
+# This software is licensed to you under the GNU General Public
+# License as published by the Free Software Foundation; either version
+# 2 of the License (GPLv2) or (at your option) any later version.
+# There is NO WARRANTY for this software, express or implied,
+# including the implied warranties of MERCHANTABILITY,
+# NON-INFRINGEMENT, or FITNESS FOR A PARTICULAR PURPOSE. You should
+# have received a copy of GPLv2 along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+
+"""
+A local HTTP server standing in for a remote mirror in the download
+benchmarks. It serves a directory, typically an archive generated with
+archive.generate_archive(), and can be made to behave like a server far
+away: every request waits out a latency, responses are sent at a limited
+bandwidth, a share of the requests fail and connections can be closed after
+every response instead of being kept alive.
+
+The server runs in a process of its own, so it doesn't compete for the
+interpreter lock with the downloads it's measured with.
+
+    with MirrorServer(root, latency=0.05, bandwidth=1024 * 1024) as server:
+        download(server.url + '/dists/synthetic/Release')
+        print server.stats()
+"""
+
+import BaseHTTPServer
+import multiprocessing
+import os
+import random
+import SimpleHTTPServer
+import SocketServer
+import time
+
+
+# -- constants ----------------------------------------------------------------
+
+# Size of the writes a response is sent in when the bandwidth is limited
+CHUNK_SIZE = 16 * 1024
+
+STATS = ('connections', 'requests', 'errors', 'bytes')
+
+
+# -- public classes -----------------------------------------------------------
+
+class MirrorServer(object):
+    """
+    Serves a directory over HTTP on a free port of the loopback interface,
+    from a process of its own.
+    """
+
+    def __init__(self, root, latency=0.0, bandwidth=None, error_rate=0.0, error_status=503,
+                 keep_alive=True, seed=0):
+        """
+        :param root: directory to serve
+        :type  root: str
+        :param latency: seconds every request waits before it's answered
+        :type  latency: float
+        :param bandwidth: bytes per second each response is sent at, None
+                          for as fast as possible
+        :type  bandwidth: int
+        :param error_rate: share of the requests answered with error_status
+                           instead of the file
+        :type  error_rate: float
+        :param error_status: HTTP status of the failed requests
+        :type  error_status: int
+        :param keep_alive: whether connections are kept open for further
+                           requests (HTTP/1.1) or closed after every
+                           response (HTTP/1.0)
+        :type  keep_alive: bool
+        :param seed: seed picking the failed requests
+        :type  seed: int
+        """
+        self.root = os.path.abspath(root)
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.keep_alive = keep_alive
+        self.seed = seed
+
+        # Shared with the server process
+        self.counters = dict([(name, multiprocessing.Value('l', 0)) for name in STATS])
+        self.random = None
+
+        self.server = None
+        self.process = None
+
+    @property
+    def url(self):
+        return 'http://%s:%d' % self.server.server_address
+
+    def start(self):
+        # Bound before the process is started, so the port is known and
+        # connections are accepted as soon as this returns
+        self.server = _ThreadingHTTPServer(('127.0.0.1', 0), _handler_class(self))
+        self.process = multiprocessing.Process(target=self._serve)
+        self.process.daemon = True
+        self.process.start()
+
+    def stop(self):
+        if self.server is not None:
+            self.process.terminate()
+            self.process.join()
+            self.server.server_close()
+            self.server = None
+
+    def stats(self):
+        """
+        :return: counts of the connections accepted, the requests, the
+                 injected errors and the bytes of content sent
+        :rtype:  dict
+        """
+        return dict([(name, value.value) for name, value in self.counters.items()])
+
+    def reset_stats(self):
+        for value in self.counters.values():
+            with value.get_lock():
+                value.value = 0
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+        return False
+
+    def _serve(self):
+        self.random = random.Random(self.seed)
+        self.server.serve_forever()
+
+    def _count(self, **counts):
+        for name, count in counts.items():
+            value = self.counters[name]
+            with value.get_lock():
+                value.value += count
+
+    def _fail(self):
+        return self.error_rate and self.random.random() < self.error_rate
+
+
+# -- private classes ----------------------------------------------------------
+
+class _ThreadingHTTPServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    # Room for every connection of the benchmark to be opened at once; the
+    # default of 5 has the ones over it retried a second later
+    request_queue_size = 128
+
+
+class _MirrorHandler(SimpleHTTPServer.SimpleHTTPRequestHandler):
+    """
+    Serves the files of the mirror, see MirrorServer.
+    """
+
+    mirror = None
+
+    # As mirrors do; the headers and the body are written separately, which
+    # would otherwise stall kept alive connections on delayed ACKs
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        SimpleHTTPServer.SimpleHTTPRequestHandler.setup(self)
+        self.mirror._count(connections=1)
+
+    def translate_path(self, path):
+        path = path.split('?', 1)[0].split('#', 1)[0]
+        parts = [p for p in path.split('/') if p and p not in ('.', '..')]
+        return os.path.join(self.mirror.root, *parts)
+
+    def do_GET(self):
+        self.mirror._count(requests=1)
+        if self.mirror.latency:
+            time.sleep(self.mirror.latency)
+
+        if self.mirror._fail():
+            self.mirror._count(errors=1)
+            self.send_error(self.mirror.error_status)
+            return
+
+        fileobj = self.send_head()
+        if fileobj is None:
+            return
+        try:
+            self._send_body(fileobj)
+        finally:
+            fileobj.close()
+
+    def _send_body(self, fileobj):
+        bandwidth = self.mirror.bandwidth
+        start = time.time()
+        sent = 0
+        while True:
+            data = fileobj.read(CHUNK_SIZE)
+            if not data:
+                break
+            self.wfile.write(data)
+            sent += len(data)
+            if bandwidth:
+                delay = start + float(sent) / bandwidth - time.time()
+                if delay > 0:
+                    time.sleep(delay)
+        self.mirror._count(bytes=sent)
+
+    def log_message(self, format, *args):
+        pass
+
+
+# -- private ------------------------------------------------------------------
+
+def _handler_class(mirror):
+    """
+    Returns a handler class bound to the given mirror; the server creates
+    one handler per connection.
+    """
+    class MirrorHandler(_MirrorHandler):
+        pass
+
+    MirrorHandler.mirror = mirror
+    MirrorHandler.protocol_version = 'HTTP/1.1' if mirror.keep_alive else 'HTTP/1.0'
+    return MirrorHandler
@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright © 2013 Bouvet ASA
+#
+# This software is licensed to you under the GNU General Public
+# License as published by the Free Software Foundation; either version
+# 2 of the License (GPLv2) or (at your option) any later version.
+# There is NO WARRANTY for this software, express or implied,
+# including the implied warranties of MERCHANTABILITY,
+# NON-INFRINGEMENT, or FITNESS FOR A PARTICULAR PURPOSE. You should
+# have received a copy of GPLv2 along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+
+import hashlib
+import os
+import shutil
+import StringIO
+import tarfile
+import tempfile
+import unittest
+
+from pulp_deb.common import debfile
+
+
+def build_tarball(files, mode='w:gz'):
+    """
+    Returns a tarball holding the given {name: content} files and the
+    directories leading to them, with names starting with ./ as in .debs.
+    """
+    buf = StringIO.StringIO()
+    tar = tarfile.open(fileobj=buf, mode=mode)
+    dirs = set()
+    for name in sorted(files):
+        parts = name.split('/')[:-1]
+        for i in range(1, len(parts) + 1):
+            dirs.add('/'.join(parts[:i]))
+    for name in ['.'] + ['./' + d for d in sorted(dirs)]:
+        info = tarfile.TarInfo(name)
+        info.type = tarfile.DIRTYPE
+        tar.addfile(info)
+    for name in sorted(files):
+        info = tarfile.TarInfo('./' + name)
+        info.size = len(files[name])
+        tar.addfile(info, StringIO.StringIO(files[name]))
+    tar.close()
+    return buf.getvalue()
+
+
+CONTROL = """Package: foo
+Version: 1:1.0-1
+Architecture: amd64
+Maintainer: Someone <someone@example.com>
+Section: utils
+Description: does things
+ More about the things.
+"""
+
+
+def build_deb(path, files, data_name='data.tar.gz', mode='w:gz', control=CONTROL):
+    """
+    Writes a .deb installing the given {name: content} files.
+    """
+    control_files = {'md5sums': ''}
+    if control is not None:
+        control_files['control'] = control
+    members = [
+        ('debian-binary', '2.0\n'),
+        ('control.tar.gz', build_tarball(control_files)),
+        (data_name, build_tarball(files, mode)),
+    ]
+    fh = open(path, 'wb')
+    try:
+        fh.write(debfile.AR_MAGIC)
+        for name, data in members:
+            fh.write('%-16s%-12d%-6d%-6d%-8s%-10d`\n' % (name + '/', 0, 0, 0, '100644', len(data)))
+            fh.write(data)
+            if len(data) % 2:
+                fh.write('\n')
+    finally:
+        fh.close()
+
+
+class FileListTests(unittest.TestCase):
+    def setUp(self):
+        self.working_dir = tempfile.mkdtemp(prefix='debfile-tests')
+        self.path = os.path.join(self.working_dir, 'foo_1.0_amd64.deb')
+
+    def tearDown(self):
+        shutil.rmtree(self.working_dir)
+
+    def test_file_list(self):
+        build_deb(self.path, {'usr/bin/foo': 'x' * 1001, 'usr/share/doc/foo/README': 'y'})
+
+        self.assertEqual(sorted(debfile.file_list(self.path)),
+                         ['usr/bin/foo', 'usr/share/doc/foo/README'])
+
+    def test_bz2(self):
+        build_deb(self.path, {'usr/bin/foo': 'x'}, data_name='data.tar.bz2', mode='w:bz2')
+
+        self.assertEqual(debfile.file_list(self.path), ['usr/bin/foo'])
+
+    def test_uncompressed(self):
+        build_deb(self.path, {'usr/bin/foo': 'x'}, data_name='data.tar', mode='w')
+
+        self.assertEqual(debfile.file_list(self.path), ['usr/bin/foo'])
+
+    def test_large_member(self):
+        # Spans several decompression chunks
+        content = os.urandom(3 * debfile.CHUNK_SIZE)
+        build_deb(self.path, {'usr/lib/big': content, 'usr/lib/small': 'x'})
+
+        self.assertEqual(sorted(debfile.file_list(self.path)), ['usr/lib/big', 'usr/lib/small'])
+
+    def test_not_ar(self):
+        open(self.path, 'w').write('not a deb')
+
+        self.assertRaises(debfile.InvalidDebFile, debfile.file_list, self.path)
+
+    def test_unsupported_compression(self):
+        build_deb(self.path, {'usr/bin/foo': 'x'}, data_name='data.tar.zst', mode='w')
+
+        self.assertRaises(debfile.InvalidDebFile, debfile.file_list, self.path)
+
+    def test_truncated(self):
+        build_deb(self.path, {'usr/bin/foo': 'x' * 1000})
+        data = open(self.path, 'rb').read()
+        open(self.path, 'wb').write(data[:-200])
+
+        self.assertRaises(debfile.InvalidDebFile, debfile.file_list, self.path)
+
+
+class InspectTests(unittest.TestCase):
+    def setUp(self):
+        self.working_dir = tempfile.mkdtemp(prefix='debfile-tests')
+        self.path = os.path.join(self.working_dir, 'foo_1.0_amd64.deb')
+
+    def tearDown(self):
+        shutil.rmtree(self.working_dir)
+
+    def test_inspect(self):
+        build_deb(self.path, {'usr/bin/foo': os.urandom(3 * debfile.CHUNK_SIZE)})
+        content = open(self.path, 'rb').read()
+
+        control, checksums = debfile.inspect(self.path)
+
+        self.assertEqual(control, CONTROL)
+        self.assertEqual(checksums, {
+            'size': len(content),
+            'md5sum': hashlib.md5(content).hexdigest(),
+            'sha1': hashlib.sha1(content).hexdigest(),
+            'sha256': hashlib.sha256(content).hexdigest(),
+        })
+
+    def test_no_control(self):
+        build_deb(self.path, {'usr/bin/foo': 'x'}, control=None)
+
+        self.assertRaises(debfile.InvalidDebFile, debfile.inspect, self.path)
+
+    def test_truncated(self):
+        build_deb(self.path, {'usr/bin/foo': 'x' * 1000})
+        data = open(self.path, 'rb').read()
+        open(self.path, 'wb').write(data[:-200])
+
+        self.assertRaises(debfile.InvalidDebFile, debfile.inspect, self.path)
+
+
+class IterMembersTests(unittest.TestCase):
+    def test_members(self):
+        fh = StringIO.StringIO()
+        fh.write(debfile.AR_MAGIC)
+        for name, data in (('debian-binary', '2.0\n'), ('odd', 'abc'), ('last', 'z')):
+            fh.write('%-16s%-12d%-6d%-6d%-8s%-10d`\n' % (name, 0, 0, 0, '100644', len(data)))
+            fh.write(data + '\n' * (len(data) % 2))
+        fh.seek(0)
+
+        members = [(name, member.read()) for name, member in debfile.iter_members(fh)]
+
+        self.assertEqual(members, [('debian-binary', '2.0\n'), ('odd', 'abc'), ('last', 'z')])
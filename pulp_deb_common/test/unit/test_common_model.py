@@ -11,10 +11,11 @@
 # have received a copy of GPLv2 along with this software; if not, see
 # http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
 
+import os
 import unittest
 from debian.deb822 import Packages, Sources
 
-from pulp_deb.common import constants, model, samples, utils
+from pulp_deb.common import constants, model, query, samples, utils
 
 
 # -- test cases ---------------------------------------------------------------
@@ -48,6 +49,151 @@ class UtilTests(unittest.TestCase):
         self.assertEqual(Packages, model.get_deb822_cls('Packages.gz'))
         self.assertEqual(Sources, model.get_deb822_cls('Sources.gz'))
 
+    def test_cls_from_string_compressions(self):
+        self.assertEqual(Packages, model.get_deb822_cls('main/binary-i386/Packages.xz'))
+        self.assertEqual(Packages, model.get_deb822_cls('Packages'))
+        self.assertEqual(Sources, model.get_deb822_cls('/tmp/Sources.bz2'))
+
+
+class RecordsTests(unittest.TestCase):
+    def setUp(self):
+        self.dist = samples.get_valid_repo()
+        self.cmpt = self.dist['components'][0]
+
+    def _resource(self, index_type):
+        for resource in self.cmpt.get_indexes():
+            if resource['type'] == index_type:
+                resource['path'] = resource['url'][len('file://'):]
+                return resource
+
+    def test_parse_index(self):
+        records = model.parse_index(self._resource('packages'))
+
+        self.assertEquals(len(records), 1)
+        self.assertEquals(type(records[0]), dict)
+        self.assertEquals(records[0]['Package'], 'libdaemon0')
+
+    def test_parse_index_mapped(self):
+        compressed = self._resource('packages')
+        uncompressed = dict(compressed, path=os.path.splitext(compressed['path'])[0])
+
+        self.assertEquals(model.parse_index(uncompressed), model.parse_index(compressed))
+
+    def test_scan_records(self):
+        content = ('# comment\n'
+                   '\n'
+                   'Package: foo\n'
+                   'Version: 1.0  \n'
+                   'Description: short\n'
+                   ' long line\n'
+                   ' .\n'
+                   ' more\n'
+                   'Files:\n'
+                   ' abc 12 foo_1.0.tar.gz\n'
+                   'Empty:\n'
+                   '\n'
+                   'Package: bar\n'
+                   'Depends: a,\n'
+                   '  b\n'
+                   '\n'
+                   '\n'
+                   'Package: b\xc3\xa5z\n')
+
+        records = model.scan_records(content)
+
+        paragraphs = Packages.iter_paragraphs(content.splitlines(True))
+        self.assertEquals(records, [dict([(k, p.get_as_string(k)) for k in p])
+                                    for p in paragraphs])
+        self.assertEquals(len(records), 3)
+        self.assertEquals(records[0]['Description'], 'short\n long line\n .\n more')
+        self.assertEquals(records[0]['Files'], '\n abc 12 foo_1.0.tar.gz')
+        self.assertEquals(records[2]['Package'], u'b\xe5z')
+
+    def test_parse_indexes_in_pool(self):
+        resources = [self._resource('packages'), self._resource('sources')]
+
+        sequential = model.parse_indexes(resources)
+        pooled = model.parse_indexes(resources, workers=2)
+
+        self.assertEquals(len(pooled), 2)
+        self.assertEquals(pooled, sequential)
+
+    def test_parse_indexes_timings(self):
+        resources = [self._resource('packages'), self._resource('sources')]
+
+        for workers in (1, 2):
+            timings = []
+            model.parse_indexes(resources, workers=workers, timings=timings)
+
+            self.assertEquals(len(timings), 2)
+            for index_timings in timings:
+                self.assertTrue(index_timings['decompress'] >= 0)
+                self.assertTrue(index_timings['parse'] >= 0)
+                self.assertTrue(index_timings['bytes'] > 0)
+
+    def test_update_from_resources_in_pool(self):
+        resources = []
+        for resource in self.cmpt.get_indexes():
+            resource['path'] = resource['url'][len('file://'):]
+            resources.append(resource)
+
+        self.dist.update_from_resources(resources, workers=2)
+        self.assertEquals(len(self.cmpt.packages), 3)
+
+    def test_records_round_trip(self):
+        resource = self._resource('sources')
+        records = model.parse_index(resource)
+
+        self.dist.update_from_records(resource, records)
+
+        pkg = self.cmpt.packages[0]
+        self.assertEquals(pkg.package_type, 'source')
+        self.assertEquals(type(pkg['files']), list)
+        self.assertEquals(len(pkg.files), len(pkg['files']))
+
+    def test_update_from_records_with_predicate(self):
+        resource = self._resource('packages')
+        records = model.parse_index(resource)
+
+        self.dist.update_from_records(resource, records,
+                                      predicate=query.compile_queries(['foo']))
+        self.assertEquals(len(self.cmpt.packages), 0)
+
+    def test_diff_records(self):
+        old = [{'Package': 'foo', 'Version': '1.0', 'Architecture': 'amd64'},
+               {'Package': 'bar', 'Version': '1.0', 'Architecture': 'amd64'}]
+        new = [{'Package': 'foo', 'Version': '1.0', 'Architecture': 'amd64'},
+               {'Package': 'bar', 'Version': '1.1', 'Architecture': 'amd64'}]
+
+        added, removed = model.diff_records(old, new)
+        self.assertEquals(added, set([('bar', '1.1', 'amd64')]))
+        self.assertEquals(removed, set([('bar', '1.0', 'amd64')]))
+
+
+class LatestPackagesTests(unittest.TestCase):
+    def _package(self, name, version, arch='amd64'):
+        return model.Package(Package=name, Source=name, Version=version,
+                             Architecture=arch, Maintainer='foo')
+
+    def test_latest_packages(self):
+        packages = [
+            self._package('foo', '1.0-1'),
+            self._package('foo', '1.0-10'),
+            self._package('foo', '1:0.9-1'),
+            self._package('foo', '1.0-2', arch='i386'),
+            self._package('bar', '2.0')]
+
+        latest = model.latest_packages(packages, 1)
+
+        versions = sorted([(p.name, p.architecture, p['version']) for p in latest])
+        self.assertEquals(versions, [('bar', 'amd64', '2.0'),
+                                     ('foo', 'amd64', '1:0.9-1'),
+                                     ('foo', 'i386', '1.0-2')])
+
+    def test_latest_packages_keeps_small_groups(self):
+        packages = [self._package('foo', '1.0'), self._package('foo', '1.1')]
+        self.assertEquals(len(model.latest_packages(packages, 2)), 2)
+
 
 class DistributionTests(unittest.TestCase):
     def test_serialize_dist_wo_packages(self):
@@ -72,6 +218,130 @@ class DistributionTests(unittest.TestCase):
         indexes = dist.get_indexes()
         self.assertEquals(len(indexes), 3)
 
+    def test_get_component(self):
+        dist = samples.get_valid_repo()
+
+        self.assertTrue(dist.get_component('main') is dist.components[0])
+        self.assertEquals(dist.get_component('missing'), None)
+
+    def test_duplicate_component(self):
+        data = samples.get_data('dist')
+        data['components'] = data['components'] * 2
+
+        self.assertRaises(ValueError, model.Distribution, **data)
+
+    def test_package_indexes(self):
+        dist = samples.get_valid_repo()
+        cmpt = dist.components[0]
+        cmpt.update_from_indexes([i['url'][len('file://'):] for i in cmpt.get_indexes()])
+
+        self.assertEquals(dist.packages, cmpt.packages)
+        for pkg in cmpt.packages:
+            # Binary packages of each architecture share a key
+            self.assertEquals(dist.get_package(pkg.key).key, pkg.key)
+            self.assertTrue(pkg in dist.get_packages(pkg.name, pkg.architecture))
+        self.assertEquals(dist.get_package('missing'), None)
+        self.assertEquals(dist.get_packages('missing'), [])
+
+    def test_get_packages_all_architectures(self):
+        dist = samples.get_model('dist')
+        component = DATA['component']['name']
+        for arch, version in [('amd64', '1.0'), ('i386', '1.0'), ('amd64', '1.1')]:
+            dist.add_package(component, dict(DATA['package'], architecture=arch,
+                                             version=version))
+
+        name = dist.packages[0].name
+        self.assertEquals([(p.architecture, p['version']) for p in dist.get_packages(name)],
+                          [('amd64', '1.0'), ('i386', '1.0'), ('amd64', '1.1')])
+        self.assertEquals([p['version'] for p in dist.get_packages(name, 'amd64')],
+                          ['1.0', '1.1'])
+        self.assertEquals(dist.get_packages(name, 'armhf'), [])
+
+    def test_package_key(self):
+        pkg = model.Package(Package='foo', Source='foo', Version='1.0', Maintainer='bar',
+                            Architecture='all')
+
+        self.assertEquals(pkg.key, constants.DEB_KEY % pkg.to_dict())
+
+    def test_get_indexes_without_release(self):
+        dist = samples.get_valid_repo()
+        for index in dist.get_indexes():
+            self.assertTrue(index['url'].endswith(constants.DEFAULT_COMPRESSION))
+
+    def test_update_from_release(self):
+        dist = samples.get_valid_repo()
+        release = dist.get_release_resource()
+        dist.update_from_release(release['url'][len('file://'):])
+
+        info = dist.release_files['main/binary-amd64/Packages.gz']
+        self.assertEquals(info['size'], 790)
+        self.assertEquals(info['md5sum'], '39c81b6f140f2a776e07e789dbd57ce5')
+        self.assertTrue('sha256' in info)
+
+    def test_get_compression(self):
+        dist = samples.get_valid_repo()
+        dist.release_files = {
+            'main/binary-amd64/Packages': {},
+            'main/binary-amd64/Packages.gz': {},
+            'main/binary-amd64/Packages.bz2': {},
+        }
+        path = 'main/binary-amd64/Packages'
+
+        bandwidth = constants.COMPRESSION_PREFERENCES['bandwidth']
+        cpu = constants.COMPRESSION_PREFERENCES['cpu']
+        self.assertEquals(dist.get_compression(path, bandwidth), '.bz2')
+        self.assertEquals(dist.get_compression(path, cpu), '')
+        self.assertEquals(dist.get_compression('main/source/Sources', cpu),
+                          constants.DEFAULT_COMPRESSION)
+
+    def test_get_indexes_with_preference(self):
+        dist = samples.get_valid_repo()
+        release = dist.get_release_resource()
+        dist.update_from_release(release['url'][len('file://'):])
+
+        indexes = dist.get_indexes(constants.COMPRESSION_PREFERENCES['cpu'])
+        urls = [i['url'].split('/dists/')[1] for i in indexes]
+        self.assertEquals(sorted(urls), ['precise/main/binary-amd64/Packages',
+                                         'precise/main/binary-i386/Packages',
+                                         'precise/main/source/Sources'])
+
+    def test_get_indexes_with_extra(self):
+        dist = samples.get_valid_repo()
+        dist.release_files = {
+            'main/binary-amd64/Packages.gz': {},
+            'main/Contents-amd64.gz': {},
+            'main/Contents-all.gz': {},
+            'main/Contents-all.bz2': {},
+            'Contents-i386.gz': {},
+            'main/i18n/Translation-en': {},
+            'main/i18n/Translation-en.bz2': {},
+            'main/i18n/Translation-pt_BR.gz': {},
+            'contrib/i18n/Translation-en.gz': {},
+        }
+
+        indexes = dist.get_indexes(constants.COMPRESSION_PREFERENCES['bandwidth'],
+                                   extra=constants.EXTRA_INDEX_TYPES)
+        extra = sorted([(i['type'], i['relative_path']) for i in indexes
+                        if i['type'] in constants.EXTRA_INDEX_TYPES])
+
+        self.assertEquals(extra, [
+            ('contents', 'Contents-i386.gz'),
+            ('contents', 'main/Contents-all.bz2'),
+            ('contents', 'main/Contents-amd64.gz'),
+            ('translation', 'main/i18n/Translation-en.bz2'),
+            ('translation', 'main/i18n/Translation-pt_BR.gz'),
+        ])
+        for index in indexes:
+            if index['type'] in constants.EXTRA_INDEX_TYPES:
+                self.assertTrue(index['url'].endswith('/dists/precise/' + index['relative_path']))
+
+    def test_get_indexes_extra_without_release(self):
+        dist = samples.get_valid_repo()
+
+        indexes = dist.get_indexes(extra=constants.EXTRA_INDEX_TYPES)
+
+        self.assertEquals(len(indexes), 3)
+
 
 class ComponentTests(unittest.TestCase):
     def setUp(self):
@@ -102,6 +372,14 @@ class ComponentTests(unittest.TestCase):
         self.cmpt.update_from_indexes(resources)
         self.assertEquals(len(self.cmpt.data['packages']), 3)
 
+    def test_update_from_index_with_predicate(self):
+        indexes = [i['url'][len('file://'):] for i in self.cmpt.get_indexes()]
+        predicate = query.compile_queries(['arch=amd64'])
+
+        for index in indexes:
+            self.cmpt.update_from_index(index, predicate=predicate)
+        self.assertEquals(len(self.cmpt.data['packages']), 1)
+
     def test_update_from_resources_with_content(self):
         resources = []
         for resource in self.cmpt.get_indexes():
@@ -129,3 +407,15 @@ class PackageTests(unittest.TestCase):
 
     def test_prefix(self):
         self.assertEquals(PACKAGE['package'][0:4], self.pkg.prefix)
+
+    def test_from_dict_split_source(self):
+        # As stored in units, with the multivalued fields already split
+        files = [{'md5sum': 'a' * 32, 'size': '10', 'name': 'foo_1.0.dsc'}]
+        sha256 = [{'sha256': 'b' * 64, 'size': '10', 'name': 'foo_1.0.dsc'}]
+        pkg = model.Package.from_dict({'package': 'foo', 'binary': 'foo', 'version': '1.0',
+                                       'maintainer': 'x', 'files': files,
+                                       'checksums-sha256': sha256})
+
+        self.assertEquals(pkg.package_type, 'source')
+        self.assertEquals(pkg['files'], files)
+        self.assertEquals(pkg['checksums-sha256'], sha256)
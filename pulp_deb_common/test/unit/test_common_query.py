@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright © 2013 Bouvet ASA
+#
+# This software is licensed to you under the GNU General Public
+# License as published by the Free Software Foundation; either version
+# 2 of the License (GPLv2) or (at your option) any later version.
+# There is NO WARRANTY for this software, express or implied,
+# including the implied warranties of MERCHANTABILITY,
+# NON-INFRINGEMENT, or FITNESS FOR A PARTICULAR PURPOSE. You should
+# have received a copy of GPLv2 along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+
+import unittest
+from debian.deb822 import Packages, Sources
+
+from pulp_deb.common import query, samples
+
+
+PACKAGE = Packages(samples.load('package'))
+
+
+class CompileQueriesTests(unittest.TestCase):
+    def _matches(self, *queries):
+        return query.compile_queries(list(queries))(PACKAGE)
+
+    def test_no_queries(self):
+        self.assertEquals(query.compile_queries(None), None)
+        self.assertEquals(query.compile_queries([]), None)
+        self.assertEquals(query.compile_queries(['  ']), None)
+
+    def test_name_glob(self):
+        self.assertTrue(self._matches('libdaemon*'))
+        self.assertTrue(self._matches('name=libdaemon?'))
+        self.assertFalse(self._matches('name=libfoo*'))
+
+    def test_regex(self):
+        self.assertTrue(self._matches('name~^lib(daemon|foo)0$'))
+        self.assertFalse(self._matches('name~^daemon'))
+
+    def test_fields(self):
+        self.assertTrue(self._matches('section=libs priority=optional'))
+        self.assertFalse(self._matches('section=LIBS'))
+        self.assertFalse(self._matches('section=libs priority=extra'))
+        self.assertTrue(self._matches('section!=debug'))
+        self.assertTrue(self._matches('homepage=*0pointer.de*'))
+
+    def test_arch(self):
+        self.assertTrue(self._matches('arch=amd64'))
+        self.assertFalse(self._matches('arch=i386'))
+
+        source = Sources({'Package': 'libdaemon', 'Architecture': 'amd64 i386'})
+        predicate = query.compile_queries(['arch=i386'])
+        self.assertTrue(predicate(source))
+
+    def test_version(self):
+        self.assertTrue(self._matches('version>=0.14-1'))
+        self.assertTrue(self._matches('version=0.14-2'))
+        self.assertTrue(self._matches('version<<1:0.1'))
+        self.assertFalse(self._matches('version>>0.14-2'))
+        self.assertTrue(self._matches('version>0.14 version<0.15'))
+
+    def test_any_query_matches(self):
+        self.assertTrue(self._matches('name=foo', 'section=libs'))
+        self.assertFalse(self._matches('name=foo', 'section=net'))
+
+    def test_missing_field(self):
+        self.assertFalse(self._matches('tag=*'))
+        self.assertTrue(self._matches('tag!=foo'))
+
+    def test_invalid(self):
+        for q in ['name~(', 'section>>libs', 'version~1.0', 'version>=a!!b', 42]:
+            try:
+                query.compile_queries([q])
+                self.fail()
+            except query.InvalidQuery, e:
+                self.assertEqual(e.query, q)
+
+    def test_malformed_paragraph_version(self):
+        predicate = query.compile_queries(['version>=1.0'])
+
+        self.assertFalse(predicate({'Package': 'foo', 'Version': 'a!!b'}))
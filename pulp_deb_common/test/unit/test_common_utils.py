@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright © 2013 Bouvet ASA
+#
+# This software is licensed to you under the GNU General Public
+# License as published by the Free Software Foundation; either version
+# 2 of the License (GPLv2) or (at your option) any later version.
+# There is NO WARRANTY for this software, express or implied,
+# including the implied warranties of MERCHANTABILITY,
+# NON-INFRINGEMENT, or FITNESS FOR A PARTICULAR PURPOSE. You should
+# have received a copy of GPLv2 along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+
+import bz2
+import gzip
+import hashlib
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+from pulp_deb.common import utils
+
+
+CONTENT = 'Package: foo\nVersion: 1.0\n\nPackage: bar\nVersion: 2.0\n'
+
+
+class ReadTests(unittest.TestCase):
+    def setUp(self):
+        self.working_dir = tempfile.mkdtemp(prefix='utils-tests')
+
+    def tearDown(self):
+        shutil.rmtree(self.working_dir)
+
+    def _write(self, name, opener):
+        path = os.path.join(self.working_dir, name)
+        f = opener(path, 'w')
+        f.write(CONTENT)
+        f.close()
+        return path
+
+    def test_read_uncompressed(self):
+        path = self._write('Packages', open)
+        self.assertEqual(utils._read(path, as_list=False), CONTENT)
+
+    def test_read_gz(self):
+        path = self._write('Packages.gz', gzip.open)
+        self.assertEqual(utils._read(path), CONTENT.splitlines(True))
+
+    def test_read_bz2(self):
+        path = self._write('Packages.bz2', bz2.BZ2File)
+        self.assertEqual(utils._read(path, as_list=False), CONTENT)
+
+    def test_read_xz(self):
+        if utils.lzma is None:
+            self.assertFalse(utils.supported_compression('.xz'))
+            return
+        path = self._write('Packages.xz', utils.lzma.LZMAFile)
+        self.assertEqual(utils._read(path, as_list=False), CONTENT)
+
+    def test_read_missing(self):
+        path = os.path.join(self.working_dir, 'Packages')
+        self.assertEqual(utils._read(path, empty_on_io=True), [])
+        self.assertRaises(IOError, utils._read, path)
+
+    def test_supported_compression(self):
+        for extension in ('', '.gz', '.bz2'):
+            self.assertTrue(utils.supported_compression(extension))
+        self.assertFalse(utils.supported_compression('.lz'))
+
+
+class FileDigestTests(unittest.TestCase):
+    def test_file_digest(self):
+        fd, path = tempfile.mkstemp()
+        os.write(fd, CONTENT)
+        os.close(fd)
+        try:
+            self.assertEqual(utils.file_digest(path), hashlib.sha256(CONTENT).hexdigest())
+            self.assertEqual(utils.file_digest(path, 'md5'), hashlib.md5(CONTENT).hexdigest())
+        finally:
+            os.remove(path)
+
+
+class MonotonicTests(unittest.TestCase):
+    def test_monotonic(self):
+        readings = [utils.monotonic() for i in range(100)]
+
+        self.assertEqual(readings, sorted(readings))
+        self.assertTrue(isinstance(readings[0], float))
+
+
+class LazyImportTests(unittest.TestCase):
+    def test_lazy_import(self):
+        sys.modules.pop('colorsys', None)
+
+        colorsys = utils.lazy_import('colorsys')
+        self.assertFalse('colorsys' in sys.modules)
+
+        self.assertEqual(colorsys.rgb_to_hsv(1.0, 0.0, 0.0), (0.0, 1.0, 1.0))
+        self.assertTrue('colorsys' in sys.modules)
+
+    def test_lazy_import_missing(self):
+        missing = utils.lazy_import('pulp_deb.common.missing')
+
+        self.assertRaises(ImportError, getattr, missing, 'anything')
@@ -34,12 +34,20 @@ OPTION_ARCH = PulpCliOption('--arch', DESC_ARCH, required=False)
 
 
 DESC_QUERY = _(
-    'query to issue against the feed\'s packages.json file to scope which '
-    'packages are imported; multiple queries may be added by specifying this '
-    'argument multiple times'
+    'query to issue against the feed\'s Packages and Sources indexes to scope '
+    'which packages are imported, e.g. "name=lib* section=libs version>=1.0"; '
+    'all terms of a query must match. Fields may be matched with a glob (=, '
+    '!=) or a regular expression (~), the version with <<, <=, =, >= or >>. '
+    'Multiple queries may be added by specifying this argument multiple times'
 )
 OPTION_QUERY = PulpCliOption('--query', DESC_QUERY, required=False, allow_multiple=True)
 
+DESC_RETAIN_VERSIONS = _(
+    'number of versions of each package and architecture to keep from the '
+    'feed; older versions are not downloaded. 0 keeps every version'
+)
+OPTION_RETAIN_VERSIONS = PulpCliOption('--retain-versions', DESC_RETAIN_VERSIONS, required=False)
+
 DESC_INSECURE = _('if "true", the repository will be served over HTTPS; defaults to false')
 OPTION_INSECURE = PulpCliOption('--serve-insecure', DESC_INSECURE, required=False)
 
@@ -55,6 +63,7 @@ class CreateRepositoryCommand(cudl.CreateRepositoryCommand):
         self.add_option(OPTION_COMPONENT)
         self.add_option(OPTION_ARCH)
         self.add_option(OPTION_QUERY)
+        self.add_option(OPTION_RETAIN_VERSIONS)
         self.add_option(OPTION_INSECURE)
 
     def run(self, **kwargs):
@@ -76,6 +85,7 @@ class CreateRepositoryCommand(cudl.CreateRepositoryCommand):
             constants.CONFIG_COMPONENT: kwargs[OPTION_COMPONENT.keyword],
             constants.CONFIG_ARCH: kwargs[OPTION_ARCH.keyword],
             constants.CONFIG_QUERIES: kwargs[OPTION_QUERY.keyword],
+            constants.CONFIG_RETAIN_VERSIONS: kwargs[OPTION_RETAIN_VERSIONS.keyword],
         }
         arg_utils.convert_removed_options(importer_config)
 
@@ -85,7 +95,7 @@ class CreateRepositoryCommand(cudl.CreateRepositoryCommand):
         }
 
         arg_utils.convert_removed_options(distributor_config)
-        arg_utils.convert_boolean_arguments((constants.CONFIG_SERVE_INSECURE), distributor_config)
+        arg_utils.convert_boolean_arguments((constants.CONFIG_SERVE_INSECURE,), distributor_config)
 
         distributors = [
             dict(distributor_type=constants.DISTRIBUTOR_TYPE_ID, distributor_config=distributor_config,
@@ -94,8 +104,7 @@ class CreateRepositoryCommand(cudl.CreateRepositoryCommand):
 
         # Create the repository
         self.context.server.repo.create_and_configure(repo_id, name, description,
-            notes, constants.IMPORTER_TYPE_ID, importer_config)
-        #notes, constants.IMPORTER_TYPE_ID, importer_config, distributors)
+            notes, constants.IMPORTER_TYPE_ID, importer_config, distributors)
         msg = _('Successfully created repository [%(r)s]')
         self.context.prompt.render_success_message(msg % {'r': repo_id})
 
@@ -115,6 +124,7 @@ class UpdateRepositoryCommand(cudl.UpdateRepositoryCommand):
             constants.CONFIG_COMPONENT: kwargs[OPTION_COMPONENT.keyword],
             constants.CONFIG_ARCH: kwargs[OPTION_ARCH.keyword],
             constants.CONFIG_QUERIES: kwargs[OPTION_QUERY.keyword],
+            constants.CONFIG_RETAIN_VERSIONS: kwargs[OPTION_RETAIN_VERSIONS.keyword],
         }
         arg_utils.convert_removed_options(importer_config)
 
@@ -124,7 +134,7 @@ class UpdateRepositoryCommand(cudl.UpdateRepositoryCommand):
         }
 
         arg_utils.convert_removed_options(distributor_config)
-        arg_utils.convert_boolean_arguments((constants.CONFIG_SERVE_HTTP, constants.CONFIG_SERVE_HTTPS), distributor_config)
+        arg_utils.convert_boolean_arguments((constants.CONFIG_SERVE_INSECURE,), distributor_config)
 
         distributor_configs = {constants.DISTRIBUTOR_ID: distributor_config}
 
@@ -0,0 +1,209 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright © 2013 Bouvet ASA
+#
+# This software is licensed to you under the GNU General Public
+# License as published by the Free Software Foundation; either version
+# 2 of the License (GPLv2) or (at your option) any later version.
+# There is NO WARRANTY for this software, express or implied,
+# including the implied warranties of MERCHANTABILITY,
+# NON-INFRINGEMENT, or FITNESS FOR A PARTICULAR PURPOSE. You should
+# have received a copy of GPLv2 along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+
+"""
+On-disk cache of values keyed by the digest of the content they were derived
+from, kept in a plugin's working directory.
+"""
+
+import logging
+import marshal
+import os
+import re
+import tempfile
+
+_LOG = logging.getLogger(__name__)
+
+# -- constants ----------------------------------------------------------------
+
+DIGEST_RE = re.compile('^[0-9a-f]+$')
+
+# File holding the name to digest mapping
+NAMES_FILENAME = 'names'
+
+ENTRY_SUFFIX = '.marshal'
+
+
+# -- public classes -----------------------------------------------------------
+
+class DigestCache(object):
+    """
+    Stores marshalled values under the digest of their source content. Values
+    are limited to what marshal supports (dicts, lists, strings, numbers),
+    which keeps loading them close to the speed of reading the file.
+
+    Once the entries exceed max_size bytes the least recently used ones are
+    evicted; an entry's modification time is bumped whenever it's read.
+
+    A name (e.g. the URL of an index) can be attached to an entry when it's
+    stored, so the previous version of something that changed can be found.
+    """
+
+    def __init__(self, directory, max_size):
+        """
+        :param directory: where to keep the entries; created if missing
+        :type  directory: str
+        :param max_size: maximum total size of the entries in bytes
+        :type  max_size: int
+        """
+        self.directory = directory
+        self.max_size = max_size
+
+    def get(self, digest):
+        """
+        Returns the value stored for the digest.
+
+        :return: the cached value or None if there is none
+        """
+        path = self._path(digest)
+        if path is None or not os.path.exists(path):
+            return None
+
+        try:
+            fh = open(path, 'rb')
+            try:
+                value = marshal.load(fh)
+            finally:
+                fh.close()
+        except (IOError, EOFError, ValueError, TypeError):
+            _LOG.warn('Discarding unreadable cache entry <%s>' % path)
+            self._remove(path)
+            return None
+
+        os.utime(path, None)
+        return value
+
+    def put(self, digest, value, name=None, evict=True):
+        """
+        Stores the value for the digest, evicting old entries if the cache
+        grew too large.
+
+        :param name: name to remember the digest under, see lookup()
+        :type  name: str
+        :param evict: whether to evict now; callers storing many entries can
+                      pass False and call evict() once they are done
+        :type  evict: bool
+        """
+        path = self._path(digest)
+        if path is None:
+            raise ValueError('Invalid digest <%s>' % digest)
+        self._ensure_directory()
+
+        # Write to a temporary file first so readers never see half an entry
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory)
+        try:
+            fh = os.fdopen(fd, 'wb')
+            try:
+                marshal.dump(value, fh)
+            finally:
+                fh.close()
+            os.rename(tmp_path, path)
+        except:
+            self._remove(tmp_path)
+            raise
+
+        if name is not None:
+            names = self._names()
+            names[name] = digest
+            self._write_names(names)
+
+        if evict:
+            self.evict()
+
+    def lookup(self, name):
+        """
+        Returns the digest most recently stored under the given name.
+
+        :return: digest or None if nothing was stored under the name
+        :rtype:  str
+        """
+        return self._names().get(name)
+
+    def evict(self):
+        """
+        Removes the least recently used entries until the cache fits in its
+        maximum size, and the names of the removed entries.
+        """
+        entries = []
+        total = 0
+        for path in self._entry_paths():
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+            total += st.st_size
+
+        entries.sort()
+        removed = False
+        while entries and total > self.max_size:
+            mtime, size, path = entries.pop(0)
+            self._remove(path)
+            total -= size
+            removed = True
+
+        if removed:
+            self._prune_names()
+
+    # -- private --------------------------------------------------------------
+
+    def _path(self, digest):
+        if not digest or not DIGEST_RE.match(digest):
+            return None
+        return os.path.join(self.directory, digest + ENTRY_SUFFIX)
+
+    def _entry_paths(self):
+        if not os.path.isdir(self.directory):
+            return []
+        return [os.path.join(self.directory, f) for f in os.listdir(self.directory)
+                if f.endswith(ENTRY_SUFFIX)]
+
+    def _ensure_directory(self):
+        if not os.path.exists(self.directory):
+            os.makedirs(self.directory)
+
+    def _names(self):
+        path = os.path.join(self.directory, NAMES_FILENAME)
+        try:
+            fh = open(path, 'rb')
+            try:
+                return marshal.load(fh)
+            finally:
+                fh.close()
+        except (IOError, EOFError, ValueError, TypeError):
+            return {}
+
+    def _write_names(self, names):
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory)
+        fh = os.fdopen(fd, 'wb')
+        try:
+            marshal.dump(names, fh)
+        finally:
+            fh.close()
+        os.rename(tmp_path, os.path.join(self.directory, NAMES_FILENAME))
+
+    def _prune_names(self):
+        """
+        Drops the names whose entry is gone, so the names file doesn't keep
+        growing with every name ever stored.
+        """
+        names = self._names()
+        kept = dict([(n, d) for n, d in names.items() if os.path.exists(self._path(d))])
+        if len(kept) != len(names):
+            self._write_names(kept)
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
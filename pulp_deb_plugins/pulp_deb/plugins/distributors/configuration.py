@@ -0,0 +1,225 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright © 2013 Bouvet ASA
+#
+# This software is licensed to you under the GNU General Public
+# License as published by the Free Software Foundation; either version
+# 2 of the License (GPLv2) or (at your option) any later version.
+# There is NO WARRANTY for this software, express or implied,
+# including the implied warranties of MERCHANTABILITY,
+# NON-INFRINGEMENT, or FITNESS FOR A PARTICULAR PURPOSE. You should
+# have received a copy of GPLv2 along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+
+from gettext import gettext as _
+import os
+
+from pulp_deb.common import constants
+
+
+def validate(config):
+    """
+    Validates the configuration for the package distributor.
+
+    :param config: configuration passed in by Pulp
+    :type  config: pulp.plugins.config.PluginCallConfiguration
+
+    :return: the expected return from the plugin's validate_config method
+    :rtype:  tuple
+    """
+
+    validations = (
+        _validate_serve_http,
+        _validate_serve_https,
+        _validate_publish_dist,
+        _validate_incremental_publish,
+        _validate_compress_workers,
+        _validate_pool_link,
+        _validate_by_hash,
+        _validate_by_hash_generations,
+        _validate_by_hash_grace,
+        _validate_generate_contents,
+        _validate_contents_workers,
+        _validate_contents_cache_size,
+        _validate_gpg_key,
+        _validate_gpg_home,
+    )
+
+    for validator in validations:
+        result, msg = validator(config)
+        if not result:
+            return result, msg
+
+    return True, None
+
+
+def _validate_serve_http(config):
+    """
+    Validates the serve HTTP value if it is specified.
+    """
+    return _validate_boolean(config, constants.CONFIG_SERVE_HTTP)
+
+
+def _validate_serve_https(config):
+    """
+    Validates the serve HTTPS value if it is specified.
+    """
+    return _validate_boolean(config, constants.CONFIG_SERVE_HTTPS)
+
+
+def _validate_publish_dist(config):
+    """
+    Validates the name of the published distribution if it is specified.
+    """
+
+    # The name is optional
+    if constants.CONFIG_PUBLISH_DIST not in config.keys():
+        return True, None
+
+    dist = config.get(constants.CONFIG_PUBLISH_DIST)
+    if not dist or '/' in dist or dist.startswith('.'):
+        msg = 'The value for <%(d)s> must be a single directory name'
+        return False, _(msg) % {'d': constants.CONFIG_PUBLISH_DIST}
+    return True, None
+
+
+def _validate_incremental_publish(config):
+    """
+    Validates the incremental publish value if it is specified.
+    """
+    return _validate_boolean(config, constants.CONFIG_INCREMENTAL_PUBLISH)
+
+
+def _validate_compress_workers(config):
+    """
+    Validates the number of index compression processes if it is specified.
+    """
+    return _validate_non_negative_integer(config, constants.CONFIG_COMPRESS_WORKERS)
+
+
+def _validate_pool_link(config):
+    """
+    Validates how packages are linked into the pool if it is specified.
+    """
+
+    # The value is optional
+    if constants.CONFIG_POOL_LINK not in config.keys():
+        return True, None
+
+    if config.get(constants.CONFIG_POOL_LINK) not in constants.POOL_LINKS:
+        msg = 'The value for <%(l)s> must be one of %(p)s'
+        return False, _(msg) % {'l': constants.CONFIG_POOL_LINK,
+                                'p': ', '.join(constants.POOL_LINKS)}
+    return True, None
+
+
+def _validate_by_hash(config):
+    """
+    Validates the by-hash value if it is specified.
+    """
+    return _validate_boolean(config, constants.CONFIG_BY_HASH)
+
+
+def _validate_by_hash_generations(config):
+    """
+    Validates the number of publishes by-hash indexes are kept for if it is
+    specified.
+    """
+    return _validate_non_negative_integer(config, constants.CONFIG_BY_HASH_GENERATIONS)
+
+
+def _validate_by_hash_grace(config):
+    """
+    Validates the by-hash grace period if it is specified.
+    """
+    return _validate_non_negative_integer(config, constants.CONFIG_BY_HASH_GRACE)
+
+
+
+def _validate_generate_contents(config):
+    """
+    Validates the generate Contents value if it is specified.
+    """
+    return _validate_boolean(config, constants.CONFIG_GENERATE_CONTENTS)
+
+
+def _validate_contents_workers(config):
+    """
+    Validates the number of file list reading processes if it is specified.
+    """
+    return _validate_non_negative_integer(config, constants.CONFIG_CONTENTS_WORKERS)
+
+
+def _validate_contents_cache_size(config):
+    """
+    Validates the size of the file list cache if it is specified.
+    """
+    return _validate_non_negative_integer(config, constants.CONFIG_CONTENTS_CACHE_SIZE)
+
+
+def _validate_gpg_key(config):
+    """
+    Validates the signing key if it is specified.
+    """
+
+    # The key is optional
+    if constants.CONFIG_GPG_KEY not in config.keys():
+        return True, None
+
+    key_id = config.get(constants.CONFIG_GPG_KEY)
+    if not isinstance(key_id, basestring) or not key_id.strip() or ' ' in key_id.strip():
+        msg = 'The value for <%(k)s> must be the ID or fingerprint of a key'
+        return False, _(msg) % {'k': constants.CONFIG_GPG_KEY}
+    return True, None
+
+
+def _validate_gpg_home(config):
+    """
+    Validates the GnuPG home directory if it is specified.
+    """
+
+    # The directory is optional
+    if constants.CONFIG_GPG_HOME not in config.keys():
+        return True, None
+
+    homedir = config.get(constants.CONFIG_GPG_HOME)
+    if not isinstance(homedir, basestring) or not os.path.isdir(homedir):
+        msg = 'The value for <%(h)s> must be an existing directory'
+        return False, _(msg) % {'h': constants.CONFIG_GPG_HOME}
+    return True, None
+
+
+def _validate_boolean(config, key):
+    """
+    Validates that an optional value is a boolean.
+    """
+
+    # The flag is optional
+    if key not in config.keys():
+        return True, None
+
+    parsed = config.get_boolean(key)
+    if parsed is None:
+        msg = 'The value for <%(r)s> must be either "true" or "false"'
+        return False, _(msg) % {'r': key}
+    return True, None
+
+
+def _validate_non_negative_integer(config, key):
+    """
+    Validates that an optional value is a non-negative integer.
+    """
+
+    # The value is optional
+    if key not in config.keys():
+        return True, None
+
+    try:
+        count = int(config.get(key))
+    except (TypeError, ValueError):
+        count = -1
+
+    if count < 0:
+        msg = 'The value for <%(r)s> must be a non-negative integer'
+        return False, _(msg) % {'r': key}
+    return True, None
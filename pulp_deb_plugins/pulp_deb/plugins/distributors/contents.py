@@ -0,0 +1,267 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright © 2013 Bouvet ASA
+#
+# This software is licensed to you under the GNU General Public
+# License as published by the Free Software Foundation; either version
+# 2 of the License (GPLv2) or (at your option) any later version.
+# There is NO WARRANTY for this software, express or implied,
+# including the implied warranties of MERCHANTABILITY,
+# NON-INFRINGEMENT, or FITNESS FOR A PARTICULAR PURPOSE. You should
+# have received a copy of GPLv2 along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+
+"""
+Writes the Contents indexes of a published repository, which map every file
+installed by the packages of an architecture to the packages installing it.
+
+Reading the file list of a package means decompressing its data tarball, so
+the lists are read in a pool of processes and cached by the SHA256 of the
+package; a publish only reads the packages that weren't published before.
+The lists are spooled to disk as they are read and sorted there in bounded
+runs, so the memory a publish takes doesn't grow with the repository.
+"""
+
+import heapq
+import itertools
+import logging
+import multiprocessing
+import os
+import shutil
+import tempfile
+
+from pulp_deb.common import debfile
+from pulp_deb.plugins.distributors import metadata
+
+_LOG = logging.getLogger(__name__)
+
+# -- constants ----------------------------------------------------------------
+
+# Lines of a spooled file list sorted in memory at a time; the sorted runs
+# are merged from disk as the indexes are written
+SORT_RUN_LINES = 200000
+
+
+# -- public -------------------------------------------------------------------
+
+def file_lists(packages, cache=None, workers=1):
+    """
+    Yields the files installed by each package as they are read, reading
+    those that aren't in the cache in a pool of processes.
+
+    :param packages: paths of the .deb files keyed by their SHA256
+    :type  packages: dict
+    :param cache: cache of file lists, or None to read every package
+    :type  cache: pulp_deb.plugins.cache.DigestCache
+    :param workers: number of processes to read the packages in
+    :type  workers: int
+
+    :return: iterator of (SHA256, file list); packages that can't be read
+             are left out
+    :rtype:  iterator
+    """
+    missing = []
+    for digest in sorted(packages):
+        files = cache.get(digest) if cache is not None else None
+        if files is None:
+            missing.append(digest)
+        else:
+            yield digest, files
+
+    tasks = [packages[d] for d in missing]
+    workers = min(workers, len(tasks))
+    if workers <= 1:
+        results = itertools.imap(_file_list_task, tasks)
+        for result in _store_file_lists(missing, tasks, results, cache):
+            yield result
+    else:
+        pool = multiprocessing.Pool(workers)
+        try:
+            try:
+                results = pool.imap(_file_list_task, tasks, chunksize=16)
+                for result in _store_file_lists(missing, tasks, results, cache):
+                    yield result
+                pool.close()
+            except:
+                pool.terminate()
+                raise
+        finally:
+            pool.join()
+
+    if cache is not None and missing:
+        cache.evict()
+
+    _LOG.info('Read the file lists of %d packages, %d were cached' %
+              (len(missing), len(packages) - len(missing)))
+
+
+def location(fields):
+    """
+    Returns how a package is named in the Contents indexes, its section and
+    name, e.g. net/wget or contrib/games/foo.
+
+    :param fields: fields of the package keyed by their lowercased names
+    :type  fields: dict
+
+    :rtype: str
+    """
+    name = fields['package']
+    if fields.get('section'):
+        name = fields['section'] + '/' + name
+    if isinstance(name, unicode):
+        name = name.encode('utf-8')
+    return name
+
+
+# -- public classes -----------------------------------------------------------
+
+class ContentsBuilder(object):
+    """
+    Collects the files of the packages of every component and architecture.
+    Packages for all architectures are added once and merged into the
+    Contents of every architecture when it's written.
+
+    The files are spooled to a temporary directory as they are added. The
+    first index needing a component and architecture sorts its spool in runs
+    of SORT_RUN_LINES lines, and the runs going into an index are merged as
+    it's written. All packages have to be added before the first index is
+    written, and the builder closed once they are written.
+    """
+
+    def __init__(self, tmp_dir=None, run_lines=SORT_RUN_LINES):
+        """
+        :param tmp_dir: directory to create the spool directory in, the
+                        system's temporary directory if None
+        :type  tmp_dir: str
+        :param run_lines: lines sorted in memory at a time
+        :type  run_lines: int
+        """
+        self._dir = tempfile.mkdtemp(prefix='contents-', dir=tmp_dir)
+        self._run_lines = run_lines
+        self._files = 0
+        # (component, arch) -> open spool file, and the sorted runs of it
+        self._spools = {}
+        self._runs = {}
+
+    def add(self, component, arch, location, files):
+        """
+        Adds the files of a package.
+
+        :param location: the package as named in the index, see location()
+        :type  location: str
+        :param files: paths of the files the package installs
+        :type  files: list
+        """
+        spool = self._spools.get((component, arch))
+        if spool is None:
+            spool = self._spools[(component, arch)] = open(self._path('spool'), 'wb')
+        for f in files:
+            if isinstance(f, unicode):
+                f = f.encode('utf-8')
+            spool.write('%s\t%s\n' % (f, location))
+
+    def write(self, dist_dir, path, keys):
+        """
+        Writes an uncompressed Contents index, one file a line with the
+        packages installing it.
+
+        :param dist_dir: directory the path is relative to
+        :type  dist_dir: str
+        :param path: path of the index relative to dist_dir
+        :type  path: str
+        :param keys: (component, arch) pairs whose packages go into the index
+        :type  keys: list
+
+        :return: the written file
+        :rtype:  pulp_deb.plugins.distributors.metadata.IndexFile
+        """
+        runs = []
+        writer = metadata.IndexWriter(dist_dir, path)
+        try:
+            for key in keys:
+                runs.extend([open(run, 'rb') for run in self._sorted_runs(key)])
+
+            # Lines of the same file are next to each other once merged
+            lines = heapq.merge(*runs)
+            for f, group in itertools.groupby(lines, lambda line: line.split('\t', 1)[0]):
+                locations = set([line.rstrip('\n').split('\t', 1)[1] for line in group])
+                writer.write('%s %s\n' % (f, ','.join(sorted(locations))))
+        finally:
+            index_file = writer.close()
+            for run in runs:
+                run.close()
+        return index_file
+
+    def close(self):
+        """
+        Removes the spooled files.
+        """
+        for spool in self._spools.values():
+            spool.close()
+        shutil.rmtree(self._dir, ignore_errors=True)
+
+    def _sorted_runs(self, key):
+        """
+        Returns the paths of the sorted runs of the spool of a component and
+        architecture, sorting it the first time it's asked for.
+        """
+        runs = self._runs.get(key)
+        if runs is not None:
+            return runs
+
+        runs = self._runs[key] = []
+        spool = self._spools.get(key)
+        if spool is None:
+            return runs
+
+        spool.close()
+        source = open(spool.name, 'rb')
+        try:
+            while True:
+                lines = list(itertools.islice(source, self._run_lines))
+                if not lines:
+                    break
+                lines.sort()
+                run = open(self._path('run'), 'wb')
+                try:
+                    run.writelines(lines)
+                finally:
+                    run.close()
+                runs.append(run.name)
+        finally:
+            source.close()
+        os.remove(spool.name)
+        return runs
+
+    def _path(self, prefix):
+        self._files += 1
+        return os.path.join(self._dir, '%s-%d' % (prefix, self._files))
+
+
+# -- private ------------------------------------------------------------------
+
+def _file_list_task(path):
+    """
+    Reads the file list of a package in a worker. Errors are returned rather
+    than raised so one broken package doesn't stop the pool.
+
+    :return: tuple of (file list, error message)
+    """
+    try:
+        return debfile.file_list(path), None
+    except (debfile.InvalidDebFile, IOError), e:
+        return None, str(e)
+
+
+def _store_file_lists(digests, paths, results, cache):
+    """
+    Yields the file lists read by _file_list_task(), putting them in the
+    cache. Packages that couldn't be read are logged and left out.
+    """
+    for digest, path, (files, error) in itertools.izip(digests, paths, results):
+        if error is not None:
+            _LOG.warn('Leaving <%s> out of the Contents indexes: %s' % (path, error))
+            continue
+        if cache is not None:
+            cache.put(digest, files, evict=False)
+        yield digest, files
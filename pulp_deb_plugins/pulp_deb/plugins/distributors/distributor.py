@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright © 2013 Bouvet ASA
+#
+# This software is licensed to you under the GNU General Public
+# License as published by the Free Software Foundation; either version
+# 2 of the License (GPLv2) or (at your option) any later version.
+# There is NO WARRANTY for this software, express or implied,
+# including the implied warranties of MERCHANTABILITY,
+# NON-INFRINGEMENT, or FITNESS FOR A PARTICULAR PURPOSE. You should
+# have received a copy of GPLv2 along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+
+from gettext import gettext as _
+import logging
+import os
+import shutil
+
+from pulp.plugins.distributor import Distributor
+
+from pulp_deb.common import constants, utils
+from pulp_deb.plugins.distributors import configuration
+
+# Imported on first use, as it brings in the writing of indexes that Pulp
+# loading the plugin doesn't need
+publish = utils.lazy_import('pulp_deb.plugins.distributors.publish')
+
+_LOG = logging.getLogger(__name__)
+
+
+# -- plugins ------------------------------------------------------------------
+
+def entry_point():
+    """
+    Entry point that pulp platform uses to load the distributor
+    :return: distributor class and its config
+    :rtype:  Distributor, {}
+    """
+    return DebDistributor, {}
+
+
+class DebDistributor(Distributor):
+
+    @classmethod
+    def metadata(cls):
+        return {
+            'id': constants.DISTRIBUTOR_TYPE_ID,
+            'display_name': _('Debian repository distributor'),
+            'types': [constants.TYPE_DEB]
+        }
+
+    def validate_config(self, repo, config, related_repos):
+        return configuration.validate(config)
+
+    def publish_repo(self, repo, publish_conduit, config):
+        publish_runner = publish.PackagePublishRun(repo, publish_conduit, config)
+        report = publish_runner.perform_publish()
+        return report
+
+    def distributor_removed(self, repo, config):
+        """
+        Removes the repository from the served directories and its build
+        directory.
+        """
+        for key, default in ((constants.CONFIG_HTTP_DIR, constants.DEFAULT_HTTP_DIR),
+                             (constants.CONFIG_HTTPS_DIR, constants.DEFAULT_HTTPS_DIR)):
+            path = os.path.join(config.get(key) or default, repo.id)
+            if os.path.islink(path):
+                os.remove(path)
+            elif os.path.exists(path):
+                shutil.rmtree(path)
+
+        build_dir = os.path.join(repo.working_dir, publish.BUILD_DIR)
+        if os.path.exists(build_dir):
+            shutil.rmtree(build_dir)
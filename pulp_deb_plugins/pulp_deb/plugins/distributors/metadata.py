@@ -0,0 +1,381 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright © 2013 Bouvet ASA
+#
+# This software is licensed to you under the GNU General Public
+# License as published by the Free Software Foundation; either version
+# 2 of the License (GPLv2) or (at your option) any later version.
+# There is NO WARRANTY for this software, express or implied,
+# including the implied warranties of MERCHANTABILITY,
+# NON-INFRINGEMENT, or FITNESS FOR A PARTICULAR PURPOSE. You should
+# have received a copy of GPLv2 along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+
+"""
+Writes the Packages, Sources and Release indexes of a published repository.
+
+Indexes are written uncompressed a paragraph at a time, and compressed
+afterwards into every published format in a pool of processes, each
+reading the uncompressed file once. Sizes and checksums are computed on
+the bytes as they are written, so nothing has to be read back to fill in
+the Release file.
+"""
+
+import bz2
+import gzip
+import hashlib
+import multiprocessing
+import os
+import time
+
+from debian.deb822 import Sources
+
+from pulp_deb.common import constants, utils
+
+
+# -- constants ----------------------------------------------------------------
+
+# Algorithms computed for every index, with the name of the Release field
+# listing them
+RELEASE_HASHES = (('MD5Sum', 'md5'), ('SHA1', 'sha1'), ('SHA256', 'sha256'))
+
+# Fields written first, in this order, with the remaining fields following
+# in alphabetical order and the description last
+FIELD_ORDER = [
+    'package', 'binary', 'source', 'version', 'architecture', 'maintainer',
+    'installed-size', 'depends', 'pre-depends', 'recommends', 'suggests',
+    'conflicts', 'breaks', 'replaces', 'provides', 'section', 'priority',
+    'format', 'directory', 'filename', 'size', 'md5sum', 'sha1', 'sha256',
+]
+
+LAST_FIELDS = ['description']
+
+# Spelling of the fields in the indexes, keyed by their lowercased name
+FIELD_NAMES = dict([(k.lower(), k) for k in constants.PACKAGE_KEYS])
+
+RELEASE_DATE_FORMAT = '%a, %d %b %Y %H:%M:%S UTC'
+
+# Size of the chunks indexes are read in when they are compressed
+CHUNK_SIZE = 1024 * 1024
+
+
+# -- public -------------------------------------------------------------------
+
+def format_paragraph(fields):
+    """
+    Formats a package as an index paragraph.
+
+    :param fields: fields of the package keyed by their lowercased names, as
+                   they are stored in the unit metadata
+    :type  fields: dict
+
+    :return: the paragraph including its terminating blank line
+    :rtype:  str
+    """
+    keys = [k for k in fields if not k.startswith('_') and fields[k] is not None]
+    order = dict([(k, i) for i, k in enumerate(FIELD_ORDER)])
+    keys.sort(key=lambda k: (k in LAST_FIELDS, order.get(k, len(order)), k))
+
+    lines = []
+    for key in keys:
+        value = fields[key]
+        name = _to_str(field_name(key))
+        if isinstance(value, (list, tuple)):
+            lines.append(name + ':')
+            subfields = Sources._multivalued_fields.get(key, [])
+            for entry in value:
+                lines.append(' ' + ' '.join([_to_str(entry[s]) for s in subfields]))
+        else:
+            lines.append('%s: %s' % (name, _to_str(value)))
+    lines.append('\n')
+    return '\n'.join(lines)
+
+
+def field_name(key):
+    """
+    Returns the spelling of a lowercased field name used in the indexes.
+    """
+    if key in FIELD_NAMES:
+        return FIELD_NAMES[key]
+    return '-'.join([i.title() for i in key.split('-')])
+
+
+def write_release(path, fields, files):
+    """
+    Writes a Release file.
+
+    :param path: full path of the file to write
+    :type  path: str
+    :param fields: ordered (name, value) pairs to write before the checksums
+    :type  fields: list
+    :param files: IndexFile instances to list, with paths relative to the
+                  directory of the Release file
+    :type  files: list
+    """
+    files = sorted(files, key=lambda f: f.path)
+
+    lines = ['%s: %s' % (name, value) for name, value in fields]
+    lines.append('Date: %s' % time.strftime(RELEASE_DATE_FORMAT, time.gmtime()))
+    for field, algorithm in RELEASE_HASHES:
+        lines.append('%s:' % field)
+        for f in files:
+            lines.append(' %s %16d %s' % (f.digests[algorithm], f.size, f.path))
+
+    fh = open(path, 'w')
+    try:
+        fh.write('\n'.join(lines) + '\n')
+    finally:
+        fh.close()
+
+
+def compressions():
+    """
+    Returns the extensions of the compressed variants to publish of every
+    index, leaving out those this Python can't write.
+
+    :rtype: list
+    """
+    return [e for e in constants.PUBLISH_COMPRESSIONS if COMPRESSORS.get(e) is not None]
+
+
+def compress_index(dist_dir, path, extension):
+    """
+    Writes the compressed variant of an index next to it.
+
+    :param dist_dir: directory the index path is relative to
+    :type  dist_dir: str
+    :param path: path of the uncompressed index
+    :type  path: str
+    :param extension: extension of the compression, e.g. '.xz'
+    :type  extension: str
+
+    :return: the written file and the seconds it took
+    :rtype:  tuple of (IndexFile, float)
+    """
+    start = utils.monotonic()
+    full_path = os.path.join(dist_dir, path)
+
+    source = open(full_path, 'rb')
+    target = HashingFile(open(full_path + extension, 'wb'))
+    try:
+        writer = COMPRESSORS[extension](target)
+        while True:
+            data = source.read(CHUNK_SIZE)
+            if not data:
+                break
+            writer.write(data)
+        writer.close()
+    finally:
+        source.close()
+        target.close()
+
+    index_file = IndexFile(path + extension, target.size, target.digests())
+    return index_file, utils.monotonic() - start
+
+
+def compress_indexes(dist_dir, paths, extensions, workers=1):
+    """
+    Writes the compressed variants of several indexes.
+
+    With more than one worker every index and compression is a separate
+    task for a pool of processes, so the largest indexes are compressed
+    into all formats at the same time.
+
+    :param paths: paths of the uncompressed indexes relative to dist_dir
+    :type  paths: list
+    :param extensions: compressions to write, see compressions()
+    :type  extensions: list
+    :param workers: number of processes to compress in
+    :type  workers: int
+
+    :return: the written files keyed by the path of their uncompressed index,
+             and the seconds spent on each compression
+    :rtype:  tuple of (dict, dict)
+    """
+    tasks = [(dist_dir, p, e) for p in paths for e in extensions]
+
+    workers = min(workers, len(tasks))
+    if workers <= 1:
+        results = [_compress_task(t) for t in tasks]
+    else:
+        pool = multiprocessing.Pool(workers)
+        try:
+            try:
+                results = pool.map(_compress_task, tasks, chunksize=1)
+                pool.close()
+            except:
+                pool.terminate()
+                raise
+        finally:
+            pool.join()
+
+    files = dict([(p, []) for p in paths])
+    timings = dict([(e, 0.0) for e in extensions])
+    for (dist_dir, path, extension), (index_file, seconds) in zip(tasks, results):
+        files[path].append(index_file)
+        timings[extension] += seconds
+    return files, timings
+
+
+# -- public classes -----------------------------------------------------------
+
+class IndexFile(object):
+    """
+    Size and checksums of a written index file, as listed in the Release file.
+    """
+
+    def __init__(self, path, size, digests):
+        self.path = path
+        self.size = size
+        self.digests = digests
+
+    def to_dict(self):
+        return {'path': self.path, 'size': self.size, 'digests': self.digests}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['path'], data['size'], data['digests'])
+
+
+class Fingerprint(object):
+    """
+    Order independent digest of the packages going into an index, used to
+    tell whether the index has to be written again without keeping its
+    packages in memory. Each package is identified by a string that changes
+    whenever its paragraph would.
+    """
+
+    MODULUS = 2 ** 160
+
+    def __init__(self, value=0, count=0):
+        self.value = value
+        self.count = count
+
+    def add(self, identity):
+        digest = hashlib.sha1(identity).hexdigest()
+        self.value = (self.value + int(digest, 16)) % self.MODULUS
+        self.count += 1
+
+    def __add__(self, other):
+        return Fingerprint((self.value + other.value) % self.MODULUS, self.count + other.count)
+
+    def hexdigest(self):
+        return '%040x-%d' % (self.value, self.count)
+
+
+class HashingFile(object):
+    """
+    Writes through to a file while keeping its size and checksums.
+    """
+
+    def __init__(self, fileobj):
+        self.fileobj = fileobj
+        self.size = 0
+        self._hashes = [(a, hashlib.new(a)) for f, a in RELEASE_HASHES]
+
+    def write(self, data):
+        self.fileobj.write(data)
+        self.size += len(data)
+        for algorithm, h in self._hashes:
+            h.update(data)
+
+    def flush(self):
+        self.fileobj.flush()
+
+    def close(self):
+        self.fileobj.close()
+
+    def digests(self):
+        return dict([(a, h.hexdigest()) for a, h in self._hashes])
+
+
+class IndexWriter(object):
+    """
+    Writes an uncompressed index. The compressed variants are made from it
+    with compress_indexes() once it's closed.
+    """
+
+    def __init__(self, root, path):
+        """
+        :param root: directory the paths in the Release file are relative to
+        :type  root: str
+        :param path: path of the uncompressed index relative to root, for
+                     example main/binary-amd64/Packages
+        :type  path: str
+        """
+        self.path = path
+
+        full_path = os.path.join(root, path)
+        if not os.path.exists(os.path.dirname(full_path)):
+            os.makedirs(os.path.dirname(full_path))
+
+        self._plain = HashingFile(open(full_path, 'wb'))
+
+    def write(self, data):
+        """
+        Appends raw index data, usually one or more paragraphs.
+        """
+        self._plain.write(data)
+
+    def close(self):
+        """
+        Finishes the index.
+
+        :return: the file that was written
+        :rtype:  IndexFile
+        """
+        self._plain.close()
+        return IndexFile(self.path, self._plain.size, self._plain.digests())
+
+
+class CompressingFile(object):
+    """
+    Compresses what is written with a compressor object, such as
+    bz2.BZ2Compressor, into a file.
+    """
+
+    def __init__(self, fileobj, compressor):
+        self.fileobj = fileobj
+        self.compressor = compressor
+
+    def write(self, data):
+        self.fileobj.write(self.compressor.compress(data))
+
+    def close(self):
+        """
+        Writes the end of the compressed stream; the file is left open.
+        """
+        self.fileobj.write(self.compressor.flush())
+
+
+# -- private ------------------------------------------------------------------
+
+def _gzip_writer(fileobj):
+    # A fixed mtime and no name keep the compressed file reproducible
+    return gzip.GzipFile(filename='', mode='wb', fileobj=fileobj, mtime=0)
+
+
+def _bz2_writer(fileobj):
+    return CompressingFile(fileobj, bz2.BZ2Compressor(9))
+
+
+def _xz_writer(fileobj):
+    return CompressingFile(fileobj, utils.lzma.LZMACompressor())
+
+
+def _compress_task(task):
+    return compress_index(*task)
+
+
+# Functions wrapping a file in a compressing writer, by extension
+COMPRESSORS = {
+    constants.COMPRESSION_GZ: _gzip_writer,
+    constants.COMPRESSION_BZ2: _bz2_writer,
+    constants.COMPRESSION_XZ: _xz_writer if utils.lzma is not None else None,
+}
+
+
+def _to_str(value):
+    if isinstance(value, unicode):
+        return value.encode('utf-8')
+    return str(value)
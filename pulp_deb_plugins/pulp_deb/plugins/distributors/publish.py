@@ -0,0 +1,977 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright © 2013 Bouvet ASA
+#
+# This software is licensed to you under the GNU General Public
+# License as published by the Free Software Foundation; either version
+# 2 of the License (GPLv2) or (at your option) any later version.
+# There is NO WARRANTY for this software, express or implied,
+# including the implied warranties of MERCHANTABILITY,
+# NON-INFRINGEMENT, or FITNESS FOR A PARTICULAR PURPOSE. You should
+# have received a copy of GPLv2 along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+
+from datetime import datetime
+from gettext import gettext as _
+import errno
+import json
+import logging
+import multiprocessing
+import os
+import shutil
+import sys
+import time
+
+from pulp.plugins.conduits.mixins import UnitAssociationCriteria
+
+from pulp_deb.common import constants, utils
+from pulp_deb.common.constants import STATE_FAILED, STATE_RUNNING, STATE_SKIPPED, STATE_SUCCESS
+from pulp_deb.common.publish_progress import PublishProgressReport
+from pulp_deb.plugins.cache import DigestCache
+from pulp_deb.plugins.distributors import contents, metadata, signing
+
+_LOG = logging.getLogger(__name__)
+
+# Directory in the working directory the repository is built in
+BUILD_DIR = 'publish'
+
+# Link in the build directory to the generation being served
+CURRENT_LINK = 'current'
+
+# strftime format of the names of the generation directories
+GENERATION_FORMAT = '%Y%m%d%H%M%S%f'
+
+# File in the working directory describing the indexes of the last publish
+STATE_FILENAME = 'publish-state.json'
+
+# Directory in the working directory the file lists of packages are cached in
+CONTENTS_CACHE_DIR = 'contents-cache'
+
+# Architecture of packages that are listed in the index of every architecture
+ARCH_ALL = 'all'
+
+# -- public classes -----------------------------------------------------------
+
+
+class PackagePublishRun(object):
+    """
+    Used to perform a single publish of a Debian repository. This class will
+    maintain state relevant to the run and should not be reused across runs.
+
+    Every publish builds a new generation of the repository in the
+    distributor's working directory: the pool is a tree of symlinks (or
+    hardlinks) to the packages in Pulp's storage and the indexes are
+    generated from the unit metadata, so the cost of a publish doesn't
+    depend on the size of the packages. Once complete, the generation is
+    swapped in by atomically replacing the link the served directories
+    point to, so clients never see a half written repository.
+
+    In incremental mode the indexes of the previous generation are linked
+    into the new one and only those whose packages changed are written
+    again.
+    """
+
+    def __init__(self, repo, publish_conduit, config):
+        self.repo = repo
+        self.publish_conduit = publish_conduit
+        self.config = config
+
+        self.progress_report = PublishProgressReport(publish_conduit)
+
+        # Filled in while linking the packages, with only the units that
+        # were linked; the identities of the others are kept to leave them
+        # out of the indexes
+        self.layout = IndexLayout()
+        self._failed_units = set()
+
+        # Saved once the generation is being served
+        self.state = {'dist': self._dist_name(), 'indexes': {}, 'contents': {}, 'by_hash': []}
+
+        self.generation = datetime.utcnow().strftime(GENERATION_FORMAT)
+        self._hardlink = self._pool_link() == constants.POOL_LINK_HARDLINK
+
+        # Opened on the first signature and closed when the publish ends
+        self._signer = None
+
+    def perform_publish(self):
+        """
+        Performs the publish operation according to the configured state of
+        the instance. The report to be sent back to Pulp is returned from this
+        call. This call will make calls into the conduit's progress update
+        as appropriate.
+
+        :return: the report object to return to Pulp from the publish call
+        :rtype:  pulp.plugins.model.PublishReport
+        """
+        _LOG.info('Beginning publish for repository <%s>' % self.repo.id)
+
+        try:
+            self._prepare_build_dir()
+
+            self._link_packages()
+            if self.progress_report.packages_state != STATE_SUCCESS:
+                self._discard_build_dir()
+                return
+
+            self._generate_metadata()
+            if self.progress_report.metadata_state != STATE_SUCCESS:
+                self._discard_build_dir()
+                return
+
+            self._publish_http()
+            self._publish_https()
+        finally:
+            if self._signer is not None:
+                self._signer.close()
+                self._signer = None
+
+            # One final progress update before finishing
+            self.progress_report.update_progress()
+
+            report = self.progress_report.build_final_report()
+            return report
+
+    def build_dir(self):
+        """
+        :return: full path of the directory the generation of this publish
+                 is built in
+        :rtype:  str
+        """
+        return os.path.join(self.repo.working_dir, BUILD_DIR, self.generation)
+
+    def current_dir(self):
+        """
+        :return: full path of the link to the generation being served
+        :rtype:  str
+        """
+        return os.path.join(self.repo.working_dir, BUILD_DIR, CURRENT_LINK)
+
+    def dist_dir(self, generation_dir=None):
+        """
+        :param generation_dir: generation to get the directory of, defaults to
+                               the one of this publish
+        :type  generation_dir: str
+
+        :return: full path of the directory holding the indexes
+        :rtype:  str
+        """
+        return os.path.join(generation_dir or self.build_dir(), 'dists', self._dist_name())
+
+    def _prepare_build_dir(self):
+        os.makedirs(self.build_dir())
+
+    def _discard_build_dir(self):
+        """
+        Removes the generation of a failed publish, unless it already got
+        swapped in and is being served.
+        """
+        if self._current_generation() == self.build_dir():
+            return
+        shutil.rmtree(self.build_dir(), ignore_errors=True)
+
+    def _link_packages(self):
+        """
+        Links the file of every package into the pool of the build directory.
+        Failures are recorded per package and don't stop the publish.
+
+        The layout of the indexes is collected along the way.
+        """
+        _LOG.info('Linking packages for repository <%s>' % self.repo.id)
+
+        self.progress_report.packages_state = STATE_RUNNING
+        self.progress_report.packages_total_count = 0
+        self.progress_report.packages_finished_count = 0
+        self.progress_report.packages_error_count = 0
+        self.progress_report.update_progress()
+
+        start_time = datetime.now()
+
+        try:
+            for unit in self._units():
+                self.progress_report.packages_total_count += 1
+                try:
+                    self._link_unit(unit)
+                except Exception:
+                    _LOG.exception('Error linking unit <%s>' % unit.unit_key)
+                    self.progress_report.add_failed_package(unit, sys.exc_info()[2])
+                    self._failed_units.add(_identity(unit))
+                else:
+                    self.layout.add(unit)
+                    self.progress_report.packages_finished_count += 1
+        except Exception, e:
+            _LOG.exception('Exception while linking packages for repository <%s>' % self.repo.id)
+            self.progress_report.packages_state = STATE_FAILED
+            self.progress_report.packages_error_message = _('Error linking packages')
+            self.progress_report.packages_exception = e
+            self.progress_report.packages_traceback = sys.exc_info()[2]
+        else:
+            self.progress_report.packages_state = STATE_SUCCESS
+
+        end_time = datetime.now()
+        duration = end_time - start_time
+        self.progress_report.packages_execution_time = duration.seconds
+
+        self.progress_report.update_progress()
+
+    def _link_unit(self, unit):
+        """
+        Links the file of a unit into the pool. Units without a file of their
+        own (the source package entries) are skipped; for any other unit a
+        missing file is an error, so the unit isn't listed in the indexes.
+
+        Hardlinks fall back to symlinks if the working directory isn't on the
+        same file system as Pulp's storage.
+        """
+        if not unit.storage_path and 'binary' in unit.metadata:
+            return
+        if not unit.storage_path or not os.path.isfile(unit.storage_path):
+            raise IOError(errno.ENOENT, 'Package file is missing', unit.storage_path)
+
+        path = os.path.join(self.build_dir(), _pool_path(unit))
+        if not os.path.exists(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        if os.path.lexists(path):
+            os.remove(path)
+
+        if self._hardlink:
+            try:
+                os.link(unit.storage_path, path)
+                return
+            except OSError, e:
+                if e.errno not in (errno.EXDEV, errno.EPERM, errno.EMLINK):
+                    raise
+                _LOG.warn('Cannot hardlink packages into <%s>, using symlinks instead: %s' %
+                          (self.build_dir(), e))
+                self._hardlink = False
+        os.symlink(unit.storage_path, path)
+
+    def _generate_metadata(self):
+        """
+        Writes the Packages and Sources indexes of every component and
+        architecture, the Contents indexes if enabled, the indexes kept
+        from the last sync, and the Release file listing them, signed if a
+        key is configured.
+        """
+        _LOG.info('Generating metadata for repository <%s>' % self.repo.id)
+
+        self.progress_report.metadata_state = STATE_RUNNING
+        self.progress_report.update_progress()
+
+        start_time = datetime.now()
+
+        try:
+            files = self._write_indexes()
+            if self._generate_contents():
+                files.extend(self._write_contents())
+            files.extend(self._link_synced_indexes(files))
+            self._write_by_hash(files)
+            self._write_release(files)
+            self._sign_release()
+            self._activate()
+        except Exception, e:
+            _LOG.exception('Exception while generating metadata for repository <%s>' % self.repo.id)
+            self.progress_report.metadata_state = STATE_FAILED
+            self.progress_report.metadata_error_message = _('Error generating repository metadata')
+            self.progress_report.metadata_exception = e
+            self.progress_report.metadata_traceback = sys.exc_info()[2]
+        else:
+            self.progress_report.metadata_state = STATE_SUCCESS
+
+        end_time = datetime.now()
+        duration = end_time - start_time
+        self.progress_report.metadata_execution_time = duration.seconds
+
+        self.progress_report.update_progress()
+
+    def _write_indexes(self):
+        """
+        Streams the units into the indexes that have to be written in a
+        single pass. Every index being built stays open until the end, so no
+        index is held in memory.
+
+        Indexes whose fingerprint matches the previous publish are linked
+        from the generation being served when publishing incrementally.
+
+        :return: the written and reused files
+        :rtype:  list of IndexFile
+        """
+        dist_dir = self.dist_dir()
+        fingerprints = self.layout.fingerprints()
+
+        previous = {}
+        if self._incremental():
+            extensions = [constants.COMPRESSION_NONE] + metadata.compressions()
+            previous = self._reusable_files('indexes', fingerprints, extensions)
+
+        files = []
+        if previous:
+            current_dist_dir = self.dist_dir(self._current_generation())
+            for path in sorted(previous):
+                for index_file in previous[path]:
+                    _link_file(os.path.join(current_dist_dir, index_file.path),
+                               os.path.join(dist_dir, index_file.path))
+                files.extend(previous[path])
+
+        writers = {}
+        written = {}
+        try:
+            for path in fingerprints:
+                if path not in previous:
+                    writers[path] = metadata.IndexWriter(dist_dir, path)
+
+            if writers:
+                for unit in self._linked_units():
+                    paths = [p for p in self.layout.index_paths(unit) if p in writers]
+                    if not paths:
+                        continue
+
+                    fields = _unit_fields(unit)
+                    if 'binary' not in fields:
+                        fields['filename'] = _pool_path(unit)
+                    paragraph = metadata.format_paragraph(fields)
+                    for path in paths:
+                        writers[path].write(paragraph)
+
+            for path in sorted(writers):
+                written[path] = [writers.pop(path).close()]
+        finally:
+            for index in writers.values():
+                index.close()
+
+        compressed, timings = metadata.compress_indexes(
+            dist_dir, sorted(written), metadata.compressions(), self._compress_workers())
+        self.progress_report.metadata_compression_times = timings
+        for path in sorted(written):
+            written[path].extend(compressed[path])
+            files.extend(written[path])
+
+        _LOG.info('Wrote %d indexes and reused %d for repository <%s>' %
+                  (len(written), len(previous), self.repo.id))
+
+        for path, fingerprint in fingerprints.items():
+            index_files = previous.get(path) or written[path]
+            self.state['indexes'][path] = {
+                'fingerprint': fingerprint,
+                'files': [f.to_dict() for f in index_files],
+            }
+
+        return files
+
+    def _write_contents(self):
+        """
+        Writes the Contents index of every component and architecture,
+        gzipped only as Debian archives publish them.
+
+        The file lists of the packages are read from the cache or, for
+        packages that weren't published before, from their data tarballs in
+        a pool of processes. When publishing incrementally, a Contents index
+        is linked from the generation being served if the Packages index of
+        its component and architecture is unchanged.
+
+        :return: the written and reused files
+        :rtype:  list of IndexFile
+        """
+        dist_dir = self.dist_dir()
+        index_fingerprints = self.layout.fingerprints()
+
+        # Contents path -> (component, arch), with the fingerprint of the
+        # Packages index of the same component and architecture
+        layout = {}
+        fingerprints = {}
+        for component in self.layout.components():
+            for arch in self.layout.arches():
+                data = {'component': component, 'arch': arch}
+                path = constants.CONTENTS_PATH % data
+                layout[path] = (component, arch)
+                fingerprints[path] = index_fingerprints[constants.INDEX_PATHS['packages'] % data]
+
+        previous = {}
+        if self._incremental():
+            previous = self._reusable_files('contents', fingerprints, [constants.COMPRESSION_GZ])
+
+        files = []
+        if previous:
+            current_dist_dir = self.dist_dir(self._current_generation())
+            for path in sorted(previous):
+                for index_file in previous[path]:
+                    _link_file(os.path.join(current_dist_dir, index_file.path),
+                               os.path.join(dist_dir, index_file.path))
+                files.extend(previous[path])
+
+        needed = set([layout[p] for p in layout if p not in previous])
+        written = {}
+        if needed:
+            builder = self._collect_contents(needed)
+            paths = sorted([p for p in layout if p not in previous])
+            try:
+                for path in paths:
+                    component, arch = layout[path]
+                    builder.write(dist_dir, path, [(component, arch), (component, ARCH_ALL)])
+            finally:
+                builder.close()
+
+            compressed = metadata.compress_indexes(
+                dist_dir, paths, [constants.COMPRESSION_GZ], self._contents_workers())[0]
+            for path in paths:
+                os.remove(os.path.join(dist_dir, path))
+                written[path] = compressed[path]
+                files.extend(written[path])
+
+        _LOG.info('Wrote %d Contents indexes and reused %d for repository <%s>' %
+                  (len(written), len(previous), self.repo.id))
+
+        for path, fingerprint in fingerprints.items():
+            index_files = previous.get(path) or written[path]
+            self.state['contents'][path] = {
+                'fingerprint': fingerprint,
+                'files': [f.to_dict() for f in index_files],
+            }
+
+        return files
+
+    def _collect_contents(self, needed):
+        """
+        Reads the file lists of the packages going into the Contents indexes
+        of the given components and architectures.
+
+        :param needed: (component, arch) pairs of the indexes to write
+        :type  needed: set
+
+        :rtype: pulp_deb.plugins.distributors.contents.ContentsBuilder
+        """
+        needed_components = set([component for component, arch in needed])
+
+        packages = {}
+        # SHA256 -> [(component, arch, location)]
+        entries = {}
+        for unit in self._linked_units():
+            if not unit.storage_path or not os.path.isfile(unit.storage_path):
+                continue
+            component, arch = self.layout.location(unit)
+            if arch is None:
+                continue
+            if arch == ARCH_ALL:
+                if component not in needed_components:
+                    continue
+            elif (component, arch) not in needed:
+                continue
+
+            digest = unit.metadata.get('sha256') or utils.file_digest(unit.storage_path)
+            packages[digest] = unit.storage_path
+            entries.setdefault(digest, []).append(
+                (component, arch, contents.location(_unit_fields(unit))))
+
+        builder = contents.ContentsBuilder(self.repo.working_dir)
+        try:
+            lists = contents.file_lists(packages, self._contents_cache(),
+                                        self._contents_workers())
+            for digest, files in lists:
+                for component, arch, location in entries[digest]:
+                    builder.add(component, arch, location, files)
+        except:
+            builder.close()
+            raise
+        return builder
+
+    def _link_synced_indexes(self, files):
+        """
+        Links the indexes the importer kept from the last sync, such as
+        Contents and Translation indexes, into the dist as they are. Those
+        that were generated by this publish in any compression are left out.
+
+        :param files: the index files written by this publish
+        :type  files: list of IndexFile
+
+        :return: the linked files
+        :rtype:  list of IndexFile
+        """
+        scratchpad = self.publish_conduit.get_repo_scratchpad() or {}
+        synced = scratchpad.get(constants.SCRATCHPAD_EXTRA_INDEXES)
+        if not synced:
+            return []
+
+        generated = set([_strip_compression(f.path) for f in files])
+
+        dist_dir = self.dist_dir()
+        linked = []
+        for relative_path in sorted(synced['files']):
+            if _strip_compression(relative_path) in generated:
+                continue
+            source = os.path.join(synced['root'], relative_path)
+            if not os.path.exists(source):
+                _LOG.warn('Synced index <%s> is missing, not publishing it' % source)
+                continue
+            _link_file(source, os.path.join(dist_dir, relative_path))
+            linked.append(metadata.IndexFile.from_dict(synced['files'][relative_path]))
+
+        _LOG.info('Linked %d synced indexes for repository <%s>' % (len(linked), self.repo.id))
+        return linked
+
+    def _write_by_hash(self, files):
+        """
+        Links every index under by-hash/SHA256/<digest> next to it, so
+        clients and caching proxies can fetch the indexes matching the
+        Release file they have even while it's being replaced.
+
+        The by-hash entries of previous generations are kept for the
+        configured number of publishes, or for the grace period after they
+        were superseded, whichever is longer.
+
+        :param files: the index files of this generation
+        :type  files: list of IndexFile
+        """
+        if not self._by_hash():
+            return
+
+        dist_dir = self.dist_dir()
+        now = time.time()
+
+        retained = self._retained_by_hash(now)
+        if retained:
+            current_dist_dir = self.dist_dir(self._current_generation())
+            for entry in retained:
+                for f in entry['files']:
+                    path = _by_hash_path(f['path'], f['digests']['sha256'])
+                    source = os.path.join(current_dist_dir, path)
+                    target = os.path.join(dist_dir, path)
+                    if os.path.exists(source) and not os.path.exists(target):
+                        _link_file(source, target)
+
+        for f in files:
+            target = os.path.join(dist_dir, _by_hash_path(f.path, f.digests['sha256']))
+            if not os.path.exists(target):
+                _link_file(os.path.join(dist_dir, f.path), target)
+
+        entry = {'generation': self.generation, 'published': now,
+                 'files': [f.to_dict() for f in files]}
+        self.state['by_hash'] = [entry] + retained
+
+    def _retained_by_hash(self, now):
+        """
+        Returns the by-hash entries of the previous generations to keep,
+        newest first.
+
+        :rtype: list
+        """
+        state = self._current_state()
+        generations = int(self.config.get(constants.CONFIG_BY_HASH_GENERATIONS,
+                                          constants.DEFAULT_BY_HASH_GENERATIONS))
+        grace = int(self.config.get(constants.CONFIG_BY_HASH_GRACE,
+                                    constants.DEFAULT_BY_HASH_GRACE))
+
+        retained = []
+        superseded = now
+        for i, entry in enumerate(state.get('by_hash', [])):
+            if i < generations or now - superseded < grace:
+                retained.append(entry)
+            superseded = entry['published']
+        return retained
+
+    def _activate(self):
+        """
+        Makes the generation of this publish the one being served, by
+        replacing the current link with a rename, and removes the others.
+        """
+        current = self.current_dir()
+        _replace_symlink(self.generation, current)
+
+        self.state['generation'] = self.generation
+        self._save_state(self.state)
+
+        root = os.path.dirname(current)
+        for name in os.listdir(root):
+            if name not in (CURRENT_LINK, self.generation):
+                shutil.rmtree(os.path.join(root, name), ignore_errors=True)
+
+    def _current_generation(self):
+        """
+        :return: full path of the generation being served or None if nothing
+                 was published yet
+        :rtype:  str
+        """
+        current = self.current_dir()
+        if not os.path.islink(current):
+            return None
+        return os.path.join(os.path.dirname(current), os.readlink(current))
+
+    def _reusable_files(self, section, fingerprints, extensions):
+        """
+        Returns the indexes of the previous publish that are unchanged and
+        still on disk.
+
+        :param section: key of the indexes in the state, 'indexes' or 'contents'
+        :type  section: str
+        :param fingerprints: fingerprint of every index keyed by its path
+        :type  fingerprints: dict
+        :param extensions: variants every index is published as
+        :type  extensions: list
+
+        :return: files of every reusable index keyed by the index path
+        :rtype:  dict
+        """
+        state = self._current_state()
+        if state.get('dist') != self._dist_name():
+            return {}
+        current_dist_dir = self.dist_dir(self._current_generation())
+
+        reusable = {}
+        for path, index in state.get(section, {}).items():
+            if fingerprints.get(path) != index['fingerprint']:
+                continue
+            index_files = [metadata.IndexFile.from_dict(f) for f in index['files']]
+            if sorted([f.path for f in index_files]) != sorted([path + e for e in extensions]):
+                continue
+            on_disk = [os.path.exists(os.path.join(current_dist_dir, f.path))
+                       for f in index_files]
+            if all(on_disk):
+                reusable[path] = index_files
+        return reusable
+
+    def _current_state(self):
+        """
+        Returns the state saved by the publish of the generation being
+        served, or an empty one if it can't be found.
+
+        :rtype: dict
+        """
+        current = self._current_generation()
+        state = self._load_state()
+        if current is None or state.get('generation') != os.path.basename(current):
+            return {}
+        return state
+
+    def _load_state(self):
+        path = os.path.join(self.repo.working_dir, STATE_FILENAME)
+        try:
+            fh = open(path)
+            try:
+                return json.load(fh)
+            finally:
+                fh.close()
+        except (IOError, ValueError):
+            return {}
+
+    def _save_state(self, state):
+        path = os.path.join(self.repo.working_dir, STATE_FILENAME)
+        fh = open(path + '.tmp', 'w')
+        try:
+            json.dump(state, fh)
+        finally:
+            fh.close()
+        os.rename(path + '.tmp', path)
+
+    def _write_release(self, files):
+        dist = self._dist_name()
+        fields = [
+            ('Origin', 'Pulp'),
+            ('Label', self.repo.id),
+            ('Suite', dist),
+            ('Codename', dist),
+            ('Architectures', ' '.join(self.layout.arches())),
+            ('Components', ' '.join(self.layout.components())),
+        ]
+        if self._by_hash():
+            fields.append(('Acquire-By-Hash', 'yes'))
+        path = os.path.join(self.dist_dir(), constants.RELEASE_FILENAME)
+        metadata.write_release(path, fields, files)
+
+    def _sign_release(self):
+        """
+        Signs the Release file of every dist of the generation in a single
+        batch, if a signing key is configured.
+        """
+        if self._signer is None:
+            self._signer = signing.get_signer(self.config)
+        if self._signer is None:
+            return
+        self._signer.sign([os.path.join(self.dist_dir(), constants.RELEASE_FILENAME)])
+
+    def _publish_http(self):
+        self.progress_report.publish_http = self._publish_to(
+            constants.CONFIG_SERVE_HTTP, constants.DEFAULT_SERVE_HTTP,
+            constants.CONFIG_HTTP_DIR, constants.DEFAULT_HTTP_DIR)
+        self.progress_report.update_progress()
+
+    def _publish_https(self):
+        self.progress_report.publish_https = self._publish_to(
+            constants.CONFIG_SERVE_HTTPS, constants.DEFAULT_SERVE_HTTPS,
+            constants.CONFIG_HTTPS_DIR, constants.DEFAULT_HTTPS_DIR)
+        self.progress_report.update_progress()
+
+    def _publish_to(self, serve_key, serve_default, dir_key, dir_default):
+        """
+        Links the current generation into a served directory, or removes the
+        link if the repository shouldn't be served from it. The link points
+        to the current link, so it stays the same across publishes.
+
+        :return: state of the step for the progress report
+        :rtype:  str
+        """
+        root = self.config.get(dir_key) or dir_default
+        dest = os.path.join(root, self.repo.id)
+
+        serve = self.config.get_boolean(serve_key)
+        if serve is None:
+            serve = serve_default
+
+        try:
+            if not serve:
+                if os.path.islink(dest):
+                    os.remove(dest)
+                elif os.path.exists(dest):
+                    shutil.rmtree(dest)
+                return STATE_SKIPPED
+
+            if os.path.islink(dest) and os.readlink(dest) == self.current_dir():
+                return STATE_SUCCESS
+            if os.path.isdir(dest) and not os.path.islink(dest):
+                shutil.rmtree(dest)
+            if not os.path.exists(root):
+                os.makedirs(root)
+            _replace_symlink(self.current_dir(), dest)
+        except OSError:
+            _LOG.exception('Error publishing repository <%s> to <%s>' % (self.repo.id, dest))
+            return STATE_FAILED
+        return STATE_SUCCESS
+
+    def _units(self):
+        criteria = UnitAssociationCriteria(type_ids=[constants.TYPE_DEB])
+        return self.publish_conduit.get_units(criteria=criteria, as_generator=True)
+
+    def _linked_units(self):
+        """
+        Yields the units that were linked into the pool of this generation.
+        """
+        for unit in self._units():
+            if _identity(unit) not in self._failed_units:
+                yield unit
+
+    def _dist_name(self):
+        return self.config.get(constants.CONFIG_PUBLISH_DIST) or constants.DEFAULT_PUBLISH_DIST
+
+    def _compress_workers(self):
+        workers = int(self.config.get(constants.CONFIG_COMPRESS_WORKERS,
+                                      constants.DEFAULT_COMPRESS_WORKERS))
+        return workers or multiprocessing.cpu_count()
+
+    def _contents_workers(self):
+        workers = int(self.config.get(constants.CONFIG_CONTENTS_WORKERS,
+                                      constants.DEFAULT_CONTENTS_WORKERS))
+        return workers or multiprocessing.cpu_count()
+
+    def _contents_cache(self):
+        """
+        Returns the cache of package file lists for this repository.
+
+        :return: the cache or None if it's disabled
+        :rtype:  pulp_deb.plugins.cache.DigestCache
+        """
+        size = int(self.config.get(constants.CONFIG_CONTENTS_CACHE_SIZE,
+                                   constants.DEFAULT_CONTENTS_CACHE_SIZE))
+        if size <= 0:
+            return None
+        return DigestCache(os.path.join(self.repo.working_dir, CONTENTS_CACHE_DIR), size)
+
+    def _generate_contents(self):
+        generate = self.config.get_boolean(constants.CONFIG_GENERATE_CONTENTS)
+        if generate is None:
+            generate = constants.DEFAULT_GENERATE_CONTENTS
+        return generate
+
+    def _pool_link(self):
+        return self.config.get(constants.CONFIG_POOL_LINK) or constants.DEFAULT_POOL_LINK
+
+    def _by_hash(self):
+        by_hash = self.config.get_boolean(constants.CONFIG_BY_HASH)
+        if by_hash is None:
+            by_hash = constants.DEFAULT_BY_HASH
+        return by_hash
+
+    def _incremental(self):
+        incremental = self.config.get_boolean(constants.CONFIG_INCREMENTAL_PUBLISH)
+        if incremental is None:
+            incremental = constants.DEFAULT_INCREMENTAL_PUBLISH
+        return incremental
+
+
+class IndexLayout(object):
+    """
+    Collects which components and architectures the units of a repository
+    are published in, and a fingerprint of the units going into each index.
+
+    Every component gets a Packages index for every architecture and a
+    Sources index, even if they are empty. Packages for all architectures
+    are listed in the Packages index of every architecture of their
+    component.
+    """
+
+    def __init__(self):
+        self._components = set()
+        self._arches = set()
+        # (component, arch) -> Fingerprint, with the arch None for sources
+        self._fingerprints = {}
+
+    def add(self, unit):
+        """
+        Adds a unit to the layout.
+        """
+        component, arch = self.location(unit)
+        self._components.add(component)
+        if arch not in (None, ARCH_ALL):
+            self._arches.add(arch)
+
+        fingerprint = self._fingerprints.setdefault((component, arch), metadata.Fingerprint())
+        fingerprint.add(_identity(unit))
+
+    def components(self):
+        return sorted(self._components) or [constants.DEFAULT_PUBLISH_COMPONENT]
+
+    def arches(self):
+        return sorted(self._arches) or [ARCH_ALL]
+
+    def index_paths(self, unit):
+        """
+        Returns the paths of the indexes, relative to the dist, that list the
+        unit.
+
+        :rtype: list
+        """
+        component, arch = self.location(unit)
+        if arch is None:
+            return [constants.INDEX_PATHS['sources'] % {'component': component}]
+
+        arches = self.arches() if arch == ARCH_ALL else [arch]
+        return [constants.INDEX_PATHS['packages'] % {'component': component, 'arch': a}
+                for a in arches]
+
+    def location(self, unit):
+        """
+        Returns the component and architecture a unit is published in, with
+        the architecture None for source packages.
+
+        :rtype: tuple
+        """
+        component = _component(_pool_path(unit))
+        if 'binary' in unit.metadata:
+            return component, None
+        return component, unit.metadata.get('architecture') or ARCH_ALL
+
+    def fingerprints(self):
+        """
+        :return: fingerprint of every index keyed by its path
+        :rtype:  dict
+        """
+        fingerprints = {}
+        for component in self.components():
+            arch_all = self._fingerprint(component, ARCH_ALL)
+            for arch in self.arches():
+                path = constants.INDEX_PATHS['packages'] % {'component': component, 'arch': arch}
+                fingerprint = self._fingerprint(component, arch)
+                if arch != ARCH_ALL:
+                    fingerprint = fingerprint + arch_all
+                fingerprints[path] = fingerprint.hexdigest()
+
+            path = constants.INDEX_PATHS['sources'] % {'component': component}
+            fingerprints[path] = self._fingerprint(component, None).hexdigest()
+        return fingerprints
+
+    def _fingerprint(self, component, arch):
+        return self._fingerprints.get((component, arch), metadata.Fingerprint())
+
+
+# -- private ------------------------------------------------------------------
+
+def _unit_fields(unit):
+    """
+    Returns the index fields of a unit keyed by their lowercased names.
+    """
+    fields = dict(unit.metadata)
+    fields.update(unit.unit_key)
+    return fields
+
+
+def _identity(unit):
+    """
+    Returns a string identifying a unit and the content of its paragraph.
+    """
+    fields = unit.metadata
+    parts = [constants.DEB_KEY % unit.unit_key, _pool_path(unit),
+             fields.get('sha256') or fields.get('md5sum') or '']
+    return u'|'.join(parts).encode('utf-8')
+
+
+def _by_hash_path(path, digest):
+    """
+    Returns the by-hash location of an index, e.g.
+    main/binary-amd64/by-hash/SHA256/<digest> for main/binary-amd64/Packages.gz
+    """
+    return os.path.join(os.path.dirname(path), 'by-hash', 'SHA256', digest)
+
+
+def _strip_compression(path):
+    """
+    Returns the path of the uncompressed variant of an index.
+    """
+    base, extension = os.path.splitext(path)
+    if extension in metadata.COMPRESSORS:
+        return base
+    return path
+
+
+def _link_file(source, path):
+    """
+    Hardlinks a file to another path, copying it if it can't be linked.
+    """
+    if not os.path.exists(os.path.dirname(path)):
+        os.makedirs(os.path.dirname(path))
+    try:
+        os.link(source, path)
+    except OSError:
+        shutil.copy2(source, path)
+
+
+def _replace_symlink(target, path):
+    """
+    Points the symlink at path to target, atomically replacing whatever is
+    there.
+    """
+    tmp_path = path + '.tmp'
+    if os.path.lexists(tmp_path):
+        os.remove(tmp_path)
+    os.symlink(target, tmp_path)
+    os.rename(tmp_path, path)
+
+
+def _pool_path(unit):
+    """
+    Returns where a unit is published relative to the repository root. The
+    location in the feed's pool is kept if the unit has one.
+    """
+    fields = unit.metadata
+    basename = os.path.basename(unit.storage_path or '')
+
+    if 'binary' in fields and fields.get('directory'):
+        return fields['directory'] + '/' + basename
+    if fields.get('filename', '').startswith('pool/'):
+        return fields['filename']
+
+    name = unit.unit_key['package']
+    source_name = (fields.get('source') or name).split()[0]
+    data = {
+        'component': constants.DEFAULT_PUBLISH_COMPONENT,
+        'prefix': source_name[0:4] if source_name.startswith('lib') else source_name[0],
+        'source_name': source_name,
+        'name': basename or name,
+    }
+    return constants.DEB_FILENAME % data
+
+
+def _component(pool_path):
+    """
+    Returns the component named by a pool location such as
+    pool/main/libd/libdaemon/libdaemon0_0.14-2_i386.deb
+    """
+    parts = pool_path.split('/')
+    if len(parts) > 2 and parts[0] == 'pool':
+        return parts[1]
+    return constants.DEFAULT_PUBLISH_COMPONENT
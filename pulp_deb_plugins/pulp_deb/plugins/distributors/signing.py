@@ -0,0 +1,421 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright © 2013 Bouvet ASA
+#
+# This software is licensed to you under the GNU General Public
+# License as published by the Free Software Foundation; either version
+# 2 of the License (GPLv2) or (at your option) any later version.
+# There is NO WARRANTY for this software, express or implied,
+# including the implied warranties of MERCHANTABILITY,
+# NON-INFRINGEMENT, or FITNESS FOR A PARTICULAR PURPOSE. You should
+# have received a copy of GPLv2 along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+
+"""
+Signs the Release files of published repositories, writing the detached
+Release.gpg signature and the clearsigned InRelease next to each of them.
+
+A signer is opened for a publish and closed when it ends. It holds a single
+connection to the gpg-agent holding the key for all that time: the
+signatures are made by the agent over that connection and the OpenPGP
+packets around them are put together here, so no gpg process is started for
+each Release file.
+"""
+
+import base64
+import binascii
+import hashlib
+import logging
+import os
+import socket
+import struct
+import subprocess
+import time
+import urllib
+
+from pulp_deb.common import constants
+
+_LOG = logging.getLogger(__name__)
+
+# -- constants ----------------------------------------------------------------
+
+# OpenPGP signature types of the detached and the cleartext signature
+SIG_BINARY = 0x00
+SIG_TEXT = 0x01
+
+# OpenPGP and agent names of the digest the signatures are made with
+HASH_ALGORITHM = 8
+HASH_NAME = 'sha256'
+
+# OpenPGP public key algorithms that can sign, by the values of their
+# signatures in the order they go into the packet
+KEY_ALGORITHMS = {
+    1: ('s',),        # RSA
+    3: ('s',),        # RSA sign only
+    17: ('r', 's'),   # DSA
+    19: ('r', 's'),   # ECDSA
+    22: ('r', 's'),   # EdDSA
+}
+
+
+# -- exceptions ---------------------------------------------------------------
+
+class SigningError(Exception):
+    pass
+
+
+# -- public -------------------------------------------------------------------
+
+def get_signer(config):
+    """
+    Returns a new signer for a distributor configuration. It's opened on
+    first use and has to be closed once the publish is done with it.
+
+    :param config: configuration of the publish
+    :type  config: pulp.plugins.config.PluginCallConfiguration
+
+    :return: the signer or None if Release files aren't signed
+    :rtype:  Signer
+    """
+    key_id = config.get(constants.CONFIG_GPG_KEY)
+    if not key_id:
+        return None
+    homedir = config.get(constants.CONFIG_GPG_HOME) or None
+    return GpgSigner(key_id, homedir)
+
+
+def signature_paths(release_path):
+    """
+    Returns where the signatures of a Release file are written.
+
+    :return: tuple of the paths of the detached and the inline signature
+    :rtype:  tuple
+    """
+    directory = os.path.dirname(release_path)
+    return (os.path.join(directory, constants.RELEASE_SIGNATURE_FILENAME),
+            os.path.join(directory, constants.INRELEASE_FILENAME))
+
+
+# -- public classes -----------------------------------------------------------
+
+class Signer(object):
+    """
+    Interface of the signers of Release files.
+    """
+
+    def sign(self, release_paths):
+        """
+        Signs a batch of Release files, writing the files returned by
+        signature_paths() for each of them.
+
+        :param release_paths: full paths of the Release files
+        :type  release_paths: list
+
+        :raise SigningError: if any of the files can't be signed
+        """
+        raise NotImplementedError()
+
+    def close(self):
+        """
+        Releases whatever the signer holds on to.
+        """
+        pass
+
+
+class GpgSigner(Signer):
+    """
+    Signs with the key of a GnuPG home directory through its gpg-agent,
+    which holds the unlocked key. On first use the agent is launched, the
+    key looked up and a connection to the agent opened; every signature is
+    then made over that connection until the signer is closed.
+    """
+
+    def __init__(self, key_id, homedir=None, gpg='gpg'):
+        """
+        :param key_id: ID or fingerprint of the key to sign with
+        :type  key_id: str
+        :param homedir: GnuPG home directory holding the key, defaults to the
+                        one of the user Pulp runs as
+        :type  homedir: str
+        :param gpg: gpg executable, used to look the key up
+        :type  gpg: str
+        """
+        self.key_id = key_id
+        self.homedir = homedir
+        self.gpg = gpg
+        self._key = None
+        self._agent = None
+
+    def sign(self, release_paths):
+        self._open()
+
+        for path in release_paths:
+            content = open(path, 'rb').read()
+            detached, inline = signature_paths(path)
+
+            signature = self._signature(SIG_BINARY, content)
+            _write(detached, _armor(signature))
+
+            text = _cleartext(content)
+            signature = self._signature(SIG_TEXT, text.replace('\n', '\r\n'))
+            _write(inline, '-----BEGIN PGP SIGNED MESSAGE-----\nHash: SHA256\n\n%s\n%s' %
+                   (_dash_escape(text), _armor(signature)))
+
+        _LOG.info('Signed %d Release files with key <%s>' % (len(release_paths), self.key_id))
+
+    def close(self):
+        if self._agent is not None:
+            self._agent.close()
+            self._agent = None
+
+    def _open(self):
+        """
+        Looks the key up and connects to the agent, unless it's done already.
+        """
+        if self._agent is not None:
+            return
+        self._run('gpgconf', '--launch', 'gpg-agent')
+        if self._key is None:
+            self._key = self._find_key()
+        self._agent = _AgentConnection(self._run('gpgconf', '--list-dirs', 'agent-socket').strip())
+
+    def _find_key(self):
+        """
+        Returns the newest usable signing key or subkey of key_id, as gpg
+        picks it.
+
+        :rtype: _Key
+        """
+        listing = self._run(self.gpg, '--batch', '--with-colons', '--with-keygrip',
+                            '--fixed-list-mode', '--list-secret-keys', self.key_id)
+        candidates = []
+        current = None
+        for line in listing.splitlines():
+            fields = line.split(':')
+            if fields[0] in ('sec', 'ssb'):
+                current = None
+                usable = fields[1] not in ('i', 'd', 'r', 'e', 'n')
+                if usable and 's' in fields[11] and int(fields[3]) in KEY_ALGORITHMS:
+                    current = {'algorithm': int(fields[3]), 'created': int(fields[5])}
+                    candidates.append(current)
+            elif fields[0] == 'fpr' and current is not None and 'fingerprint' not in current:
+                current['fingerprint'] = fields[9]
+            elif fields[0] == 'grp' and current is not None:
+                current['keygrip'] = fields[9]
+
+        candidates = [c for c in candidates if 'fingerprint' in c and 'keygrip' in c]
+        if not candidates:
+            raise SigningError('No secret key to sign with found for <%s>' % self.key_id)
+        key = max(candidates, key=lambda c: c['created'])
+        return _Key(key['algorithm'], key['fingerprint'], key['keygrip'])
+
+    def _signature(self, signature_type, data):
+        """
+        Returns the OpenPGP signature packet of data made by the agent.
+        """
+        key = self._key
+        fingerprint = binascii.unhexlify(key.fingerprint)
+        hashed = (struct.pack('>BBBB', 4, signature_type, key.algorithm, HASH_ALGORITHM) +
+                  _subpackets((2, struct.pack('>I', int(time.time()))),
+                              (33, '\x04' + fingerprint)))
+        unhashed = _subpackets((16, fingerprint[-8:]))
+        digest = hashlib.sha256(data + hashed + '\x04\xff' +
+                                struct.pack('>I', len(hashed))).digest()
+
+        values = self._agent.sign(key.keygrip, digest)
+        try:
+            mpis = ''.join([_mpi(values[name]) for name in KEY_ALGORITHMS[key.algorithm]])
+        except KeyError:
+            raise SigningError('Unexpected signature from gpg-agent for <%s>' % self.key_id)
+
+        body = hashed + unhashed + digest[:2] + mpis
+        return struct.pack('>BH', 0x89, len(body)) + body
+
+    def _run(self, *command):
+        """
+        Runs a GnuPG tool on the home directory, returning its output.
+        """
+        try:
+            process = subprocess.Popen(command, env=self._env(), stdout=subprocess.PIPE,
+                                       stderr=subprocess.PIPE)
+            stdout, stderr = process.communicate()
+        except OSError, e:
+            raise SigningError('Could not run %s: %s' % (command[0], e))
+        if process.returncode != 0:
+            raise SigningError('%s failed: %s' % (' '.join(command), stderr.strip()))
+        return stdout
+
+    def _env(self):
+        env = dict(os.environ)
+        if self.homedir:
+            env['GNUPGHOME'] = self.homedir
+        return env
+
+
+# -- private classes ----------------------------------------------------------
+
+class _Key(object):
+    """
+    The key or subkey a signer signs with.
+    """
+
+    def __init__(self, algorithm, fingerprint, keygrip):
+        self.algorithm = algorithm
+        self.fingerprint = fingerprint
+        self.keygrip = keygrip
+
+
+class _AgentConnection(object):
+    """
+    Connection to a gpg-agent over its Assuan socket.
+    """
+
+    def __init__(self, path):
+        self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            self.socket.connect(path)
+        except socket.error, e:
+            self.socket.close()
+            raise SigningError('Could not connect to gpg-agent at <%s>: %s' % (path, e))
+        self.stream = self.socket.makefile('rb')
+        self._response()
+
+    def sign(self, keygrip, digest):
+        """
+        Signs a digest with a key the agent holds.
+
+        :return: the values of the signature by their names, e.g. r and s
+        :rtype:  dict
+        """
+        self.command('SIGKEY %s' % keygrip)
+        self.command('SETHASH --hash=%s %s' % (HASH_NAME, binascii.hexlify(digest).upper()))
+        sig_val = _parse_sexp(self.command('PKSIGN'))
+        if not isinstance(sig_val, list) or len(sig_val) < 2 or sig_val[0] != 'sig-val':
+            raise SigningError('Unexpected signature from gpg-agent')
+        return dict([(item[0], item[1]) for item in sig_val[1][1:]
+                     if isinstance(item, list) and len(item) == 2])
+
+    def command(self, line):
+        """
+        Sends a command, returning the data of the response.
+        """
+        try:
+            self.socket.sendall(line + '\n')
+        except socket.error, e:
+            raise SigningError('Lost the connection to gpg-agent: %s' % e)
+        return self._response()
+
+    def close(self):
+        try:
+            self.socket.sendall('BYE\n')
+        except socket.error:
+            pass
+        self.stream.close()
+        self.socket.close()
+
+    def _response(self):
+        data = []
+        while True:
+            line = self.stream.readline()
+            if not line:
+                raise SigningError('gpg-agent closed the connection')
+            line = line.rstrip('\n')
+            if line == 'OK' or line.startswith('OK '):
+                return ''.join(data)
+            elif line.startswith('ERR '):
+                raise SigningError('gpg-agent: %s' % line[4:])
+            elif line.startswith('D '):
+                data.append(urllib.unquote(line[2:]))
+            elif line.startswith('INQUIRE '):
+                self.socket.sendall('END\n')
+
+
+# -- private ------------------------------------------------------------------
+
+def _write(path, content):
+    f = open(path, 'wb')
+    try:
+        f.write(content)
+    finally:
+        f.close()
+
+
+def _cleartext(content):
+    """
+    Returns the text signed in a cleartext signature of content: its lines
+    without trailing whitespace or the final line break.
+    """
+    lines = content.split('\n')
+    if lines and lines[-1] == '':
+        lines.pop()
+    return '\n'.join([line.rstrip(' \t\r') for line in lines])
+
+
+def _dash_escape(text):
+    return '\n'.join([('- ' + line if line.startswith('-') else line)
+                      for line in text.split('\n')])
+
+
+def _subpackets(*subpackets):
+    """
+    Returns signature subpackets, given as (type, data), with the length of
+    all of them in front.
+    """
+    encoded = ''.join([chr(len(data) + 1) + chr(subpacket_type) + data
+                       for subpacket_type, data in subpackets])
+    return struct.pack('>H', len(encoded)) + encoded
+
+
+def _mpi(value):
+    value = value.lstrip('\x00')
+    bits = (len(value) - 1) * 8 + len(bin(ord(value[0]))) - 2 if value else 0
+    return struct.pack('>H', bits) + value
+
+
+def _armor(packet):
+    lines = ['-----BEGIN PGP SIGNATURE-----', '']
+    encoded = base64.b64encode(packet)
+    lines.extend([encoded[i:i + 64] for i in range(0, len(encoded), 64)])
+    lines.append('=' + base64.b64encode(struct.pack('>I', _crc24(packet))[1:]))
+    lines.append('-----END PGP SIGNATURE-----')
+    return '\n'.join(lines) + '\n'
+
+
+def _crc24(data):
+    crc = 0xB704CE
+    for c in data:
+        crc ^= ord(c) << 16
+        for i in range(8):
+            crc <<= 1
+            if crc & 0x1000000:
+                crc ^= 0x1864CFB
+    return crc & 0xFFFFFF
+
+
+def _parse_sexp(data):
+    """
+    Parses a canonical S-expression into nested lists of strings.
+    """
+    stack = [[]]
+    i = 0
+    while i < len(data):
+        c = data[i]
+        if c == '(':
+            stack.append([])
+            i += 1
+        elif c == ')':
+            if len(stack) < 2:
+                raise SigningError('Malformed S-expression from gpg-agent')
+            item = stack.pop()
+            stack[-1].append(item)
+            i += 1
+        elif c.isdigit():
+            colon = data.index(':', i)
+            length = int(data[i:colon])
+            stack[-1].append(data[colon + 1:colon + 1 + length])
+            i = colon + 1 + length
+        else:
+            raise SigningError('Malformed S-expression from gpg-agent')
+    if len(stack) != 1 or len(stack[0]) != 1:
+        raise SigningError('Malformed S-expression from gpg-agent')
+    return stack[0][0]
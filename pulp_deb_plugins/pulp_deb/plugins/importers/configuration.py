@@ -14,7 +14,8 @@
 
 from gettext import gettext as _
 
-from pulp_deb.common import constants
+from pulp_deb.common import constants, query
+from pulp_deb.plugins import metrics
 from pulp_deb.plugins.importers.downloaders import factory
 from pulp_deb.plugins.importers.downloaders import url_utils
 
@@ -34,6 +35,19 @@ def validate(config):
         _validate_resources,
         _validate_remove_missing,
         _validate_queries,
+        _validate_retain_versions,
+        _validate_index_cache_size,
+        _validate_parse_workers,
+        _validate_index_compression,
+        _validate_extra_indexes,
+        _validate_upload_workers,
+        _validate_metrics_sink,
+        _validate_max_downloads,
+        _validate_profile_sync,
+        _validate_profile_hotspots,
+        _validate_local_placement,
+        _validate_local_workers,
+        _validate_local_inflight_bytes,
     )
 
     for validator in validations:
@@ -79,6 +93,12 @@ def _validate_queries(config):
         msg = 'The value for <%(q)s> must be specified as a list'
         return False, _(msg) % {'q': constants.CONFIG_QUERIES}
 
+    try:
+        query.compile_queries(queries)
+    except query.InvalidQuery, e:
+        msg = 'The query <%(q)s> could not be parsed'
+        return False, _(msg) % {'q': e.query}
+
     return True, None
 
 
@@ -97,3 +117,189 @@ def _validate_remove_missing(config):
         msg = 'The value for <%(r)s> must be either "true" or "false"'
         return False, _(msg) % {'r': constants.CONFIG_REMOVE_MISSING}
     return True, None
+
+
+def _validate_retain_versions(config):
+    """
+    Validates the number of package versions to retain if it is specified.
+    """
+    return _validate_non_negative_integer(config, constants.CONFIG_RETAIN_VERSIONS)
+
+
+def _validate_index_cache_size(config):
+    """
+    Validates the size of the parsed index cache if it is specified.
+    """
+    return _validate_non_negative_integer(config, constants.CONFIG_INDEX_CACHE_SIZE)
+
+
+def _validate_parse_workers(config):
+    """
+    Validates the number of index parsing processes if it is specified.
+    """
+    return _validate_non_negative_integer(config, constants.CONFIG_PARSE_WORKERS)
+
+
+def _validate_index_compression(config):
+    """
+    Validates the index compression preference if it is specified.
+    """
+
+    # The preference is optional
+    if constants.CONFIG_INDEX_COMPRESSION not in config.keys():
+        return True, None
+
+    preferences = constants.COMPRESSION_PREFERENCES.keys()
+    if config.get(constants.CONFIG_INDEX_COMPRESSION) not in preferences:
+        msg = 'The value for <%(c)s> must be one of %(p)s'
+        return False, _(msg) % {'c': constants.CONFIG_INDEX_COMPRESSION,
+                                'p': ', '.join(sorted(preferences))}
+    return True, None
+
+
+def _validate_extra_indexes(config):
+    """
+    Validates the extra indexes to sync if they are specified.
+    """
+
+    # The indexes are optional
+    if constants.CONFIG_EXTRA_INDEXES not in config.keys():
+        return True, None
+
+    extra = config.get(constants.CONFIG_EXTRA_INDEXES)
+    if not isinstance(extra, (list, tuple)) or \
+            [e for e in extra if e not in constants.EXTRA_INDEX_TYPES]:
+        msg = 'The value for <%(e)s> must be a list of %(t)s'
+        return False, _(msg) % {'e': constants.CONFIG_EXTRA_INDEXES,
+                                't': ', '.join(constants.EXTRA_INDEX_TYPES)}
+    return True, None
+
+
+def _validate_upload_workers(config):
+    """
+    Validates the number of processes uploaded bundles are read in if it is
+    specified.
+    """
+    return _validate_non_negative_integer(config, constants.CONFIG_UPLOAD_WORKERS)
+
+
+def _validate_metrics_sink(config):
+    """
+    Validates the URL of the metrics sink if it is specified.
+    """
+
+    # The sink is optional
+    url = config.get(constants.CONFIG_METRICS_SINK)
+    if not url:
+        return True, None
+
+    try:
+        metrics.parse_sink_url(url)
+    except ValueError:
+        msg = 'The value for <%(m)s> must be a statsd:// or file:// URL'
+        return False, _(msg) % {'m': constants.CONFIG_METRICS_SINK}
+    return True, None
+
+
+def _validate_max_downloads(config):
+    """
+    Validates the number of concurrent downloads if it is specified.
+    """
+    return _validate_positive_integer(config, constants.CONFIG_MAX_DOWNLOADS)
+
+
+def _validate_profile_sync(config):
+    """
+    Validates the profiling flag if it is specified.
+    """
+
+    # The flag is optional
+    if constants.CONFIG_PROFILE_SYNC not in config.keys():
+        return True, None
+
+    # Make sure it's a boolean
+    parsed = config.get_boolean(constants.CONFIG_PROFILE_SYNC)
+    if parsed is None:
+        msg = 'The value for <%(p)s> must be either "true" or "false"'
+        return False, _(msg) % {'p': constants.CONFIG_PROFILE_SYNC}
+    return True, None
+
+
+def _validate_profile_hotspots(config):
+    """
+    Validates the number of functions listed for a profiled sync if it is
+    specified.
+    """
+    return _validate_non_negative_integer(config, constants.CONFIG_PROFILE_HOTSPOTS)
+
+
+def _validate_local_placement(config):
+    """
+    Validates how files of local feeds are placed if it is specified.
+    """
+
+    # The mode is optional
+    if constants.CONFIG_LOCAL_PLACEMENT not in config.keys():
+        return True, None
+
+    if config.get(constants.CONFIG_LOCAL_PLACEMENT) not in constants.PLACEMENTS:
+        msg = 'The value for <%(l)s> must be one of %(p)s'
+        return False, _(msg) % {'l': constants.CONFIG_LOCAL_PLACEMENT,
+                                'p': ', '.join(constants.PLACEMENTS)}
+    return True, None
+
+
+def _validate_local_workers(config):
+    """
+    Validates the number of threads files of local feeds are ingested in if
+    it is specified.
+    """
+    return _validate_positive_integer(config, constants.CONFIG_LOCAL_WORKERS)
+
+
+def _validate_local_inflight_bytes(config):
+    """
+    Validates the number of bytes of local files ingested at once if it is
+    specified.
+    """
+    return _validate_positive_integer(config, constants.CONFIG_LOCAL_INFLIGHT_BYTES)
+
+
+def _validate_non_negative_integer(config, key):
+    """
+    Validates that an optional value is a non-negative integer.
+    """
+
+    # The value is optional
+    if key not in config.keys():
+        return True, None
+
+    try:
+        count = int(config.get(key))
+    except (TypeError, ValueError):
+        count = -1
+
+    if count < 0:
+        msg = 'The value for <%(r)s> must be a non-negative integer'
+        return False, _(msg) % {'r': key}
+    return True, None
+
+
+def _validate_positive_integer(config, key):
+    """
+    Validates that an optional value is a positive integer.
+    """
+
+    # The value is optional
+    if key not in config.keys():
+        return True, None
+
+    try:
+        count = int(config.get(key))
+    except (TypeError, ValueError):
+        count = 0
+
+    if count < 1:
+        msg = 'The value for <%(r)s> must be a positive integer'
+        return False, _(msg) % {'r': key}
+    return True, None
@@ -39,3 +39,19 @@ class BaseDownloader(object):
         :rtype:  list
         """
         raise NotImplementedError()
+
+    def concurrency(self):
+        """
+        Returns how many resources the downloader retrieves at once, so
+        callers know how many to hand it in one call.
+
+        :rtype: int
+        """
+        return 1
+
+    def close(self):
+        """
+        Releases what the downloader keeps from one call to the next, such as
+        open connections. The downloader can't be used afterwards.
+        """
+        pass
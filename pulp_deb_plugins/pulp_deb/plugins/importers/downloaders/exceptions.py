@@ -58,3 +58,11 @@ class UnauthorizedException(FileRetrievalException):
     (e.g. 401 from a web request, no read perms for a local read).
     """
     pass
+
+
+class ChecksumMismatchException(FileRetrievalException):
+    """
+    Raised if a retrieved file doesn't have the size or checksum its index
+    lists for it.
+    """
+    pass
@@ -14,14 +14,22 @@
 """
 Determines the correct downloader implementation to return based on the
 url type.
+
+The downloaders registered in the namespace are looked up once, the first
+time one is asked for, and kept for the life of the process; scanning the
+entry points again for every validation and sync is what made lookups slow.
 """
 
 import logging
-from stevedore import driver
 
+from pulp_deb.common import utils
 from pulp_deb.plugins.importers.downloaders.exceptions import UnsupportedURLType, InvalidURL
 from pulp_deb.plugins.importers.downloaders import url_utils
 
+# Imported on first lookup, as stevedore loads pkg_resources, which scans
+# every installed distribution
+extension = utils.lazy_import('stevedore.extension')
+
 
 # -- constants ----------------------------------------------------------------
 
@@ -29,6 +37,9 @@ NAMESPACE = 'pulp.downloaders.deb'
 
 LOG = logging.getLogger(__name__)
 
+# Downloader classes by url type, loaded from the namespace on first use
+_DRIVERS = None
+
 
 # -- public -------------------------------------------------------------------
 
@@ -80,8 +91,23 @@ def get_url_type_downloader(url_type):
     Gets the downloader class from url_type using stevedore
     """
     try:
-        mgr = driver.DriverManager(NAMESPACE, url_type)
-    except RuntimeError:
-        # FIXME: Should look better...
+        return _drivers()[url_type]
+    except KeyError:
         raise UnsupportedURLType(url_type)
-    return mgr.driver
+
+
+# -- private ------------------------------------------------------------------
+
+def _drivers():
+    """
+    Returns the downloader classes registered in the namespace by url type,
+    scanning the namespace the first time only. Downloaders failing to load
+    are logged by stevedore and left out.
+
+    :rtype: dict
+    """
+    global _DRIVERS
+    if _DRIVERS is None:
+        manager = extension.ExtensionManager(NAMESPACE)
+        _DRIVERS = dict([(e.name, e.plugin) for e in manager])
+    return _DRIVERS
@@ -14,12 +14,16 @@
 import copy
 import logging
 import os
+import sys
 
-import pycurl
 from pulp.common.util import encode_unicode
 
-from pulp_deb.common import constants
-from pulp_deb.plugins.importers.downloaders import base, exceptions, url_utils
+from pulp_deb.common import constants, utils
+from pulp_deb.plugins.importers.downloaders import base, exceptions
+
+# Imported on first use, so loading the downloaders of a sync of a local
+# feed doesn't load libcurl
+pycurl = utils.lazy_import('pycurl')
 
 
 # -- constants ----------------------------------------------------------------
@@ -27,6 +31,10 @@ from pulp_deb.plugins.importers.downloaders import base, exceptions, url_utils
 
 DOWNLOAD_TMP_DIR = 'http-downloads'
 
+# Longest time in seconds concurrent downloads wait for activity before
+# checking on them again
+SELECT_TIMEOUT = 1.0
+
 _LOG = logging.getLogger(__name__)
 
 
@@ -36,8 +44,18 @@ _LOG = logging.getLogger(__name__)
 class HttpDownloader(base.BaseDownloader):
     """
     Used when the source for deb packages is a remote source over HTTP.
+
+    The curl handles, and the multi handle driving concurrent downloads,
+    are kept until the downloader is closed, so the connections they open
+    are reused from one download to the next. With max_downloads above 1 the
+    resources of a call are downloaded over that many connections at once.
     """
 
+    def __init__(self, repo, conduit, config, is_cancelled_call):
+        super(HttpDownloader, self).__init__(repo, conduit, config, is_cancelled_call)
+        self._curls = []
+        self._multi = None
+
     def download_resources(self, resources, progress_report, in_memory=False):
         """
         Retrieves all metadata documents needed to fulfill the configuration
@@ -54,40 +72,117 @@ class HttpDownloader(base.BaseDownloader):
         progress_report.query_finished_count = 0
         progress_report.query_total_count = len(resources)
 
-        for resource in resources:
-            _LOG.info('Retrieving URL <%s>' % resource['url'])
-            progress_report.current_query = resource['url']
-            progress_report.update_progress()
-
-            # Let any exceptions from this bubble up, the caller will update
-            # the progress report as necessary
-            if in_memory:
-                content = InMemoryDownloadedContent()
-                self._download_file(resource['url'], content)
-                resource['content'] = content.content.split('\n')
-            else:
-                tmp_dir = _create_download_tmp_dir(self.repo.working_dir)
-
-                name = resource['url'].split('/')[-1]
-                tmp_filename = os.path.join(tmp_dir, name)
-
-                content = StoredDownloadedContent(tmp_filename)
-                content.open()
+        # Let any exceptions from the downloads bubble up, the caller will
+        # update the progress report as necessary
+        concurrency = min(self._max_downloads(), len(resources))
+        if concurrency > 1:
+            self._download_concurrently(resources, progress_report, in_memory, concurrency)
+        else:
+            for resource in resources:
+                _LOG.info('Retrieving URL <%s>' % resource['url'])
+                progress_report.current_query = resource['url']
+                progress_report.update_progress()
+
+                download = _Download(resource, self.repo.working_dir, in_memory)
                 try:
-                    self._download_file(resource['url'], content)
-                    content.close()
+                    self._download_file(resource['url'], download.content, self._curl(0))
                 except:
-                    content.close()
-                    content.delete()
+                    download.discard()
                     raise
-                resource['path'] = tmp_filename
+                download.finish()
 
-            progress_report.query_finished_count += 1
+                progress_report.query_finished_count += 1
 
         progress_report.update_progress() # to get the final finished count out there
         return resources
 
-    def _download_file(self, url, destination):
+    def concurrency(self):
+        return self._max_downloads()
+
+    def close(self):
+        """
+        Closes the curl handles kept by the downloader, and the connections
+        they hold open.
+        """
+        if self._multi is not None:
+            self._multi.close()
+            self._multi = None
+        while self._curls:
+            self._curls.pop().close()
+
+    def _download_concurrently(self, resources, progress_report, in_memory, concurrency):
+        """
+        Downloads the resources over the given number of connections at once.
+        On the first failure no more downloads are started; the ones under way
+        are let finish and the failure is raised.
+        """
+        if self._multi is None:
+            self._multi = pycurl.CurlMulti()
+        multi = self._multi
+        idle = [self._curl(i) for i in range(concurrency)]
+        pending = list(reversed(resources))
+        active = {}
+        error = None
+
+        try:
+            while active or (pending and error is None):
+                while idle and pending and error is None:
+                    resource = pending.pop()
+                    _LOG.info('Retrieving URL <%s>' % resource['url'])
+                    progress_report.current_query = resource['url']
+                    progress_report.update_progress()
+
+                    curl = idle.pop()
+                    download = _Download(resource, self.repo.working_dir, in_memory)
+                    curl.setopt(pycurl.URL, encode_unicode(resource['url']))
+                    curl.setopt(pycurl.WRITEFUNCTION, download.content.update)
+                    multi.add_handle(curl)
+                    active[curl] = download
+
+                while multi.perform()[0] == pycurl.E_CALL_MULTI_PERFORM:
+                    pass
+
+                while True:
+                    queued, succeeded, failed = multi.info_read()
+                    done = [(curl, None) for curl in succeeded]
+                    done.extend([(curl, pycurl.error(errno, msg)) for curl, errno, msg in failed])
+
+                    for curl, curl_error in done:
+                        multi.remove_handle(curl)
+                        idle.append(curl)
+                        download = active.pop(curl)
+                        try:
+                            if curl_error is not None:
+                                raise curl_error
+                            _check_status(curl, download.resource['url'])
+                        except Exception:
+                            download.discard()
+                            if error is None:
+                                error = sys.exc_info()
+                            continue
+                        download.finish()
+                        progress_report.query_finished_count += 1
+
+                    if not queued:
+                        break
+
+                # Handles freed by finished downloads are given the next
+                # resources straight away; otherwise waits for activity on
+                # the connections, but no longer than libcurl asks to be
+                # called back in
+                if active and not (idle and pending and error is None):
+                    timeout = multi.timeout()
+                    if timeout != 0:
+                        multi.select(timeout / 1000.0 if timeout > 0 else SELECT_TIMEOUT)
+        finally:
+            for curl, download in active.items():
+                multi.remove_handle(curl)
+                download.discard()
+
+        if error is not None:
+            raise error[0], error[1], error[2]
+
+    def _download_file(self, url, destination, curl=None):
         """
         Downloads the content at the given URL into the given destination.
         The object passed into destination must have a method called "update"
@@ -97,24 +192,40 @@ class HttpDownloader(base.BaseDownloader):
         :type  url: str
 
         :param destination: object
-        @return:
+
+        :param curl: handle to download with, keeping its connection open
+                     afterwards; a new one is created and closed if None
+        :type  curl: pycurl.Curl
         """
-        curl = self._create_and_configure_curl()
+        close = curl is None
+        if close:
+            curl = self._create_and_configure_curl()
 
         url = encode_unicode(url) # because of how the config is stored in pulp
 
         curl.setopt(pycurl.URL, url)
         curl.setopt(pycurl.WRITEFUNCTION, destination.update)
-        curl.perform()
-        status = curl.getinfo(curl.HTTP_CODE)
-        curl.close()
+        try:
+            curl.perform()
+            _check_status(curl, url)
+        finally:
+            if close:
+                curl.close()
+
+    def _curl(self, index):
+        """
+        Returns the index-th of the handles kept by the downloader, creating
+        it if needed.
 
-        if status == 401:
-            raise exceptions.UnauthorizedException(url)
-        elif status == 404:
-            raise exceptions.FileNotFoundException(url)
-        elif status != 200:
-            raise exceptions.FileRetrievalException(url)
+        :rtype: pycurl.Curl
+        """
+        while len(self._curls) <= index:
+            self._curls.append(self._create_and_configure_curl())
+        return self._curls[index]
+
+    def _max_downloads(self):
+        return int(self.config.get(constants.CONFIG_MAX_DOWNLOADS,
+                                   constants.DEFAULT_MAX_DOWNLOADS))
 
     def _create_and_configure_curl(self):
         """
@@ -152,6 +263,35 @@ class HttpDownloader(base.BaseDownloader):
 # -- private classes ----------------------------------------------------------
 
 
+class _Download(object):
+    """
+    Destination of the download of one resource, recorded in the resource
+    once the download has succeeded.
+    """
+    def __init__(self, resource, working_dir, in_memory):
+        self.resource = resource
+        self.in_memory = in_memory
+        if in_memory:
+            self.content = InMemoryDownloadedContent()
+        else:
+            tmp_dir = _create_download_tmp_dir(working_dir)
+            tmp_filename = os.path.join(tmp_dir, _download_filename(resource['url']))
+            self.content = StoredDownloadedContent(tmp_filename)
+            self.content.open()
+
+    def finish(self):
+        if self.in_memory:
+            self.resource['content'] = self.content.content.split('\n')
+        else:
+            self.content.close()
+            self.resource['path'] = self.content.filename
+
+    def discard(self):
+        if not self.in_memory:
+            self.content.close()
+            self.content.delete()
+
+
 class InMemoryDownloadedContent(object):
     """
     In memory storage that content will be written to by PyCurl.
@@ -180,7 +320,7 @@ class StoredDownloadedContent(object):
         Sets the content object to be able to accept and store data sent to
         its update method.
         """
-        self.file = open(self.filename, 'a+')
+        self.file = open(self.filename, 'w')
 
     def update(self, buffer):
         """
@@ -207,9 +347,30 @@ class StoredDownloadedContent(object):
 # -- utilities ----------------------------------------------------------------
 
 
+def _check_status(curl, url):
+    """
+    Raises the exception matching the HTTP status of a finished download.
+    """
+    status = curl.getinfo(pycurl.HTTP_CODE)
+    if status == 401:
+        raise exceptions.UnauthorizedException(url)
+    elif status == 404:
+        raise exceptions.FileNotFoundException(url)
+    elif status != 200:
+        raise exceptions.FileRetrievalException(url)
+
+
 def _create_download_tmp_dir(repo_working_dir):
     tmp_dir = os.path.join(repo_working_dir, DOWNLOAD_TMP_DIR)
     if not os.path.exists(tmp_dir):
         os.mkdir(tmp_dir)
     return tmp_dir
 
+
+def _download_filename(url):
+    """
+    Returns the name to store a download under. Indexes of different
+    components and architectures share the same basename, so the whole path
+    of the URL is used; the extension is kept so it can be decompressed.
+    """
+    return url.split('://', 1)[-1].replace('/', '_')
@@ -16,8 +16,13 @@ import logging
 
 from pulp.plugins.importer import Importer
 
-from pulp_deb.common import constants
-from pulp_deb.plugins.importers import configuration, sync, upload, copier
+from pulp_deb.common import constants, utils
+from pulp_deb.plugins.importers import configuration, copier
+
+# Imported on first use, as they bring in the parsing, downloading and
+# package reading that Pulp loading the plugin doesn't need
+sync = utils.lazy_import('pulp_deb.plugins.importers.sync')
+upload = utils.lazy_import('pulp_deb.plugins.importers.upload')
 
 _LOG = logging.getLogger(__name__)
 
@@ -62,7 +67,8 @@ class PackageImporter(Importer):
 
     def upload_unit(self, repo, type_id, unit_key, metadata, file_path, conduit,
                     config):
-        upload.handle_uploaded_unit(repo, type_id, unit_key, metadata, file_path, conduit)
+        upload.handle_uploaded_unit(repo, type_id, unit_key, metadata, file_path, conduit,
+                                    config)
 
     def cancel_sync_repo(self, call_request, call_report):
         self.sync_cancelled = True
@@ -11,25 +11,45 @@
 # have received a copy of GPLv2 along with this software; if not, see
 # http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
 
-from datetime import datetime
 from gettext import gettext as _
 import logging
-import ipdb
+import multiprocessing
 import os
-import shutil
 import sys
+import threading
+from multiprocessing.pool import ThreadPool
 
 from pulp.common.util import encode_unicode
 from pulp.plugins.conduits.mixins import UnitAssociationCriteria
 
-from pulp_deb.common import constants, model
+from pulp_deb.common import constants, model, query, utils
 from pulp_deb.common.constants import (STATE_FAILED, STATE_RUNNING, STATE_SUCCESS)
 from pulp_deb.common.model import Distribution, Package
 from pulp_deb.common.sync_progress import SyncProgressReport
+from pulp_deb.plugins import metrics, placement, profiling
+from pulp_deb.plugins.cache import DigestCache
 from pulp_deb.plugins.importers.downloaders import factory as downloader_factory
+from pulp_deb.plugins.importers.downloaders.exceptions import (ChecksumMismatchException,
+                                                               FileRetrievalException)
+from pulp_deb.plugins.importers.downloaders.local import LocalDownloader
 
 _LOG = logging.getLogger(__name__)
 
+# Directory in the working directory holding the parsed index cache
+INDEX_CACHE_DIR = 'index-cache'
+
+# Directory in the working directory the extra indexes of the last sync are
+# stored in, laid out as in the dist of the feed
+EXTRA_INDEXES_DIR = 'extra-indexes'
+
+# Names of the checksum fields of the Release file by hashlib algorithm
+RELEASE_CHECKSUMS = (('md5', 'md5sum'), ('sha1', 'sha1'), ('sha256', 'sha256'))
+
+# Packages handed to a downloader retrieving several files at once in one
+# call, per file it retrieves at once; enough to keep its connections busy
+# without holding many downloaded files before they are stored
+DOWNLOAD_BATCH_FACTOR = 4
+
 # -- public classes -----------------------------------------------------------
 
 
@@ -46,6 +66,9 @@ class PackageSyncRun(object):
         self.is_cancelled_call = is_cancelled_call
 
         self.progress_report = SyncProgressReport(sync_conduit)
+        self.metrics = metrics.Metrics(metrics.get_sink(config))
+        self.placer = placement.Placer(config.get(constants.CONFIG_LOCAL_PLACEMENT) or
+                                       constants.DEFAULT_LOCAL_PLACEMENT)
 
         self.dist = model.Distribution(**self.config.get(constants.CONFIG_DIST))
 
@@ -56,23 +79,38 @@ class PackageSyncRun(object):
         call. This call will make calls into the conduit's progress update
         as appropriate.
 
-        This call executes serially. No threads are created by this call. It
-        will not return until either a step fails or the entire sync is
-        completed.
+        Depending on the configuration, this call works concurrently: the
+        indexes are parsed in a pool of parse_workers processes, up to
+        max_downloads transfers run at once in a single curl multi handle,
+        and local packages are imported in a pool of local_workers threads.
+        Units are saved and progress is reported only from the thread making
+        this call. It will not return until either a step fails or the entire
+        sync is completed.
 
         :return: the report object to return to Pulp from the sync call
         :rtype:  pulp.plugins.model.SyncReport
         """
         _LOG.info('Beginning sync for repository <%s>' % self.repo.id)
 
+        profiler = profiling.get_profiler(self.config)
+        if profiler is not None:
+            profiler.start()
+
         try:
-            self._update_dist()
-            if len(self.dist.packages) == 0:
+            if not self._update_dist() or len(self.dist.packages) == 0:
                 report = self.progress_report.build_final_report()
                 return report
 
             self._import_packages()
         finally:
+            if profiler is not None:
+                profiler.stop()
+                self.progress_report.profile = profiler.report(
+                    os.path.join(self.repo.working_dir, profiling.PROFILE_FILENAME))
+
+            self.progress_report.metrics = self.metrics.report()
+            self.metrics.close()
+
             # One final progress update before finishing
             self.progress_report.update_progress()
 
@@ -82,70 +120,233 @@ class PackageSyncRun(object):
     def _update_dist(self):
         """
         Takes the necessary actions (according to the run configuration) to
-        retrieve and parse the repository's resources. This call will return
-        either the successfully parsed resources or None if it could not
-        be retrieved or parsed. The progress report will be updated with the
-        appropriate description of what went wrong in the event of an error,
-        so the caller should interpet a None return as an error occuring and
-        not continue the sync.
+        retrieve and parse the repository's resources into the dist. The
+        progress report will be updated with the appropriate description of
+        what went wrong in the event of an error, so the caller should not
+        continue the sync if this returns False.
 
-        :return: object representation of the resources
-        :rtype:  Repository
+        :return: whether the resources were retrieved and parsed
+        :rtype:  bool
         """
         _LOG.info('Beginning resources retrieval for repository <%s>' % self.repo.id)
 
-        self.progress_report.resource_state = STATE_RUNNING
+        self.progress_report.metadata_state = STATE_RUNNING
         self.progress_report.update_progress()
 
-        start_time = datetime.now()
+        start_time = utils.monotonic()
 
         # Retrieve the metadata from the source
+        downloader = None
         try:
             downloader = self._create_downloader()
-            resources = downloader.download_resources(
-                self.dist.get_indexes(),
-                self.progress_report)
+            with self.metrics.timer('index.release'):
+                self._update_release(downloader)
+            with self.metrics.timer('index.download') as timer:
+                resources = downloader.download_resources(
+                    self.dist.get_indexes(self._compression_preference(),
+                                          extra=self._extra_indexes()),
+                    self.progress_report)
+                timer.bytes = _downloaded_size(resources)
         except Exception, e:
             _LOG.exception('Exception while retrieving resources for repository <%s>' % self.repo.id)
-            self.progress_report.state = STATE_FAILED
-            self.progress_report.error_message = _('Error downloading resources')
-            self.progress_report.exception = e
-            self.progress_report.traceback = sys.exc_info()[2]
-
-            end_time = datetime.now()
-            duration = end_time - start_time
-            self.progress_report.execution_time = duration.seconds
+            self.progress_report.metadata_state = STATE_FAILED
+            self.progress_report.metadata_error_message = _('Error downloading resources')
+            self.progress_report.metadata_exception = e
+            self.progress_report.metadata_traceback = sys.exc_info()[2]
+            self._metadata_finished(start_time)
 
             self.progress_report.update_progress()
 
-            return None
+            return False
+        finally:
+            if downloader is not None:
+                downloader.close()
 
         # Parse the retrieved resoruces documents
         try:
-            self.dist.update_from_resources(resources)
+            extra = [r for r in resources if r['type'] in constants.EXTRA_INDEX_TYPES]
+            indexes = [r for r in resources if r['type'] not in constants.EXTRA_INDEX_TYPES]
+
+            predicate = query.compile_queries(self.config.get(constants.CONFIG_QUERIES))
+            for resource, records in self._parse_resources(indexes):
+                self.dist.update_from_records(resource, records, predicate=predicate)
+
+            self._store_extra_indexes(extra)
         except Exception, e:
             _LOG.exception('Exception parsing resources for repository <%s>' % self.repo.id)
-            self.progress_report.state = STATE_FAILED
-            self.progress_report.error_message = _('Error parsing repository packages resources document')
-            self.progress_report.exception = e
-            self.progress_report.traceback = sys.exc_info()[2]
-
-            end_time = datetime.now()
-            duration = end_time - start_time
-            self.progress_report.execution_time = duration.seconds
+            self.progress_report.metadata_state = STATE_FAILED
+            self.progress_report.metadata_error_message = _('Error parsing repository packages resources document')
+            self.progress_report.metadata_exception = e
+            self.progress_report.metadata_traceback = sys.exc_info()[2]
+            self._metadata_finished(start_time)
 
             self.progress_report.update_progress()
 
-            return None
+            return False
 
         # Last update to the progress report before returning
-        self.progress_report.state = STATE_SUCCESS
-
-        end_time = datetime.now()
-        duration = end_time - start_time
-        self.progress_report.execution_time = duration.seconds
+        self.progress_report.metadata_state = STATE_SUCCESS
+        self._metadata_finished(start_time)
 
         self.progress_report.update_progress()
+        return True
+
+    def _metadata_finished(self, start_time):
+        """
+        Records how long retrieving and parsing the metadata took.
+
+        :param start_time: reading of utils.monotonic() when it started
+        :type  start_time: float
+        """
+        elapsed = utils.monotonic() - start_time
+        self.progress_report.metadata_execution_time = elapsed
+        self.metrics.record('phase.metadata', elapsed)
+
+    def _update_release(self, downloader):
+        """
+        Retrieves the Release file of the distribution, which lists the
+        compressed variants each index is available as. Without one the
+        indexes are retrieved in the default compression.
+
+        :param downloader: downloader instance to use for retrieving it
+        """
+        release = self.dist.get_release_resource()
+        try:
+            downloader.download_resources([release], self.progress_report, in_memory=True)
+        except FileRetrievalException:
+            _LOG.warn('No Release file found for repository <%s>' % self.repo.id)
+            return
+        self.dist.update_from_release(release)
+
+    def _compression_preference(self):
+        """
+        Returns the index compressions in the configured order of preference.
+
+        :rtype: tuple
+        """
+        preference = self.config.get(constants.CONFIG_INDEX_COMPRESSION,
+                                     constants.DEFAULT_INDEX_COMPRESSION)
+        return constants.COMPRESSION_PREFERENCES[preference]
+
+    def _store_extra_indexes(self, resources):
+        """
+        Moves the downloaded extra indexes into the working directory as they
+        are, and records them in the repository scratchpad for the
+        distributor to publish. Indexes of previous syncs that are no longer
+        listed are removed.
+
+        :param resources: downloaded extra index resources
+        :type  resources: list
+        """
+        root = os.path.join(self.repo.working_dir, EXTRA_INDEXES_DIR)
+
+        files = {}
+        for resource in resources:
+            relative_path = resource['relative_path']
+            listed = self.dist.release_files[relative_path]
+            path = os.path.join(root, relative_path)
+            _place_file(self.placer, resource['path'], path, self.repo.working_dir)
+
+            digests = {}
+            for algorithm, field in RELEASE_CHECKSUMS:
+                digests[algorithm] = listed.get(field) or utils.file_digest(path, algorithm)
+            if utils.file_digest(path) != digests['sha256']:
+                _LOG.warn('Checksum of <%s> does not match the Release file, skipping it' %
+                          resource['url'])
+                os.remove(path)
+                continue
+            files[relative_path] = {'path': relative_path, 'size': os.path.getsize(path),
+                                    'digests': digests}
+
+        for directory, dirs, names in os.walk(root, topdown=False):
+            for name in names:
+                path = os.path.join(directory, name)
+                if os.path.relpath(path, root) not in files:
+                    os.remove(path)
+            if directory != root and not os.listdir(directory):
+                os.rmdir(directory)
+
+        scratchpad = self.sync_conduit.get_repo_scratchpad() or {}
+        scratchpad[constants.SCRATCHPAD_EXTRA_INDEXES] = {'root': root, 'files': files}
+        self.sync_conduit.set_repo_scratchpad(scratchpad)
+
+        _LOG.info('Stored %d extra indexes for repository <%s>' % (len(files), self.repo.id))
+
+    def _parse_resources(self, resources):
+        """
+        Parses the downloaded indexes into records. Indexes that are unchanged
+        since they were last parsed are loaded from the index cache; the rest
+        are parsed, concurrently if more than one parse worker is configured.
+
+        :param resources: downloaded index resources
+        :type  resources: list
+
+        :return: list of (resource, records) tuples
+        :rtype:  list
+        """
+        cache = self._index_cache()
+
+        digests = [None] * len(resources)
+        parsed = [None] * len(resources)
+        if cache is not None:
+            for i, resource in enumerate(resources):
+                if 'path' in resource:
+                    digests[i] = utils.file_digest(resource['path'])
+                    parsed[i] = cache.get(digests[i])
+
+        missing = [i for i, records in enumerate(parsed) if records is None]
+        self.metrics.count('index.cached', len(resources) - len(missing))
+
+        timings = []
+        missing_records = model.parse_indexes([resources[i] for i in missing],
+                                              workers=self._parse_workers(), timings=timings)
+        for index_timings in timings:
+            self.metrics.record('index.decompress', index_timings['decompress'],
+                                index_timings['bytes'])
+            self.metrics.record('index.parse', index_timings['parse'])
+
+        for i, records in zip(missing, missing_records):
+            parsed[i] = records
+            if digests[i] is not None:
+                self._log_index_changes(cache, resources[i], records)
+                cache.put(digests[i], records, name=resources[i]['url'])
+        return zip(resources, parsed)
+
+    def _log_index_changes(self, cache, resource, records):
+        """
+        Logs how an index differs from the last version of it that was parsed.
+        """
+        previous = cache.get(cache.lookup(resource['url']))
+        if previous is None:
+            return
+
+        with self.metrics.timer('index.diff'):
+            added, removed = model.diff_records(previous, records)
+        _LOG.info('Index <%s> changed: %d entries added, %d removed' %
+                  (resource['url'], len(added), len(removed)))
+
+    def _parse_workers(self):
+        """
+        Returns how many processes to parse indexes in.
+
+        :rtype: int
+        """
+        workers = int(self.config.get(constants.CONFIG_PARSE_WORKERS,
+                                      constants.DEFAULT_PARSE_WORKERS))
+        return workers or multiprocessing.cpu_count()
+
+    def _index_cache(self):
+        """
+        Returns the cache of parsed indexes for this repository.
+
+        :return: the cache or None if it's disabled
+        :rtype:  pulp_deb.plugins.cache.DigestCache
+        """
+        size = int(self.config.get(constants.CONFIG_INDEX_CACHE_SIZE,
+                                   constants.DEFAULT_INDEX_CACHE_SIZE))
+        if size <= 0:
+            return None
+        return DigestCache(os.path.join(self.repo.working_dir, INDEX_CACHE_DIR), size)
 
     def _import_packages(self):
         """
@@ -168,7 +369,7 @@ class PackageSyncRun(object):
         # where the report reflectes running but does not have counts, wait
         # until they are populated before sending the update to Pulp.
 
-        start_time = datetime.now()
+        start_time = utils.monotonic()
 
         # Perform the actual logic
         try:
@@ -179,10 +380,7 @@ class PackageSyncRun(object):
             self.progress_report.packages_error_message = _('Error retrieving packages')
             self.progress_report.packages_exception = e
             self.progress_report.packages_traceback = sys.exc_info()[2]
-
-            end_time = datetime.now()
-            duration = end_time - start_time
-            self.progress_report.packages_execution_time = duration.seconds
+            self._packages_finished(start_time)
 
             self.progress_report.update_progress()
 
@@ -190,13 +388,21 @@ class PackageSyncRun(object):
 
         # Last update to the progress report before returning
         self.progress_report.packages_state = STATE_SUCCESS
-
-        end_time = datetime.now()
-        duration = end_time - start_time
-        self.progress_report.packages_execution_time = duration.seconds
+        self._packages_finished(start_time)
 
         self.progress_report.update_progress()
 
+    def _packages_finished(self, start_time):
+        """
+        Records how long importing the packages took.
+
+        :param start_time: reading of utils.monotonic() when it started
+        :type  start_time: float
+        """
+        elapsed = utils.monotonic() - start_time
+        self.progress_report.packages_execution_time = elapsed
+        self.metrics.record('phase.packages', elapsed)
+
     def _do_import_packages(self):
         """
         Actual logic of the import. This method will do a best effort per package;
@@ -207,19 +413,27 @@ class PackageSyncRun(object):
         def unit_key_str(unit_key_dict):
             return u'%(package)s-%(version)s-%(maintainer)s' % unit_key_dict
 
-        downloader = self._create_downloader()
+        # Drop versions we would not keep before anything is scheduled for
+        # download
+        packages = self.dist.packages
+        retain_versions = self._retain_versions()
+        if retain_versions:
+            packages = model.latest_packages(packages, retain_versions)
 
         # Ease lookup of packages
-        packages_by_key = dict([(p.key, p) for p in self.dist.packages])
+        packages_by_key = dict([(p.key, p) for p in packages])
 
         # Collect information about the repository's packages before changing it
-        package_criteria = UnitAssociationCriteria(type_ids=[constants.TYPE_DEB])
-        existing_units = self.sync_conduit.get_units(criteria=package_criteria)
-        existing_packages = [Package.from_unit(u) for u in existing_units]
-        existing_package_keys = [p.key for p in existing_packages]
+        with self.metrics.timer('packages.diff'):
+            package_criteria = UnitAssociationCriteria(type_ids=[constants.TYPE_DEB])
+            existing_units = self.sync_conduit.get_units(criteria=package_criteria)
+            existing_packages = [Package.from_unit(u) for u in existing_units]
+            existing_package_keys = [p.key for p in existing_packages]
 
-        new_unit_keys = self._resolve_new_units(existing_package_keys, packages_by_key.keys())
-        remove_unit_keys = self._resolve_remove_units(existing_package_keys, packages_by_key.keys())
+            new_unit_keys = self._resolve_new_units(existing_package_keys,
+                                                    packages_by_key.keys())
+            remove_unit_keys = self._resolve_remove_units(existing_package_keys,
+                                                          packages_by_key.keys())
 
         # Once we know how many things need to be processed, we can update the
         # progress report
@@ -229,15 +443,16 @@ class PackageSyncRun(object):
         self.progress_report.update_progress()
 
         # Add new units
-        for key in new_unit_keys:
-            package = packages_by_key[key]
-            try:
-                self._add_new_package(downloader, package)
-                self.progress_report.packages_finished_count += 1
-            except Exception, e:
-                self.progress_report.add_failed_package(package, e, sys.exc_info()[2])
-
-            self.progress_report.update_progress()
+        new_packages = [packages_by_key[key] for key in new_unit_keys]
+        downloader = self._create_downloader()
+        try:
+            workers = self._local_workers()
+            if workers > 1 and isinstance(downloader, LocalDownloader):
+                self._ingest_concurrently(downloader, new_packages, workers)
+            else:
+                self._add_in_batches(downloader, new_packages)
+        finally:
+            downloader.close()
 
         # Remove missing units if the configuration indicates to do so
         if self._should_remove_missing():
@@ -249,47 +464,170 @@ class PackageSyncRun(object):
             for key in remove_unit_keys:
                 doomed = existing_units_by_key[key]
                 self.sync_conduit.remove_unit(doomed)
+                self.metrics.count('packages.removed')
+
+    def _ingest_concurrently(self, downloader, packages, workers):
+        """
+        Adds the packages of a local feed with their files read, verified
+        and placed by a pool of threads, while the units are saved from this
+        one. No more packages are started than fit within the configured
+        number of bytes in flight; one larger than that is started alone.
+
+        :param packages: the packages to add
+        :type  packages: list
+        :param workers: number of threads
+        :type  workers: int
+        """
+        budget = _ByteBudget(self._local_inflight_bytes())
+
+        def schedule():
+            for package in packages:
+                size = _package_size(package)
+                budget.acquire(size)
+                yield package, size
+
+        def ingest(task):
+            package, size = task
+            try:
+                # Progress is reported, and units are saved, by the thread
+                # taking the results only
+                units = self._content_units_from_package(downloader, package, _NullProgress())
+                return package, units, None
+            except Exception, e:
+                return package, None, (e, sys.exc_info()[2])
+            finally:
+                budget.release(size)
+
+        pool = ThreadPool(workers)
+        try:
+            for package, units, error in pool.imap_unordered(ingest, schedule()):
+                if error is None:
+                    try:
+                        self._save_package_units(package, units)
+                    except Exception, e:
+                        error = (e, sys.exc_info()[2])
+                if error is not None:
+                    self._package_failed(package, *error)
+                else:
+                    self._package_added()
+        except:
+            pool.terminate()
+            raise
+        else:
+            pool.close()
+        finally:
+            pool.join()
+
+    def _add_in_batches(self, downloader, packages):
+        """
+        Adds the packages one after another. For a downloader retrieving
+        several files at once, the files of a batch of packages are handed
+        to it in one call first, so its connections are kept busy; files the
+        batch didn't get are downloaded again with their package, and only
+        the packages failing then are recorded as failed.
+
+        :param packages: the packages to add
+        :type  packages: list
+        """
+        size = downloader.concurrency()
+        if size > 1:
+            size *= DOWNLOAD_BATCH_FACTOR
+
+        for start in range(0, len(packages), size):
+            batch = [(p, p.get_resources()) for p in packages[start:start + size]]
+            if size > 1:
+                self._download_batch(downloader, [r for p, resources in batch for r in resources])
+
+            for package, resources in batch:
+                try:
+                    self._add_new_package(downloader, package, resources)
+                except Exception, e:
+                    self._package_failed(package, e, sys.exc_info()[2])
+                    continue
+                self._package_added()
+
+    def _download_batch(self, downloader, resources):
+        """
+        Downloads the files of a batch of packages in one call. A failure
+        is only logged; the resources it left without a file are retried by
+        their package.
+        """
+        with self.metrics.timer('packages.download') as timer:
+            try:
+                downloader.download_resources(resources, self.progress_report)
+            except Exception:
+                _LOG.exception('Error downloading a batch of packages for repository <%s>, '
+                               'retrying them one at a time' % self.repo.id)
+            timer.bytes = _downloaded_size(resources)
+
+    def _package_added(self):
+        self.progress_report.packages_finished_count += 1
+        self.metrics.count('packages.added')
+        self.progress_report.update_progress()
+
+    def _package_failed(self, package, exception, traceback):
+        self.progress_report.add_failed_package(package, exception, traceback)
+        self.metrics.count('packages.failed')
+        self.progress_report.update_progress()
 
     def _content_unit(self, resource, type_id, unit_key, unit_metadata):
         unit = self.sync_conduit.init_unit(
             type_id, unit_key, unit_metadata, resource['storage_path'])
         try:
-            storage_dir = os.path.dirname(unit.storage_path)
-            if not os.path.exists(storage_dir):
-                os.makedirs(storage_dir)
-
-            # Copy them to the final location
-            shutil.copy(resource['path'], unit.storage_path)
-        except IOError:
+            method = _place_file(self.placer, resource['path'], unit.storage_path,
+                                 self.repo.working_dir)
+        except (IOError, OSError):
             _LOG.error("Error copying unit %s to %s" %
                     (unit_key, unit.storage_path))
             raise
+        self.metrics.count('package.placed.' + method)
         return unit
 
-    def _content_units_from_package(self, downloader, package):
-        # Loop through each resource in the package creating units pr resource
-        pkg_resources = package.get_resources()
+    def _content_units_from_package(self, downloader, package, progress_report=None,
+                                    pkg_resources=None):
+        # Loop through each resource in the package creating units pr resource;
+        # those a batch already downloaded aren't downloaded again
+        if pkg_resources is None:
+            pkg_resources = package.get_resources()
+        missing = [r for r in pkg_resources if 'path' not in r]
 
-        downloader.download_resources(pkg_resources, self.progress_report)
+        if missing:
+            with self.metrics.timer('package.download') as timer:
+                downloader.download_resources(missing, progress_report or self.progress_report)
+                timer.bytes = _downloaded_size(missing)
+
+        with self.metrics.timer('package.verify'):
+            for resource in pkg_resources:
+                _verify_resource(resource)
 
         units = []
-        for resource in pkg_resources:
-            # TODO: Use seperate type here? if it's a Binary vs Source
-            unit = self._content_unit(resource, constants.TYPE_DEB,
-                                      package.unit_key(), package.unit_metadata())
-            units.append(unit)
+        with self.metrics.timer('package.store'):
+            for resource in pkg_resources:
+                # TODO: Use seperate type here? if it's a Binary vs Source
+                unit = self._content_unit(resource, constants.TYPE_DEB,
+                                          package.unit_key(), package.unit_metadata())
+                units.append(unit)
         return units
 
-    def _add_new_package(self, downloader, package):
+    def _add_new_package(self, downloader, package, resources=None):
         """
         Performs the tasks for downloading and saving a new unit in Pulp.
 
         :param downloader: downloader instance to use for retrieving the unit
         :param package: package instance to download
         :type  package: Package
+        :param resources: resources of the package, some of which may already
+                          be downloaded; taken from the package if None
+        :type  resources: list
         """
-        units = self._content_units_from_package(downloader, package)
+        units = self._content_units_from_package(downloader, package, pkg_resources=resources)
+        self._save_package_units(package, units)
 
+    def _save_package_units(self, package, units):
+        """
+        Saves the units of the files of a package in Pulp, along with the
+        unit of the package itself for source packages.
+        """
         parent = None
         # Initialize the unit in Pulp
         if package.package_type == 'source':
@@ -297,13 +635,14 @@ class PackageSyncRun(object):
             parent = self.sync_conduit.init_unit(constants.TYPE_DEB, package.unit_key(),
                                                  package.unit_metadata(), '')
 
-        if parent:
-            self.sync_conduit.save_unit(parent)
-
-        for unit in units:
-            self.sync_conduit.save_unit(unit)
+        with self.metrics.timer('package.save'):
             if parent:
-                self.sync_conduit.link_unit(parent, unit)
+                self.sync_conduit.save_unit(parent)
+
+            for unit in units:
+                self.sync_conduit.save_unit(unit)
+                if parent:
+                    self.sync_conduit.link_unit(parent, unit)
 
     def _package_exists(self, filename):
         """
@@ -360,3 +699,116 @@ class PackageSyncRun(object):
             return constants.DEFAULT_REMOVE_MISSING
         else:
             return self.config.get_boolean(constants.CONFIG_REMOVE_MISSING)
+
+    def _extra_indexes(self):
+        """
+        Returns which of the indexes that aren't parsed to sync.
+
+        :rtype: list
+        """
+        return self.config.get(constants.CONFIG_EXTRA_INDEXES, constants.DEFAULT_EXTRA_INDEXES)
+
+    def _local_workers(self):
+        """
+        Returns how many threads files of local feeds are ingested in.
+
+        :return: number of threads; 1 ingests them one after another
+        :rtype:  int
+        """
+        return int(self.config.get(constants.CONFIG_LOCAL_WORKERS,
+                                   constants.DEFAULT_LOCAL_WORKERS))
+
+    def _local_inflight_bytes(self):
+        return int(self.config.get(constants.CONFIG_LOCAL_INFLIGHT_BYTES,
+                                   constants.DEFAULT_LOCAL_INFLIGHT_BYTES))
+
+    def _retain_versions(self):
+        """
+        Returns how many versions of each package to keep from the feed.
+
+        :return: number of versions to keep; 0 to keep all of them
+        :rtype:  int
+        """
+        return int(self.config.get(constants.CONFIG_RETAIN_VERSIONS,
+                                   constants.DEFAULT_RETAIN_VERSIONS))
+
+
+# -- private classes ----------------------------------------------------------
+
+class _ByteBudget(object):
+    """
+    Bounds the number of bytes of the packages being ingested at once.
+    """
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.in_flight = 0
+        self.condition = threading.Condition()
+
+    def acquire(self, size):
+        """
+        Waits until size bytes fit in the budget, or nothing is in flight.
+        """
+        with self.condition:
+            while self.in_flight and self.in_flight + size > self.limit:
+                self.condition.wait()
+            self.in_flight += size
+
+    def release(self, size):
+        with self.condition:
+            self.in_flight -= size
+            self.condition.notify_all()
+
+
+class _NullProgress(object):
+    """
+    Progress report of the downloads of the ingestion threads, which isn't
+    sent anywhere.
+    """
+
+    def update_progress(self):
+        pass
+
+
+# -- private ------------------------------------------------------------------
+
+def _package_size(package):
+    """
+    Returns the total size of the files of a package as its index lists it.
+    """
+    return sum([int(r.get('size') or 0) for r in package.get_resources()])
+
+
+def _downloaded_size(resources):
+    """
+    Returns the total size of the downloaded files of resources; those read
+    into memory aren't counted.
+    """
+    return sum([os.path.getsize(r['path']) for r in resources
+                if 'path' in r and os.path.isfile(r['path'])])
+
+
+def _verify_resource(resource):
+    """
+    Checks a downloaded file against the size and SHA256 its index lists.
+
+    :raise ChecksumMismatchException: if either doesn't match
+    """
+    path = resource['path']
+    if resource.get('size') and os.path.getsize(path) != int(resource['size']):
+        raise ChecksumMismatchException(resource['url'], 'size')
+    if resource.get('sha256') and utils.file_digest(path) != resource['sha256']:
+        raise ChecksumMismatchException(resource['url'], 'sha256')
+
+
+def _place_file(placer, source, path, working_dir):
+    """
+    Moves a downloaded file to path, or puts it there as the placer sees fit
+    if it's a file of a local feed rather than a download in the working
+    directory.
+
+    :return: the placement.METHOD_* that placed the file
+    :rtype:  str
+    """
+    move = os.path.abspath(source).startswith(os.path.abspath(working_dir) + os.sep)
+    return placer.place(source, path, move=move)
@@ -11,14 +11,44 @@
 # have received a copy of GPLv2 along with this software; if not, see
 # http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
 
-import copy
+"""
+Handles packages uploaded to a repository, either a single .deb or a bundle
+of them: a tarball holding any number of .debs. The packages of a bundle are read in a pool of processes, those that
+are already in the repository are skipped by their SHA256 and the rest are
+stored and saved in batches.
+"""
+
+import logging
+import multiprocessing
+import os
 import shutil
+import tarfile
+import tempfile
+
+from debian.deb822 import Packages
+from pulp.plugins.conduits.mixins import UnitAssociationCriteria
+
+from pulp_deb.common import constants, debfile
+from pulp_deb.common.model import Package, UNIT_KEYS
+
+_LOG = logging.getLogger(__name__)
+
+# -- constants ----------------------------------------------------------------
 
-from pulp_deb.common import constants
-from pulp_deb.common.model import Package
-# from pulp_deb.plugins.importers import metadata as metadata_parser
+# Number of units of a bundle that are stored before they're saved
+SAVE_BATCH_SIZE = 100
 
-def handle_uploaded_unit(repo, type_id, unit_key, metadata, file_path, conduit):
+DEB_EXTENSION = '.deb'
+
+# Fields of the control file the client's metadata can't override, besides
+# the size and checksums: those the unit is identified and stored by
+PROTECTED_FIELDS = set(UNIT_KEYS + ['architecture'])
+
+
+# -- public -------------------------------------------------------------------
+
+def handle_uploaded_unit(repo, type_id, unit_key, metadata, file_path, conduit,
+                         config=None):
     """
     Handles an upload unit request to the importer. This call is responsible
     for moving the unit from its temporary location where Pulp stored the
@@ -26,44 +56,289 @@ def handle_uploaded_unit(repo, type_id, unit_key, metadata, file_path, conduit):
     This call will also update the database in Pulp to reflect the unit
     and its association to the repository.
 
+    The unit key and metadata are read from the control file of the uploaded
+    package, so the client doesn't have to supply them. A tarball of packages
+    is imported as a bundle, see handle_uploaded_bundle().
+
     :param repo: repository into which the unit is being uploaded
     :type  repo: pulp.plugins.model.Repository
     :param type_id: type of unit being uploaded
     :type  type_id: str
-    :param unit_key: unique identifier for the unit
+    :param unit_key: unique identifier for the unit; if given it has to match
+                     the uploaded package
     :type  unit_key: dict
-    :param metadata: extra data about the unit
+    :param metadata: extra data about the unit, overriding the fields of the
+                     control file other than the unit key, architecture,
+                     size and checksums
     :type  metadata: dict
     :param file_path: temporary location of the uploaded file
     :type  file_path: str
     :param conduit: for calls back into Pulp
     :type  conduit: pulp.plugins.conduit.upload.UploadConduit
+    :param config: configuration of the importer
+    :type  config: pulp.plugins.config.PluginCallConfiguration
+
+    :raise ValueError: if the file isn't a valid .deb or doesn't match the
+                       given unit key
     """
 
     if type_id != constants.TYPE_DEB:
         raise NotImplementedError()
 
-    # Create a deb out of the uploaded metadata
-    combined = copy.copy(unit_key)
-    combined.update(metadata)
-    deb = Package.from_dict(combined)
-
-    # Extract the metadata from the package
-    # FIXME: What does this do?
-    metadata_parser.extract_metadata(package, file_path, repo.working_dir)
+    if is_bundle(file_path):
+        handle_uploaded_bundle(repo, metadata, file_path, conduit, _upload_workers(config))
+        return
 
-    # Create the Pulp unit
-    type_id = constants.TYPE_DEB
-    unit_key = deb.unit_key()
-    unit_metadata = deb.unit_metadata()
-    relative_path = constants.STORAGE_DEB_RELATIVE_PATH % deb.filename()
+    package = read_package(file_path, metadata)
 
-    unit = conduit.init_unit(type_id, unit_key, unit_metadata, relative_path)
+    read_key = package.unit_key()
+    for key, value in (unit_key or {}).items():
+        if read_key.get(key) != value:
+            raise ValueError('Uploaded package has %s <%s>, not <%s>' %
+                             (key, read_key.get(key), value))
 
     # Copy from the upload temporary location into where Pulp wants it to live
-    shutil.copy(file_path, unit.storage_path)
+    unit = _store_unit(conduit, package, file_path)
 
     # Save the unit into the destination repository
     conduit.save_unit(unit)
 
 
+def handle_uploaded_bundle(repo, metadata, file_path, conduit, workers=1):
+    """
+    Imports every .deb in a tarball. Packages whose SHA256 is
+    already in the repository, or earlier in the bundle, are skipped.
+
+    Packages that can't be read don't keep the others from being imported;
+    they are reported once the rest are saved.
+
+    :param repo: repository into which the packages are being uploaded
+    :type  repo: pulp.plugins.model.Repository
+    :param metadata: extra data applied to every package of the bundle
+    :type  metadata: dict
+    :param file_path: the uploaded tarball
+    :type  file_path: str
+    :param conduit: for calls back into Pulp
+    :type  conduit: pulp.plugins.conduit.upload.UploadConduit
+    :param workers: number of processes to read the packages in
+    :type  workers: int
+
+    :return: the numbers of packages added and skipped
+    :rtype:  dict
+
+    :raise ValueError: if any of the packages can't be read
+    """
+    extract_dir = None
+    try:
+        extract_dir = tempfile.mkdtemp(prefix='upload-', dir=repo.working_dir)
+        paths = _extract_debs(file_path, extract_dir)
+
+        results = _inspect_all(paths, workers)
+
+        existing = set()
+        for unit in _existing_units(conduit):
+            if unit.metadata.get('sha256'):
+                existing.add(unit.metadata['sha256'])
+
+        new_packages = []
+        failed = []
+        for path, (control, checksums, error) in zip(paths, results):
+            if error is None:
+                try:
+                    package = _build_package(control, checksums, metadata)
+                except ValueError, e:
+                    error = str(e)
+            if error is not None:
+                failed.append('%s: %s' % (os.path.basename(path), error))
+                continue
+            if checksums['sha256'] in existing:
+                continue
+            existing.add(checksums['sha256'])
+            new_packages.append((package, path))
+
+        # Units are saved once their whole batch is stored, so a failure to
+        # store a file doesn't leave a saved unit without one
+        for i in range(0, len(new_packages), SAVE_BATCH_SIZE):
+            batch = new_packages[i:i + SAVE_BATCH_SIZE]
+            units = [_store_unit(conduit, p, path, move=True) for p, path in batch]
+            for unit in units:
+                conduit.save_unit(unit)
+            _LOG.debug('Saved %d of %d uploaded packages' %
+                       (i + len(batch), len(new_packages)))
+    finally:
+        if extract_dir is not None:
+            shutil.rmtree(extract_dir, ignore_errors=True)
+
+    summary = {'added': len(new_packages),
+               'skipped': len(paths) - len(new_packages) - len(failed)}
+    _LOG.info('Uploaded bundle of %d packages: %d added, %d already present, %d invalid' %
+              (len(paths), summary['added'], summary['skipped'], len(failed)))
+    if failed:
+        raise ValueError('Could not read %d of the uploaded packages: %s' %
+                         (len(failed), '; '.join(failed)))
+    return summary
+
+
+def is_bundle(file_path):
+    """
+    Returns whether an upload is a bundle of packages rather than a .deb.
+
+    :param file_path: the uploaded file
+    :type  file_path: str
+
+    :rtype: bool
+    """
+    fileobj = open(file_path, 'rb')
+    try:
+        if fileobj.read(len(debfile.AR_MAGIC)) == debfile.AR_MAGIC:
+            return False
+    finally:
+        fileobj.close()
+    return tarfile.is_tarfile(file_path)
+
+
+def read_package(file_path, metadata=None):
+    """
+    Builds a package out of the control file of a .deb and the checksums of
+    the file, both read in a single pass over it.
+
+    :param file_path: path of the .deb
+    :type  file_path: str
+    :param metadata: fields overriding those of the control file; the unit
+                     key, architecture, size and checksums can't be
+                     overridden
+    :type  metadata: dict
+
+    :rtype: pulp_deb.common.model.Package
+
+    :raise pulp_deb.common.debfile.InvalidDebFile: if the .deb can't be read
+    """
+    control, checksums = debfile.inspect(file_path)
+    return _build_package(control, checksums, metadata)
+
+
+def package_filename(package):
+    """
+    Returns the canonical file name of a binary package,
+    <package>_<version without epoch>_<architecture>.deb
+
+    :type package: pulp_deb.common.model.Package
+
+    :rtype: str
+    """
+    version = package['version'].split(':', 1)[-1]
+    return '%s_%s_%s.deb' % (package.name, version, package.architecture or 'all')
+
+
+# -- private ------------------------------------------------------------------
+
+def _build_package(control, checksums, metadata=None):
+    fields = Packages(control)
+    if not fields.get('package') or not fields.get('version'):
+        raise debfile.InvalidDebFile('control file has no Package or Version')
+
+    for key, value in (metadata or {}).items():
+        if key.lower() not in checksums and key.lower() not in PROTECTED_FIELDS:
+            fields[key] = value
+    for key, value in checksums.items():
+        fields[key] = str(value)
+    fields.setdefault('maintainer', '')
+    return Package(deb822=fields)
+
+
+def _store_unit(conduit, package, file_path, move=False):
+    """
+    Initializes the unit of a package and puts the file where Pulp wants it,
+    stored like the synchronized ones. Extracted files are moved if they are
+    on the same file system as the storage.
+    """
+    relative_path = package.prefix + '/' + package_filename(package)
+    unit = conduit.init_unit(constants.TYPE_DEB, package.unit_key(), package.unit_metadata(),
+                             relative_path)
+
+    storage_dir = os.path.dirname(unit.storage_path)
+    if not os.path.exists(storage_dir):
+        os.makedirs(storage_dir)
+    if move:
+        try:
+            os.rename(file_path, unit.storage_path)
+            return unit
+        except OSError:
+            pass
+    shutil.copy(file_path, unit.storage_path)
+    return unit
+
+
+def _existing_units(conduit):
+    criteria = UnitAssociationCriteria(type_ids=[constants.TYPE_DEB],
+                                       unit_fields=['sha256'])
+    return conduit.get_units(criteria=criteria)
+
+
+def _extract_debs(file_path, extract_dir):
+    """
+    Extracts the .debs of a tarball, streaming it. Members are written under
+    their position in the tarball rather than their name, so no name can
+    escape the extraction directory.
+    """
+    paths = []
+    try:
+        tar = tarfile.open(file_path, mode='r|*')
+        try:
+            for info in tar:
+                if not info.isfile() or not info.name.endswith(DEB_EXTENSION):
+                    continue
+                path = os.path.join(extract_dir, '%06d-%s' % (len(paths),
+                                                                os.path.basename(info.name)))
+                source = tar.extractfile(info)
+                target = open(path, 'wb')
+                try:
+                    shutil.copyfileobj(source, target, debfile.CHUNK_SIZE)
+                finally:
+                    target.close()
+                paths.append(path)
+        finally:
+            tar.close()
+    except (tarfile.TarError, EOFError), e:
+        raise ValueError('Could not read the uploaded tarball: %s' % e)
+    return paths
+
+
+def _inspect_all(paths, workers):
+    workers = min(workers, len(paths))
+    if workers <= 1:
+        return [_inspect_task(p) for p in paths]
+
+    pool = multiprocessing.Pool(workers)
+    try:
+        try:
+            results = pool.map(_inspect_task, paths, chunksize=8)
+            pool.close()
+        except:
+            pool.terminate()
+            raise
+    finally:
+        pool.join()
+    return results
+
+
+def _inspect_task(path):
+    """
+    Reads a package in a worker. Errors are returned rather than raised so
+    one broken package doesn't stop the pool.
+
+    :return: tuple of (control file, checksums, error message)
+    """
+    try:
+        control, checksums = debfile.inspect(path)
+        return control, checksums, None
+    except (debfile.InvalidDebFile, IOError), e:
+        return None, None, str(e)
+
+
+def _upload_workers(config):
+    workers = constants.DEFAULT_UPLOAD_WORKERS
+    if config is not None:
+        workers = int(config.get(constants.CONFIG_UPLOAD_WORKERS,
+                                 constants.DEFAULT_UPLOAD_WORKERS))
+    return workers or multiprocessing.cpu_count()
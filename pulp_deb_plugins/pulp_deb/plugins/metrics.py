@@ -0,0 +1,320 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright © 2013 Bouvet ASA
+#
+# This software is licensed to you under the GNU General Public
+# License as published by the Free Software Foundation; either version
+# 2 of the License (GPLv2) or (at your option) any later version.
+# There is NO WARRANTY for this software, express or implied,
+# including the implied warranties of MERCHANTABILITY,
+# NON-INFRINGEMENT, or FITNESS FOR A PARTICULAR PURPOSE. You should
+# have received a copy of GPLv2 along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+
+"""
+Instrumentation of the phases of a sync: timers with latency histograms,
+byte counts and counters. They are summarized in the final report of the
+sync and, if a sink is configured, sent to it as they are recorded.
+
+Sinks speak the statsd line protocol; besides a statsd daemon reached over
+UDP they can be a local file, which stands in for the daemon where there's
+none to send to.
+"""
+
+import logging
+import socket
+import threading
+import urlparse
+
+from pulp_deb.common import constants, utils
+
+_LOG = logging.getLogger(__name__)
+
+# -- constants ----------------------------------------------------------------
+
+# Upper bounds in seconds of the latency histogram buckets; slower samples
+# fall in a last, unbounded bucket
+HISTOGRAM_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 60.0)
+
+# Prefix of the names of the metrics sent to a sink
+DEFAULT_PREFIX = 'pulp_deb.sync'
+
+SINK_STATSD = 'statsd'
+SINK_FILE = 'file'
+SINK_SCHEMES = (SINK_STATSD, SINK_FILE)
+
+DEFAULT_STATSD_PORT = 8125
+
+
+# -- public -------------------------------------------------------------------
+
+def parse_sink_url(url):
+    """
+    Parses the URL of a metrics sink, statsd://host[:port] or file:///path.
+
+    :param url: URL of the sink
+    :type  url: str
+
+    :return: tuple of the scheme and either (host, port) or the file path
+    :rtype:  tuple
+
+    :raise ValueError: if the URL doesn't name a supported sink
+    """
+    parsed = urlparse.urlparse(url)
+    if parsed.scheme == SINK_STATSD and parsed.hostname:
+        return SINK_STATSD, (parsed.hostname, parsed.port or DEFAULT_STATSD_PORT)
+    if parsed.scheme == SINK_FILE and parsed.path:
+        return SINK_FILE, parsed.path
+    raise ValueError('Unsupported metrics sink <%s>, expected one of %s' %
+                     (url, ', '.join(['%s://' % s for s in SINK_SCHEMES])))
+
+
+def get_sink(config):
+    """
+    Creates the metrics sink of an importer configuration.
+
+    :param config: configuration of the sync
+    :type  config: pulp.plugins.config.PluginCallConfiguration
+
+    :return: the sink or None if metrics are only reported
+    :rtype:  Sink
+    """
+    url = config.get(constants.CONFIG_METRICS_SINK)
+    if not url:
+        return None
+    scheme, location = parse_sink_url(url)
+    if scheme == SINK_STATSD:
+        return StatsdSink(*location)
+    return FileSink(location)
+
+
+# -- public classes -----------------------------------------------------------
+
+class Histogram(object):
+    """
+    Distribution of latencies over fixed buckets, along with their count,
+    total, minimum and maximum.
+    """
+
+    def __init__(self, buckets=HISTOGRAM_BUCKETS):
+        self.bounds = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def add(self, value):
+        for i, bound in enumerate(self.bounds):
+            if value <= bound:
+                break
+        else:
+            i = len(self.bounds)
+        self.counts[i] += 1
+        self.count += 1
+        self.total += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def to_dict(self):
+        """
+        :return: the summary and the buckets as [upper bound, count] pairs,
+                 the last bound being None
+        :rtype:  dict
+        """
+        return {
+            'count': self.count,
+            'total': self.total,
+            'min': self.min,
+            'max': self.max,
+            'mean': self.total / self.count if self.count else None,
+            'buckets': [[b, c] for b, c in zip(list(self.bounds) + [None], self.counts)],
+        }
+
+
+class Metrics(object):
+    """
+    Collects the timers and counters of a sync. Samples may be recorded from
+    several threads.
+    """
+
+    def __init__(self, sink=None, prefix=DEFAULT_PREFIX):
+        """
+        :param sink: where to send the metrics as they are recorded, if
+                     anywhere
+        :type  sink: Sink
+        :param prefix: prefix of the names sent to the sink
+        :type  prefix: str
+        """
+        self.sink = sink
+        self.prefix = prefix
+        self._timers = {}
+        self._bytes = {}
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def timer(self, name, bytes=0):
+        """
+        Times a block, recording it when the block exits, e.g.:
+
+            with metrics.timer('package.download') as timer:
+                ...
+                timer.bytes = size
+
+        :param name: name of the timer, e.g. index.parse
+        :type  name: str
+        :param bytes: number of bytes processed in the block, if known
+        :type  bytes: int
+
+        :rtype: Timer
+        """
+        return Timer(self, name, bytes)
+
+    def record(self, name, seconds, bytes=0):
+        """
+        Records one sample of a timer.
+
+        :param seconds: how long the operation took
+        :type  seconds: float
+        :param bytes: number of bytes the operation processed
+        :type  bytes: int
+        """
+        with self._lock:
+            histogram = self._timers.get(name)
+            if histogram is None:
+                histogram = self._timers[name] = Histogram()
+            histogram.add(seconds)
+            self._bytes[name] = self._bytes.get(name, 0) + bytes
+
+            if self.sink is not None:
+                self.sink.timing(self._name(name), seconds)
+                if bytes:
+                    self.sink.count(self._name(name + '.bytes'), bytes)
+
+    def count(self, name, value=1):
+        """
+        Adds to a counter.
+        """
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+            if self.sink is not None:
+                self.sink.count(self._name(name), value)
+
+    def report(self):
+        """
+        Returns everything recorded so far for the final report.
+
+        :return: dict of the timers, each summarized as Histogram.to_dict()
+                 with its byte count, and of the counters
+        :rtype:  dict
+        """
+        timers = {}
+        for name, histogram in self._timers.items():
+            timers[name] = histogram.to_dict()
+            timers[name]['bytes'] = self._bytes[name]
+        return {'timers': timers, 'counters': dict(self._counters)}
+
+    def close(self):
+        if self.sink is not None:
+            self.sink.close()
+
+    def _name(self, name):
+        return self.prefix + '.' + name if self.prefix else name
+
+
+class Timer(object):
+    """
+    Context manager timing a block with the monotonic clock, see
+    Metrics.timer().
+    """
+
+    def __init__(self, metrics, name, bytes=0):
+        self.metrics = metrics
+        self.name = name
+        self.bytes = bytes
+        self.start = None
+        self.elapsed = None
+
+    def __enter__(self):
+        self.start = utils.monotonic()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.elapsed = utils.monotonic() - self.start
+        self.metrics.record(self.name, self.elapsed, self.bytes)
+        return False
+
+
+class Sink(object):
+    """
+    Interface of the destinations of metrics. Sinks don't raise; losing a
+    metric mustn't fail a sync.
+    """
+
+    def timing(self, name, seconds):
+        raise NotImplementedError()
+
+    def count(self, name, value):
+        raise NotImplementedError()
+
+    def close(self):
+        pass
+
+    def _line(self, name, value, metric_type):
+        return '%s:%s|%s' % (name, value, metric_type)
+
+
+class StatsdSink(Sink):
+    """
+    Sends every sample to a statsd daemon over UDP.
+    """
+
+    def __init__(self, host, port=DEFAULT_STATSD_PORT):
+        self.address = (host, port)
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    def timing(self, name, seconds):
+        self._send(self._line(name, '%.3f' % (seconds * 1000), 'ms'))
+
+    def count(self, name, value):
+        self._send(self._line(name, value, 'c'))
+
+    def close(self):
+        self.socket.close()
+
+    def _send(self, line):
+        try:
+            self.socket.sendto(line, self.address)
+        except socket.error, e:
+            _LOG.debug('Could not send metric to %s:%d: %s' % (self.address + (e,)))
+
+
+class FileSink(Sink):
+    """
+    Appends the statsd lines to a local file instead of sending them.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.fileobj = None
+
+    def timing(self, name, seconds):
+        self._write(self._line(name, '%.3f' % (seconds * 1000), 'ms'))
+
+    def count(self, name, value):
+        self._write(self._line(name, value, 'c'))
+
+    def close(self):
+        if self.fileobj is not None:
+            self.fileobj.close()
+            self.fileobj = None
+
+    def _write(self, line):
+        try:
+            if self.fileobj is None:
+                self.fileobj = open(self.path, 'a')
+            self.fileobj.write(line + '\n')
+        except IOError, e:
+            _LOG.debug('Could not write metric to <%s>: %s' % (self.path, e))
@@ -0,0 +1,239 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright © 2013 Bouvet ASA
+#
+# This software is licensed to you under the GNU General Public
+# License as published by the Free Software Foundation; either version
+# 2 of the License (GPLv2) or (at your option) any later version.
+# There is NO WARRANTY for this software, express or implied,
+# including the implied warranties of MERCHANTABILITY,
+# NON-INFRINGEMENT, or FITNESS FOR A PARTICULAR PURPOSE. You should
+# have received a copy of GPLv2 along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+
+"""
+Placement of synchronized files in Pulp's storage with as little copying as
+the file systems allow.
+
+Files of a local feed are cloned (reflinked) where the file system supports
+it, hardlinked where it doesn't and the placement mode allows it, and
+otherwise copied by the kernel (copy_file_range or sendfile) rather than
+through Python. Downloads in the working directory are moved. Which methods
+work between two file systems is found out by trying them: a method failing
+as unsupported isn't tried again for the same pair of devices.
+"""
+
+import ctypes
+import ctypes.util
+import errno
+import fcntl
+import logging
+import os
+import shutil
+
+from pulp_deb.common import constants
+
+_LOG = logging.getLogger(__name__)
+
+# -- constants ----------------------------------------------------------------
+
+METHOD_RENAME = 'rename'
+METHOD_REFLINK = 'reflink'
+METHOD_HARDLINK = 'hardlink'
+METHOD_KERNEL_COPY = 'kernel_copy'
+METHOD_COPY = 'copy'
+
+# Methods tried in each placement mode, in order, before falling back to a
+# plain copy
+MODE_METHODS = {
+    constants.PLACEMENT_AUTO: (METHOD_REFLINK, METHOD_HARDLINK, METHOD_KERNEL_COPY),
+    constants.PLACEMENT_REFLINK: (METHOD_REFLINK, METHOD_KERNEL_COPY),
+    constants.PLACEMENT_COPY: (),
+}
+
+# Errors meaning a method doesn't work between two file systems, or not for
+# this process, rather than that something is wrong with the file
+UNSUPPORTED_ERRNOS = (errno.EXDEV, errno.EOPNOTSUPP, errno.ENOTTY, errno.EINVAL,
+                      errno.ENOSYS, errno.EPERM, errno.EMLINK)
+
+# ioctl of linux/fs.h sharing the extents of a whole file, _IOW(0x94, 9, int)
+FICLONE = 0x40049409
+
+# Most bytes handed to the kernel in one copy call
+KERNEL_COPY_CHUNK = 64 * 1024 * 1024
+
+
+# -- public classes -----------------------------------------------------------
+
+class Placer(object):
+    """
+    Puts files in place with the cheapest method that works, remembering
+    which don't. One is used for all the files of a sync, possibly from
+    several threads.
+    """
+
+    def __init__(self, mode=constants.DEFAULT_LOCAL_PLACEMENT):
+        """
+        :param mode: one of constants.PLACEMENTS, which methods may be used
+        :type  mode: str
+        """
+        self.methods = MODE_METHODS[mode]
+        self._unsupported = set()
+
+    def place(self, source, path, move=False):
+        """
+        Puts the content of source at path, replacing whatever is there.
+
+        :param source: file to place
+        :type  source: str
+        :param path: where to place it
+        :type  path: str
+        :param move: whether source is to be removed, e.g. because it's a
+                     download in the working directory
+        :type  move: bool
+
+        :return: the METHOD_* that placed the file
+        :rtype:  str
+        """
+        directory = os.path.dirname(path)
+        if not os.path.exists(directory):
+            try:
+                os.makedirs(directory)
+            except OSError, e:
+                # Created meanwhile by another thread placing a file
+                if e.errno != errno.EEXIST:
+                    raise
+        if os.path.lexists(path):
+            os.remove(path)
+
+        if move:
+            try:
+                os.rename(source, path)
+                return METHOD_RENAME
+            except OSError, e:
+                if e.errno != errno.EXDEV:
+                    raise
+
+        method = self._place(source, path)
+        if move:
+            os.remove(source)
+        return method
+
+    def _place(self, source, path):
+        devices = (os.stat(source).st_dev, os.stat(os.path.dirname(path)).st_dev)
+        for method in self.methods:
+            if (method, devices) in self._unsupported:
+                continue
+            try:
+                _METHODS[method](source, path)
+                return method
+            except (IOError, OSError), e:
+                if e.errno not in UNSUPPORTED_ERRNOS:
+                    raise
+                _LOG.debug('Cannot place files by %s between devices %s: %s' %
+                           (method, devices, e))
+                self._unsupported.add((method, devices))
+                if os.path.lexists(path):
+                    os.remove(path)
+
+        shutil.copy(source, path)
+        return METHOD_COPY
+
+
+# -- private ------------------------------------------------------------------
+
+def _reflink(source, path):
+    """
+    Clones source to path, sharing its extents until either is written to.
+    """
+    src = open(source, 'rb')
+    try:
+        dst = open(path, 'wb')
+        try:
+            fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+        finally:
+            dst.close()
+    finally:
+        src.close()
+    shutil.copymode(source, path)
+
+
+def _hardlink(source, path):
+    os.link(source, path)
+
+
+def _kernel_copy(source, path):
+    """
+    Copies source to path without the data passing through user space.
+    copy_file_range is preferred, as it can clone or copy on the server for
+    network file systems; sendfile is used where it isn't available or
+    refuses to copy between the file systems.
+    """
+    src = open(source, 'rb')
+    try:
+        dst = open(path, 'wb')
+        try:
+            remaining = os.fstat(src.fileno()).st_size
+            copy = _copy_file_range if _libc_copy_file_range is not None else _sendfile
+            while remaining > 0:
+                try:
+                    count = copy(src.fileno(), dst.fileno(), min(remaining, KERNEL_COPY_CHUNK))
+                except OSError, e:
+                    # Nothing has been copied by copy_file_range if it fails
+                    # as unsupported
+                    if copy is not _copy_file_range or e.errno not in UNSUPPORTED_ERRNOS:
+                        raise
+                    copy = _sendfile
+                    continue
+                if count == 0:
+                    break
+                remaining -= count
+        finally:
+            dst.close()
+    finally:
+        src.close()
+    shutil.copymode(source, path)
+
+
+def _copy_file_range(fd_in, fd_out, count):
+    return _check(_libc_copy_file_range(fd_in, None, fd_out, None, count, 0))
+
+
+def _sendfile(fd_in, fd_out, count):
+    if _libc_sendfile is None:
+        raise OSError(errno.ENOSYS, os.strerror(errno.ENOSYS))
+    return _check(_libc_sendfile(fd_out, fd_in, None, count))
+
+
+def _check(result):
+    if result < 0:
+        error = ctypes.get_errno()
+        raise OSError(error, os.strerror(error))
+    return result
+
+
+def _libc_function(name, argtypes):
+    """
+    Looks up a function of the C library, None if it hasn't got it.
+    """
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        function = getattr(libc, name)
+    except (OSError, AttributeError):
+        return None
+    function.argtypes = argtypes
+    function.restype = ctypes.c_ssize_t
+    return function
+
+
+_METHODS = {
+    METHOD_REFLINK: _reflink,
+    METHOD_HARDLINK: _hardlink,
+    METHOD_KERNEL_COPY: _kernel_copy,
+}
+
+_libc_copy_file_range = _libc_function('copy_file_range', [
+    ctypes.c_int, ctypes.c_void_p, ctypes.c_int, ctypes.c_void_p, ctypes.c_size_t,
+    ctypes.c_uint])
+_libc_sendfile = _libc_function('sendfile', [
+    ctypes.c_int, ctypes.c_int, ctypes.c_void_p, ctypes.c_size_t])
@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright © 2013 Bouvet ASA
+#
+# This software is licensed to you under the GNU General Public
+# License as published by the Free Software Foundation; either version
+# 2 of the License (GPLv2) or (at your option) any later version.
+# There is NO WARRANTY for this software, express or implied,
+# including the implied warranties of MERCHANTABILITY,
+# NON-INFRINGEMENT, or FITNESS FOR A PARTICULAR PURPOSE. You should
+# have received a copy of GPLv2 along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+
+"""
+Profiling of syncs with cProfile, for finding where the time of a slow sync
+goes. Profiling is off unless the importer configuration turns it on, in
+which case the whole stats are written to the working directory of the
+repository, for pstats or a viewer like snakeviz, and the functions taking
+the most time are listed in the sync report.
+
+Only the sync process is profiled; the work of parse worker processes shows
+as time spent waiting on them.
+"""
+
+import cProfile
+import logging
+import pstats
+
+from pulp_deb.common import constants
+
+_LOG = logging.getLogger(__name__)
+
+# -- constants ----------------------------------------------------------------
+
+# Name of the stats file in the working directory of the repository
+PROFILE_FILENAME = 'sync.prof'
+
+
+# -- public -------------------------------------------------------------------
+
+def get_profiler(config):
+    """
+    Creates the profiler of an importer configuration.
+
+    :param config: configuration of the sync
+    :type  config: pulp.plugins.config.PluginCallConfiguration
+
+    :return: the profiler or None if the sync isn't profiled
+    :rtype:  Profiler
+    """
+    if not config.get_boolean(constants.CONFIG_PROFILE_SYNC):
+        return None
+    return Profiler(int(config.get(constants.CONFIG_PROFILE_HOTSPOTS,
+                                   constants.DEFAULT_PROFILE_HOTSPOTS)))
+
+
+# -- public classes -----------------------------------------------------------
+
+class Profiler(object):
+    """
+    Profiles what runs between start() and stop().
+    """
+
+    def __init__(self, hotspots=constants.DEFAULT_PROFILE_HOTSPOTS):
+        """
+        :param hotspots: number of functions to list in the report
+        :type  hotspots: int
+        """
+        self.count = hotspots
+        self.profile = cProfile.Profile()
+
+    def start(self):
+        self.profile.enable()
+
+    def stop(self):
+        self.profile.disable()
+
+    def hotspots(self):
+        """
+        Returns the functions that took the most time by themselves, not
+        counting the functions they called.
+
+        :return: list of dicts of the function, as file:line(name), its
+                 number of calls and its own and cumulative time, the most
+                 expensive first
+        :rtype:  list
+        """
+        stats = pstats.Stats(self.profile).stats
+        entries = sorted(stats.items(), key=lambda item: item[1][2], reverse=True)
+        hotspots = []
+        for (filename, line, name), (primitive, calls, own, cumulative, callers) in \
+                entries[:self.count]:
+            hotspots.append({
+                'function': '%s:%d(%s)' % (filename, line, name),
+                'calls': calls,
+                'own_time': own,
+                'cumulative_time': cumulative,
+            })
+        return hotspots
+
+    def report(self, path):
+        """
+        Writes the stats to the given file and summarizes them for the final
+        report of the sync. Failing to write the file isn't fatal.
+
+        :param path: where to write the stats
+        :type  path: str
+
+        :return: dict of the path of the stats, None if they couldn't be
+                 written, and of the hotspots
+        :rtype:  dict
+        """
+        try:
+            self.profile.dump_stats(path)
+        except (IOError, OSError), e:
+            _LOG.warning('Could not write the profile of the sync to <%s>: %s' % (path, e))
+            path = None
+        return {'path': path, 'hotspots': self.hotspots()}
@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright © 2013 Bouvet ASA
+#
+# This software is licensed to you under the GNU General Public
+# License as published by the Free Software Foundation; either version
+# 2 of the License (GPLv2) or (at your option) any later version.
+# There is NO WARRANTY for this software, express or implied,
+# including the implied warranties of MERCHANTABILITY,
+# NON-INFRINGEMENT, or FITNESS FOR A PARTICULAR PURPOSE. You should
+# have received a copy of GPLv2 along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from pulp_deb.plugins.cache import DigestCache
+
+
+class DigestCacheTests(unittest.TestCase):
+    def setUp(self):
+        self.working_dir = tempfile.mkdtemp(prefix='cache-tests')
+        self.cache_dir = os.path.join(self.working_dir, 'cache')
+        self.cache = DigestCache(self.cache_dir, 1024 * 1024)
+
+    def tearDown(self):
+        shutil.rmtree(self.working_dir)
+
+    def test_get_missing(self):
+        self.assertEqual(self.cache.get('abc123'), None)
+        self.assertEqual(self.cache.get(None), None)
+
+    def test_put_get(self):
+        records = [{u'Package': u'foo', u'Version': u'1.0'}]
+        self.cache.put('abc123', records)
+
+        self.assertEqual(self.cache.get('abc123'), records)
+
+    def test_put_invalid_digest(self):
+        self.assertRaises(ValueError, self.cache.put, '../abc', [])
+
+    def test_lookup(self):
+        self.assertEqual(self.cache.lookup('http://foo/Packages.gz'), None)
+
+        self.cache.put('abc123', [], name='http://foo/Packages.gz')
+        self.cache.put('def456', [], name='http://foo/Packages.gz')
+
+        self.assertEqual(self.cache.lookup('http://foo/Packages.gz'), 'def456')
+
+    def test_corrupt_entry(self):
+        self.cache.put('abc123', [])
+        path = os.path.join(self.cache_dir, 'abc123.marshal')
+        f = open(path, 'w')
+        f.write('garbage')
+        f.close()
+
+        self.assertEqual(self.cache.get('abc123'), None)
+        self.assertFalse(os.path.exists(path))
+
+    def test_evict_least_recently_used(self):
+        value = 'x' * 400
+        self.cache.max_size = 1000
+        self.cache.put('aaa', value)
+        self.cache.put('bbb', value)
+
+        # Make aaa the most recently used
+        past = time.time() - 60
+        os.utime(os.path.join(self.cache_dir, 'bbb.marshal'), (past, past))
+        os.utime(os.path.join(self.cache_dir, 'aaa.marshal'), (past - 60, past - 60))
+        self.cache.get('aaa')
+
+        self.cache.put('ccc', value)
+
+        self.assertEqual(self.cache.get('aaa'), value)
+        self.assertEqual(self.cache.get('bbb'), None)
+        self.assertEqual(self.cache.get('ccc'), value)
+
+    def test_evict_prunes_names(self):
+        value = 'x' * 400
+        self.cache.max_size = 1000
+        self.cache.put('aaa', value, name='http://foo/Packages.gz')
+        past = time.time() - 60
+        os.utime(os.path.join(self.cache_dir, 'aaa.marshal'), (past, past))
+        self.cache.put('bbb', value, name='http://bar/Packages.gz')
+
+        self.cache.put('ccc', value, name='http://baz/Packages.gz')
+
+        self.assertEqual(self.cache.lookup('http://foo/Packages.gz'), None)
+        self.assertEqual(self.cache.lookup('http://bar/Packages.gz'), 'bbb')
+        self.assertEqual(self.cache.lookup('http://baz/Packages.gz'), 'ccc')
@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright © 2013 Bouvet ASA
+#
+# This software is licensed to you under the GNU General Public
+# License as published by the Free Software Foundation; either version
+# 2 of the License (GPLv2) or (at your option) any later version.
+# There is NO WARRANTY for this software, express or implied,
+# including the implied warranties of MERCHANTABILITY,
+# NON-INFRINGEMENT, or FITNESS FOR A PARTICULAR PURPOSE. You should
+# have received a copy of GPLv2 along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+
+import unittest
+
+from pulp_deb.common import constants
+from pulp_deb.plugins.distributors import distributor
+from pulp_deb.plugins.distributors.distributor import DebDistributor
+
+
+class TestDistributor(unittest.TestCase):
+    def test_entry_point(self):
+        ret = distributor.entry_point()
+        self.assertEqual(ret[0], DebDistributor)
+        self.assertTrue(isinstance(ret[1], dict))
+
+    def test_metadata(self):
+        metadata = DebDistributor.metadata()
+        self.assertEqual(metadata['id'], constants.DISTRIBUTOR_TYPE_ID)
+        self.assertEqual(metadata['types'], [constants.TYPE_DEB])
@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright © 2013 Bouvet ASA
+#
+# This software is licensed to you under the GNU General Public
+# License as published by the Free Software Foundation; either version
+# 2 of the License (GPLv2) or (at your option) any later version.
+# There is NO WARRANTY for this software, express or implied,
+# including the implied warranties of MERCHANTABILITY,
+# NON-INFRINGEMENT, or FITNESS FOR A PARTICULAR PURPOSE. You should
+# have received a copy of GPLv2 along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+
+
+import unittest
+
+from pulp.plugins.config import PluginCallConfiguration
+
+from pulp_deb.common import constants
+from pulp_deb.plugins.distributors import configuration
+
+
+class ServeTests(unittest.TestCase):
+    def test_validate_serve(self):
+        config = PluginCallConfiguration({constants.CONFIG_SERVE_HTTP: 'true',
+                                          constants.CONFIG_SERVE_HTTPS: 'false'}, {})
+        result, msg = configuration.validate(config)
+
+        self.assertTrue(result)
+        self.assertTrue(msg is None)
+
+    def test_validate_serve_invalid(self):
+        config = PluginCallConfiguration({constants.CONFIG_SERVE_HTTPS: 'sometimes'}, {})
+        result, msg = configuration._validate_serve_https(config)
+
+        self.assertTrue(not result)
+        self.assertTrue(constants.CONFIG_SERVE_HTTPS in msg)
+
+
+class PublishDistTests(unittest.TestCase):
+    def test_validate_publish_dist(self):
+        config = PluginCallConfiguration({constants.CONFIG_PUBLISH_DIST: 'precise'}, {})
+        result, msg = configuration._validate_publish_dist(config)
+
+        self.assertTrue(result)
+        self.assertTrue(msg is None)
+
+    def test_validate_publish_dist_invalid(self):
+        for dist in ('', '../precise', 'precise/updates'):
+            config = PluginCallConfiguration({constants.CONFIG_PUBLISH_DIST: dist}, {})
+            result, msg = configuration._validate_publish_dist(config)
+
+            self.assertTrue(not result)
+            self.assertTrue(constants.CONFIG_PUBLISH_DIST in msg)
+
+
+class PoolLinkTests(unittest.TestCase):
+    def test_validate_pool_link(self):
+        config = PluginCallConfiguration({constants.CONFIG_POOL_LINK: 'hardlink'}, {})
+        result, msg = configuration._validate_pool_link(config)
+
+        self.assertTrue(result)
+        self.assertTrue(msg is None)
+
+    def test_validate_pool_link_invalid(self):
+        config = PluginCallConfiguration({constants.CONFIG_POOL_LINK: 'copy'}, {})
+        result, msg = configuration._validate_pool_link(config)
+
+        self.assertTrue(not result)
+        self.assertTrue(constants.CONFIG_POOL_LINK in msg)
+
+
+class ByHashTests(unittest.TestCase):
+    def test_validate_by_hash(self):
+        config = PluginCallConfiguration({constants.CONFIG_BY_HASH: 'true',
+                                          constants.CONFIG_BY_HASH_GENERATIONS: '2',
+                                          constants.CONFIG_BY_HASH_GRACE: 3600}, {})
+        result, msg = configuration.validate(config)
+
+        self.assertTrue(result)
+        self.assertTrue(msg is None)
+
+    def test_validate_by_hash_grace_invalid(self):
+        config = PluginCallConfiguration({constants.CONFIG_BY_HASH_GRACE: '-1'}, {})
+        result, msg = configuration._validate_by_hash_grace(config)
+
+        self.assertTrue(not result)
+        self.assertTrue(constants.CONFIG_BY_HASH_GRACE in msg)
+
+
+class ContentsTests(unittest.TestCase):
+    def test_validate_contents(self):
+        config = PluginCallConfiguration({constants.CONFIG_GENERATE_CONTENTS: 'true',
+                                          constants.CONFIG_CONTENTS_WORKERS: '4',
+                                          constants.CONFIG_CONTENTS_CACHE_SIZE: 0}, {})
+        result, msg = configuration.validate(config)
+
+        self.assertTrue(result)
+        self.assertTrue(msg is None)
+
+    def test_validate_generate_contents_invalid(self):
+        config = PluginCallConfiguration({constants.CONFIG_GENERATE_CONTENTS: 'sometimes'}, {})
+        result, msg = configuration._validate_generate_contents(config)
+
+        self.assertTrue(not result)
+        self.assertTrue(constants.CONFIG_GENERATE_CONTENTS in msg)
+
+
+class SigningTests(unittest.TestCase):
+    def test_validate_gpg_key_invalid(self):
+        config = PluginCallConfiguration({constants.CONFIG_GPG_KEY: 'not a key'}, {})
+        result, msg = configuration._validate_gpg_key(config)
+
+        self.assertTrue(not result)
+        self.assertTrue(constants.CONFIG_GPG_KEY in msg)
+
+    def test_validate_gpg_home_missing(self):
+        config = PluginCallConfiguration({constants.CONFIG_GPG_KEY: 'ABCD1234',
+                                          constants.CONFIG_GPG_HOME: '/nonexistent'}, {})
+        result, msg = configuration.validate(config)
+
+        self.assertTrue(not result)
+        self.assertTrue(constants.CONFIG_GPG_HOME in msg)
@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright © 2013 Bouvet ASA
+#
+# This software is licensed to you under the GNU General Public
+# License as published by the Free Software Foundation; either version
+# 2 of the License (GPLv2) or (at your option) any later version.
+# There is NO WARRANTY for this software, express or implied,
+# including the implied warranties of MERCHANTABILITY,
+# NON-INFRINGEMENT, or FITNESS FOR A PARTICULAR PURPOSE. You should
+# have received a copy of GPLv2 along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import mock
+
+from pulp_deb.common import debfile
+from pulp_deb.plugins.cache import DigestCache
+from pulp_deb.plugins.distributors import contents
+
+
+def _file_list(path):
+    if path.endswith('broken.deb'):
+        raise debfile.InvalidDebFile('no data tarball')
+    return ['usr/bin/' + os.path.basename(path)[:-len('.deb')]]
+
+
+class FileListsTests(unittest.TestCase):
+    def setUp(self):
+        self.working_dir = tempfile.mkdtemp(prefix='contents-tests')
+        self.cache = DigestCache(os.path.join(self.working_dir, 'cache'), 1024 * 1024)
+
+    def tearDown(self):
+        shutil.rmtree(self.working_dir)
+
+    @mock.patch.object(debfile, 'file_list', side_effect=_file_list)
+    def test_file_lists(self, file_list):
+        lists = dict(contents.file_lists({'aaa': '/p/foo.deb', 'bbb': '/p/bar.deb'}, self.cache))
+
+        self.assertEqual(lists, {'aaa': ['usr/bin/foo'], 'bbb': ['usr/bin/bar']})
+        self.assertEqual(self.cache.get('aaa'), ['usr/bin/foo'])
+
+    @mock.patch.object(debfile, 'file_list', side_effect=_file_list)
+    def test_cached(self, file_list):
+        self.cache.put('aaa', ['usr/bin/cached'])
+
+        lists = dict(contents.file_lists({'aaa': '/p/foo.deb', 'bbb': '/p/bar.deb'}, self.cache))
+
+        self.assertEqual(lists['aaa'], ['usr/bin/cached'])
+        file_list.assert_called_once_with('/p/bar.deb')
+
+    @mock.patch.object(debfile, 'file_list', side_effect=_file_list)
+    def test_broken_package(self, file_list):
+        lists = dict(contents.file_lists({'aaa': '/p/broken.deb', 'bbb': '/p/bar.deb'}, self.cache))
+
+        self.assertEqual(lists, {'bbb': ['usr/bin/bar']})
+        self.assertEqual(self.cache.get('aaa'), None)
+
+    @mock.patch.object(debfile, 'file_list', side_effect=_file_list)
+    def test_no_cache(self, file_list):
+        lists = dict(contents.file_lists({'aaa': '/p/foo.deb'}))
+
+        self.assertEqual(lists, {'aaa': ['usr/bin/foo']})
+
+
+class LocationTests(unittest.TestCase):
+    def test_location(self):
+        self.assertEqual(contents.location({'package': u'wget', 'section': u'net'}), 'net/wget')
+        self.assertEqual(contents.location({'package': u'wget'}), 'wget')
+
+
+class ContentsBuilderTests(unittest.TestCase):
+    def setUp(self):
+        self.working_dir = tempfile.mkdtemp(prefix='contents-tests')
+
+    def tearDown(self):
+        shutil.rmtree(self.working_dir)
+
+    def test_write(self):
+        builder = contents.ContentsBuilder(self.working_dir)
+        builder.add('main', 'amd64', 'utils/foo', ['usr/bin/foo', 'usr/share/doc/common'])
+        builder.add('main', 'all', 'doc/bar', ['usr/share/doc/common'])
+        builder.add('main', 'i386', 'utils/foo', ['usr/bin/foo-i386'])
+
+        index_file = builder.write(self.working_dir, 'main/Contents-amd64',
+                                   [('main', 'amd64'), ('main', 'all')])
+        builder.close()
+
+        path = os.path.join(self.working_dir, 'main/Contents-amd64')
+        self.assertEqual(open(path).read(),
+                         'usr/bin/foo utils/foo\n'
+                         'usr/share/doc/common doc/bar,utils/foo\n')
+        self.assertEqual(index_file.path, 'main/Contents-amd64')
+        self.assertEqual(index_file.size, os.path.getsize(path))
+
+    def test_write_runs(self):
+        builder = contents.ContentsBuilder(self.working_dir, run_lines=3)
+        expected = []
+        for i in range(10):
+            name = 'usr/share/pkg%d/file' % (9 - i)
+            builder.add('main', 'amd64', 'utils/pkg%d' % i, [name, 'usr/share/doc/common'])
+            expected.append('%s utils/pkg%d\n' % (name, i))
+        builder.add('main', 'all', u'doc/b\xe6r'.encode('utf-8'), [u'usr/share/b\xe6r'])
+
+        for arch in ('amd64', 'i386'):
+            builder.write(self.working_dir, 'main/Contents-%s' % arch,
+                          [('main', arch), ('main', 'all')])
+        builder.close()
+
+        common = 'usr/share/doc/common %s\n' % ','.join(sorted(['utils/pkg%d' % i
+                                                             for i in range(10)]))
+        bar = u'usr/share/b\xe6r doc/b\xe6r\n'.encode('utf-8')
+        self.assertEqual(open(os.path.join(self.working_dir, 'main/Contents-amd64')).read(),
+                         bar + common + ''.join(sorted(expected)))
+        self.assertEqual(open(os.path.join(self.working_dir, 'main/Contents-i386')).read(), bar)
+        # Only the indexes are left
+        self.assertEqual(os.listdir(self.working_dir), ['main'])
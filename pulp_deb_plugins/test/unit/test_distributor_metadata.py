@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright © 2013 Bouvet ASA
+#
+# This software is licensed to you under the GNU General Public
+# License as published by the Free Software Foundation; either version
+# 2 of the License (GPLv2) or (at your option) any later version.
+# There is NO WARRANTY for this software, express or implied,
+# including the implied warranties of MERCHANTABILITY,
+# NON-INFRINGEMENT, or FITNESS FOR A PARTICULAR PURPOSE. You should
+# have received a copy of GPLv2 along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+
+
+import hashlib
+import os
+import shutil
+import tempfile
+import unittest
+
+from debian.deb822 import Packages, Release, Sources
+
+from pulp_deb.common import utils
+from pulp_deb.plugins.distributors import metadata
+
+
+BINARY = {
+    'package': u'libdaemon0',
+    'version': u'0.14-2',
+    'architecture': u'amd64',
+    'maintainer': u'Jérôme Maintainer <jm@example.com>',
+    'filename': u'pool/main/libd/libdaemon/libdaemon0_0.14-2_amd64.deb',
+    'size': u'21350',
+    'md5sum': u'0d26d9d2e2b6b0ed4d5b1f3f0eb5e3c5',
+    'description': u'lightweight C library for daemons\n Short description.\n .\n More.',
+    'x-custom-field': u'value',
+}
+
+SOURCE = {
+    'package': u'libdaemon',
+    'binary': u'libdaemon0, libdaemon-dev',
+    'version': u'0.14-2',
+    'directory': u'pool/main/libd/libdaemon',
+    'files': [{'md5sum': u'aaa', 'size': u'10', 'name': u'libdaemon_0.14-2.dsc'}],
+    'checksums-sha256': [{'sha256': u'bbb', 'size': u'10', 'name': u'libdaemon_0.14-2.dsc'}],
+}
+
+
+class FormatParagraphTests(unittest.TestCase):
+    def test_format_binary(self):
+        paragraph = metadata.format_paragraph(BINARY)
+
+        self.assertTrue(paragraph.startswith('Package: libdaemon0\n'))
+        self.assertTrue(paragraph.endswith('More.\n\n'))
+
+        parsed = Packages(paragraph)
+        self.assertEqual(parsed['Filename'], BINARY['filename'])
+        self.assertEqual(parsed['MD5sum'], BINARY['md5sum'])
+        self.assertEqual(parsed['X-Custom-Field'], 'value')
+        self.assertEqual(parsed['Description'], BINARY['description'])
+
+    def test_format_source(self):
+        parsed = Sources(metadata.format_paragraph(SOURCE))
+
+        self.assertEqual(parsed['Files'], SOURCE['files'])
+        self.assertEqual(parsed['Checksums-Sha256'], SOURCE['checksums-sha256'])
+
+    def test_format_skips_private_fields(self):
+        fields = {'package': 'foo', '_id': 'abc', 'source': None}
+        self.assertEqual(metadata.format_paragraph(fields), 'Package: foo\n\n')
+
+
+class FingerprintTests(unittest.TestCase):
+    def test_order_independent(self):
+        first, second = metadata.Fingerprint(), metadata.Fingerprint()
+        for identity in ('a', 'b', 'c'):
+            first.add(identity)
+        for identity in ('c', 'a', 'b'):
+            second.add(identity)
+
+        self.assertEqual(first.hexdigest(), second.hexdigest())
+
+    def test_changes(self):
+        first, second = metadata.Fingerprint(), metadata.Fingerprint()
+        first.add('a')
+        second.add('b')
+        self.assertNotEqual(first.hexdigest(), second.hexdigest())
+        self.assertNotEqual(first.hexdigest(), metadata.Fingerprint().hexdigest())
+
+    def test_add(self):
+        first, second, both = metadata.Fingerprint(), metadata.Fingerprint(), metadata.Fingerprint()
+        first.add('a')
+        second.add('b')
+        both.add('b')
+        both.add('a')
+        self.assertEqual((first + second).hexdigest(), both.hexdigest())
+
+
+class IndexWriterTests(unittest.TestCase):
+    def setUp(self):
+        self.working_dir = tempfile.mkdtemp(prefix='metadata-tests')
+
+    def tearDown(self):
+        shutil.rmtree(self.working_dir)
+
+    def _write(self):
+        writer = metadata.IndexWriter(self.working_dir, 'main/binary-amd64/Packages')
+        writer.write(metadata.format_paragraph(BINARY))
+        writer.write(metadata.format_paragraph(dict(BINARY, package=u'libdaemon-dev')))
+        return writer.close()
+
+    def _assert_digests(self, index_file):
+        data = open(os.path.join(self.working_dir, index_file.path), 'rb').read()
+        self.assertEqual(index_file.size, len(data))
+        for algorithm in ('md5', 'sha1', 'sha256'):
+            self.assertEqual(index_file.digests[algorithm],
+                             hashlib.new(algorithm, data).hexdigest())
+
+    def test_write(self):
+        index_file = self._write()
+
+        self.assertEqual(index_file.path, 'main/binary-amd64/Packages')
+        self._assert_digests(index_file)
+
+        path = os.path.join(self.working_dir, index_file.path)
+        names = [p['Package'] for p in Packages.iter_paragraphs(open(path))]
+        self.assertEqual(names, ['libdaemon0', 'libdaemon-dev'])
+
+    def test_compress_indexes(self):
+        index_file = self._write()
+        extensions = ['.gz', '.bz2'] + (['.xz'] if utils.lzma is not None else [])
+
+        files, timings = metadata.compress_indexes(self.working_dir, [index_file.path],
+                                                   extensions)
+
+        self.assertEqual(sorted(timings), sorted(extensions))
+        self.assertEqual([f.path for f in files[index_file.path]],
+                         [index_file.path + e for e in extensions])
+
+        plain = open(os.path.join(self.working_dir, index_file.path), 'rb').read()
+        for compressed in files[index_file.path]:
+            self._assert_digests(compressed)
+            self.assertEqual(utils._read(os.path.join(self.working_dir, compressed.path),
+                                         as_list=False), plain)
+
+    def test_compress_indexes_pool(self):
+        paths = []
+        for arch in ('amd64', 'i386', 'armhf'):
+            writer = metadata.IndexWriter(self.working_dir, 'main/binary-%s/Packages' % arch)
+            writer.write(metadata.format_paragraph(dict(BINARY, architecture=arch)))
+            paths.append(writer.close().path)
+
+        serial, timings = metadata.compress_indexes(self.working_dir, paths, ['.gz', '.bz2'])
+        pooled, timings = metadata.compress_indexes(self.working_dir, paths, ['.gz', '.bz2'],
+                                                    workers=3)
+
+        for path in paths:
+            self.assertEqual([f.digests for f in pooled[path]],
+                             [f.digests for f in serial[path]])
+
+    def test_compressions(self):
+        compressions = metadata.compressions()
+
+        self.assertTrue('.gz' in compressions)
+        self.assertEqual('.xz' in compressions, utils.lzma is not None)
+
+    def test_write_release(self):
+        index_file = self._write()
+        compressed, timings = metadata.compress_indexes(self.working_dir, [index_file.path],
+                                                        ['.gz'])
+        files = [index_file] + compressed[index_file.path]
+
+        path = os.path.join(self.working_dir, 'Release')
+        metadata.write_release(path, [('Suite', 'stable'), ('Components', 'main')], files)
+
+        release = Release(open(path))
+        self.assertEqual(release['Suite'], 'stable')
+        self.assertTrue('Date' in release)
+        listed = dict([(f['name'], f) for f in release['SHA256']])
+        self.assertEqual(sorted(listed), ['main/binary-amd64/Packages',
+                                          'main/binary-amd64/Packages.gz'])
+        self.assertEqual(listed['main/binary-amd64/Packages']['sha256'], files[0].digests['sha256'])
+        self.assertEqual(int(listed['main/binary-amd64/Packages']['size']), files[0].size)
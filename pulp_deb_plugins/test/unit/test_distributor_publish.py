@@ -0,0 +1,529 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright © 2013 Bouvet ASA
+#
+# This software is licensed to you under the GNU General Public
+# License as published by the Free Software Foundation; either version
+# 2 of the License (GPLv2) or (at your option) any later version.
+# There is NO WARRANTY for this software, express or implied,
+# including the implied warranties of MERCHANTABILITY,
+# NON-INFRINGEMENT, or FITNESS FOR A PARTICULAR PURPOSE. You should
+# have received a copy of GPLv2 along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+
+
+import errno
+import os
+import shutil
+import tempfile
+import unittest
+
+import mock
+from debian.deb822 import Packages, Release, Sources
+from pulp.plugins.config import PluginCallConfiguration
+
+from pulp_deb.common import constants, utils
+from pulp_deb.plugins.distributors import metadata, publish
+
+
+def _unit(storage_dir, name, arch, component='main', **metadata):
+    filename = 'pool/%s/%s/%s/%s_1.0_%s.deb' % (component, name[0], name, name, arch)
+    storage_path = os.path.join(storage_dir, os.path.basename(filename))
+    open(storage_path, 'w').write(name)
+
+    metadata.update({'architecture': arch, 'filename': filename, 'size': '4'})
+    unit_key = {'package': name, 'version': '1.0', 'maintainer': 'Someone <a@b.c>'}
+    return mock.Mock(unit_key=unit_key, metadata=metadata, storage_path=storage_path)
+
+
+class PackagePublishRunTests(unittest.TestCase):
+    def setUp(self):
+        self.working_dir = tempfile.mkdtemp(prefix='publish-tests')
+        self.storage_dir = os.path.join(self.working_dir, 'storage')
+        self.http_dir = os.path.join(self.working_dir, 'http')
+        os.makedirs(self.storage_dir)
+
+        self.units = [
+            _unit(self.storage_dir, 'foo', 'amd64'),
+            _unit(self.storage_dir, 'foo', 'i386'),
+            _unit(self.storage_dir, 'bar', 'all'),
+            _unit(self.storage_dir, 'baz', 'amd64', component='contrib'),
+        ]
+        source = mock.Mock(storage_path='',
+                           unit_key={'package': 'foo', 'version': '1.0', 'maintainer': 'x'},
+                           metadata={'binary': 'foo', 'directory': 'pool/main/f/foo',
+                                     'architecture': 'any'})
+        self.units.append(source)
+
+        self.repo = mock.Mock(id='test-repo', working_dir=self.working_dir)
+        self.conduit = mock.Mock()
+        self.conduit.get_repo_scratchpad.return_value = {}
+        self.conduit.get_units.side_effect = lambda **kw: iter(self.units)
+        self.config = PluginCallConfiguration({}, {
+            constants.CONFIG_HTTP_DIR: self.http_dir,
+            constants.CONFIG_PUBLISH_DIST: 'precise',
+        })
+
+        self.run = publish.PackagePublishRun(self.repo, self.conduit, self.config)
+
+    def tearDown(self):
+        shutil.rmtree(self.working_dir)
+
+    def _dist_dir(self):
+        return self.run.dist_dir(self.run.current_dir())
+
+    def _packages(self, path):
+        index = open(os.path.join(self._dist_dir(), path))
+        return sorted([(p['Package'], p['Architecture']) for p in Packages.iter_paragraphs(index)])
+
+    def test_perform_publish(self):
+        self.run.perform_publish()
+
+        report = self.run.progress_report
+        self.assertEqual(report.packages_state, constants.STATE_SUCCESS)
+        self.assertEqual(report.metadata_state, constants.STATE_SUCCESS)
+        self.assertEqual(report.publish_http, constants.STATE_SUCCESS)
+        self.assertEqual(report.publish_https, constants.STATE_SKIPPED)
+        self.assertEqual(report.packages_finished_count, 5)
+
+        self.assertEqual(self._packages('main/binary-amd64/Packages'),
+                         [('bar', 'all'), ('foo', 'amd64')])
+        self.assertEqual(self._packages('main/binary-i386/Packages'),
+                         [('bar', 'all'), ('foo', 'i386')])
+        self.assertEqual(self._packages('contrib/binary-i386/Packages'), [])
+
+        sources = open(os.path.join(self._dist_dir(), 'main/source/Sources'))
+        self.assertEqual([s['Package'] for s in Sources.iter_paragraphs(sources)], ['foo'])
+
+        release = Release(open(os.path.join(self._dist_dir(), 'Release')))
+        self.assertEqual(release['Codename'], 'precise')
+        self.assertEqual(release['Components'], 'contrib main')
+        self.assertEqual(release['Architectures'], 'amd64 i386')
+        self.assertEqual(len(release['SHA256']), 6 * (1 + len(metadata.compressions())))
+
+    def test_pool_symlinks(self):
+        self.run.perform_publish()
+
+        for unit in self.units[:-1]:
+            path = os.path.join(self.run.current_dir(), unit.metadata['filename'])
+            self.assertTrue(os.path.islink(path))
+            self.assertEqual(os.readlink(path), unit.storage_path)
+
+    def test_publish_http(self):
+        self.run.perform_publish()
+
+        published = os.path.join(self.http_dir, self.repo.id)
+        self.assertEqual(os.readlink(published), self.run.current_dir())
+        self.assertTrue(os.path.exists(os.path.join(published, 'dists/precise/Release')))
+
+        # Turning HTTP off removes the published repository again
+        self.config.repo_plugin_config[constants.CONFIG_SERVE_HTTP] = 'false'
+        publish.PackagePublishRun(self.repo, self.conduit, self.config).perform_publish()
+        self.assertFalse(os.path.lexists(published))
+
+    def test_generations(self):
+        self.run.perform_publish()
+        first = os.path.realpath(self.run.current_dir())
+        self.assertEqual(first, self.run.build_dir())
+
+        second = publish.PackagePublishRun(self.repo, self.conduit, self.config)
+        second.generation = self.run.generation + '1'
+        second.perform_publish()
+
+        # The new generation is swapped in and the old one removed
+        self.assertEqual(os.path.realpath(self.run.current_dir()), second.build_dir())
+        self.assertFalse(os.path.exists(first))
+        self.assertEqual(sorted(os.listdir(os.path.dirname(first))),
+                         sorted([publish.CURRENT_LINK, second.generation]))
+
+    def test_failed_metadata_keeps_current(self):
+        self.run.perform_publish()
+        published = os.path.realpath(self.run.current_dir())
+
+        failing = publish.PackagePublishRun(self.repo, self.conduit, self.config)
+        failing.generation = self.run.generation + '1'
+        with mock.patch.object(publish.metadata, 'write_release', side_effect=IOError()):
+            failing.perform_publish()
+
+        self.assertEqual(failing.progress_report.metadata_state, constants.STATE_FAILED)
+        self.assertEqual(os.path.realpath(self.run.current_dir()), published)
+        self.assertFalse(os.path.exists(failing.build_dir()))
+
+    def test_failed_activation_keeps_generation(self):
+        with mock.patch.object(self.run, '_save_state', side_effect=IOError()):
+            self.run.perform_publish()
+
+        self.assertEqual(self.run.progress_report.metadata_state, constants.STATE_FAILED)
+        self.assertEqual(os.path.realpath(self.run.current_dir()), self.run.build_dir())
+
+    def test_hardlink_pool(self):
+        self.config.repo_plugin_config[constants.CONFIG_POOL_LINK] = constants.POOL_LINK_HARDLINK
+        self.run = publish.PackagePublishRun(self.repo, self.conduit, self.config)
+        self.run.perform_publish()
+
+        for unit in self.units[:-1]:
+            path = os.path.join(self.run.current_dir(), unit.metadata['filename'])
+            self.assertFalse(os.path.islink(path))
+            self.assertEqual(os.stat(path).st_ino, os.stat(unit.storage_path).st_ino)
+
+    def test_hardlink_fallback(self):
+        self.config.repo_plugin_config[constants.CONFIG_POOL_LINK] = constants.POOL_LINK_HARDLINK
+        self.run = publish.PackagePublishRun(self.repo, self.conduit, self.config)
+        with mock.patch.object(publish.os, 'link', side_effect=OSError(errno.EXDEV, 'xdev')):
+            self.run.perform_publish()
+
+        path = os.path.join(self.run.current_dir(), self.units[0].metadata['filename'])
+        self.assertTrue(os.path.islink(path))
+        self.assertEqual(self.run.progress_report.packages_error_count, 0)
+
+    def test_failed_package(self):
+        with mock.patch.object(publish.os, 'symlink', side_effect=OSError('denied')):
+            self.run._prepare_build_dir()
+            self.run._link_packages()
+
+        report = self.run.progress_report
+        self.assertEqual(report.packages_state, constants.STATE_SUCCESS)
+        self.assertEqual(report.packages_error_count, 4)
+        self.assertTrue('foo-1.0-Someone <a@b.c>' in report.packages_individual_errors)
+
+    def test_missing_package_file(self):
+        os.remove(self.units[1].storage_path)
+
+        self.run.perform_publish()
+
+        report = self.run.progress_report
+        self.assertEqual(report.packages_error_count, 1)
+        self.assertEqual(report.packages_finished_count, 4)
+        self.assertFalse(os.path.exists(os.path.join(self._dist_dir(), 'main/binary-i386')))
+        self.assertEqual(self._packages('main/binary-amd64/Packages'),
+                         [('bar', 'all'), ('foo', 'amd64')])
+
+    def test_failed_package_not_indexed(self):
+        failing = self.units[1].storage_path
+        symlink = os.symlink
+
+        def link(source, dest):
+            if source == failing:
+                raise OSError('denied')
+            symlink(source, dest)
+
+        with mock.patch.object(publish.os, 'symlink', side_effect=link):
+            self.run.perform_publish()
+
+        self.assertEqual(self.run.progress_report.packages_error_count, 1)
+        self.assertEqual(self._packages('main/binary-amd64/Packages'),
+                         [('bar', 'all'), ('foo', 'amd64')])
+        self.assertFalse(os.path.exists(os.path.join(self._dist_dir(), 'main/binary-i386')))
+        release = Release(open(os.path.join(self._dist_dir(), 'Release')))
+        self.assertEqual(release['Architectures'], 'amd64')
+
+
+class IncrementalPublishTests(PackagePublishRunTests):
+    def setUp(self):
+        super(IncrementalPublishTests, self).setUp()
+        self.config.repo_plugin_config[constants.CONFIG_INCREMENTAL_PUBLISH] = 'true'
+
+    def _publish(self):
+        run = publish.PackagePublishRun(self.repo, self.conduit, self.config)
+        with mock.patch.object(publish.metadata, 'IndexWriter',
+                               wraps=publish.metadata.IndexWriter) as writer:
+            run.perform_publish()
+        self.assertEqual(run.progress_report.metadata_state, constants.STATE_SUCCESS)
+        return sorted([c[0][1] for c in writer.call_args_list])
+
+    def _release_sha256(self):
+        release = Release(open(os.path.join(self._dist_dir(), 'Release')))
+        return dict([(f['name'], f['sha256']) for f in release['SHA256']])
+
+    def test_unchanged(self):
+        self.assertEqual(len(self._publish()), 6)
+        listed = self._release_sha256()
+
+        self.assertEqual(self._publish(), [])
+        self.assertEqual(self._release_sha256(), listed)
+
+    def test_changed_arch(self):
+        self._publish()
+        listed = self._release_sha256()
+
+        self.units.append(_unit(self.storage_dir, 'qux', 'i386'))
+        self.assertEqual(self._publish(), ['main/binary-i386/Packages'])
+
+        self.assertEqual(self._packages('main/binary-i386/Packages'),
+                         [('bar', 'all'), ('foo', 'i386'), ('qux', 'i386')])
+        changed = self._release_sha256()
+        self.assertNotEqual(changed['main/binary-i386/Packages'],
+                            listed['main/binary-i386/Packages'])
+        self.assertEqual(changed['main/binary-amd64/Packages.gz'],
+                         listed['main/binary-amd64/Packages.gz'])
+
+    def test_changed_arch_all(self):
+        self._publish()
+
+        self.units.append(_unit(self.storage_dir, 'qux', 'all', component='contrib'))
+        self.assertEqual(self._publish(), ['contrib/binary-amd64/Packages',
+                                           'contrib/binary-i386/Packages'])
+
+    def test_removed_arch(self):
+        self._publish()
+
+        self.units = [u for u in self.units if u.metadata['architecture'] != 'i386']
+        self.assertEqual(self._publish(), [])
+        self.assertFalse(os.path.exists(
+            os.path.join(self._dist_dir(), 'main/binary-i386/Packages.gz')))
+
+    def test_missing_index(self):
+        self._publish()
+
+        os.remove(os.path.join(self._dist_dir(), 'main/source/Sources.gz'))
+        self.assertEqual(self._publish(), ['main/source/Sources'])
+
+    def test_compression_times(self):
+        self.run.perform_publish()
+
+        timings = self.run.progress_report.metadata_compression_times
+        self.assertEqual(sorted(timings), sorted(metadata.compressions()))
+
+    def test_compression_added(self):
+        self._publish()
+
+        # Indexes missing a format that's now published are written again
+        with mock.patch.object(publish.metadata, 'compressions', return_value=['.gz', '.bz2']):
+            self.assertEqual(len(self._publish()), 6)
+            self.assertEqual(self._publish(), [])
+
+
+class ContentsTests(unittest.TestCase):
+    def setUp(self):
+        self.working_dir = tempfile.mkdtemp(prefix='contents-tests')
+        self.storage_dir = os.path.join(self.working_dir, 'storage')
+        os.makedirs(self.storage_dir)
+
+        self.units = [
+            _unit(self.storage_dir, 'foo', 'amd64', section='utils', sha256='aaa'),
+            _unit(self.storage_dir, 'foo', 'i386', section='utils', sha256='bbb'),
+            _unit(self.storage_dir, 'bar', 'all', section='doc', sha256='ccc'),
+        ]
+
+        self.repo = mock.Mock(id='test-repo', working_dir=self.working_dir)
+        self.conduit = mock.Mock()
+        self.conduit.get_repo_scratchpad.return_value = {}
+        self.conduit.get_units.side_effect = lambda **kw: iter(self.units)
+        self.config = PluginCallConfiguration({}, {
+            constants.CONFIG_HTTP_DIR: os.path.join(self.working_dir, 'http'),
+            constants.CONFIG_GENERATE_CONTENTS: 'true',
+            constants.CONFIG_CONTENTS_WORKERS: 1,
+            constants.CONFIG_INCREMENTAL_PUBLISH: 'true',
+        })
+
+        patcher = mock.patch.object(publish.contents.debfile, 'file_list',
+                                    side_effect=lambda path: ['usr/' + os.path.basename(path)])
+        self.file_list = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.working_dir)
+
+    def _publish(self):
+        run = publish.PackagePublishRun(self.repo, self.conduit, self.config)
+        run.perform_publish()
+        self.assertEqual(run.progress_report.metadata_state, constants.STATE_SUCCESS)
+        return run.dist_dir(run.current_dir())
+
+    def _contents(self, dist_dir, arch):
+        path = os.path.join(dist_dir, 'main/Contents-%s.gz' % arch)
+        return utils.open_index(path).read()
+
+    def test_contents(self):
+        dist_dir = self._publish()
+
+        self.assertEqual(self._contents(dist_dir, 'amd64'),
+                         'usr/bar_1.0_all.deb doc/bar\n'
+                         'usr/foo_1.0_amd64.deb utils/foo\n')
+        self.assertEqual(self._contents(dist_dir, 'i386'),
+                         'usr/bar_1.0_all.deb doc/bar\n'
+                         'usr/foo_1.0_i386.deb utils/foo\n')
+        self.assertFalse(os.path.exists(os.path.join(dist_dir, 'main/Contents-amd64')))
+
+        release = Release(open(os.path.join(dist_dir, 'Release')))
+        listed = [f['name'] for f in release['SHA256']]
+        self.assertTrue('main/Contents-amd64.gz' in listed)
+        self.assertFalse('main/Contents-amd64' in listed)
+
+    def test_cached_file_lists(self):
+        dist_dir = self._publish()
+        self.assertEqual(self.file_list.call_count, 3)
+        amd64 = os.stat(os.path.join(dist_dir, 'main/Contents-amd64.gz')).st_ino
+        i386 = os.stat(os.path.join(dist_dir, 'main/Contents-i386.gz')).st_ino
+
+        # Only the new package is read, and only the changed index written
+        self.units.append(_unit(self.storage_dir, 'qux', 'i386', sha256='ddd'))
+        dist_dir = self._publish()
+        self.assertEqual(self.file_list.call_count, 4)
+        self.assertEqual(os.stat(os.path.join(dist_dir, 'main/Contents-amd64.gz')).st_ino, amd64)
+        self.assertNotEqual(os.stat(os.path.join(dist_dir, 'main/Contents-i386.gz')).st_ino, i386)
+
+        self.assertTrue('usr/qux_1.0_i386.deb qux' in self._contents(dist_dir, 'i386'))
+        self.assertFalse('qux' in self._contents(dist_dir, 'amd64'))
+
+    def test_unreadable_package(self):
+        self.file_list.side_effect = publish.contents.debfile.InvalidDebFile('broken')
+
+        dist_dir = self._publish()
+
+        self.assertEqual(self._contents(dist_dir, 'amd64'), '')
+
+    def test_disabled(self):
+        self.config.repo_plugin_config[constants.CONFIG_GENERATE_CONTENTS] = 'false'
+
+        dist_dir = self._publish()
+
+        self.assertFalse(os.path.exists(os.path.join(dist_dir, 'main/Contents-amd64.gz')))
+        self.assertEqual(self.file_list.call_count, 0)
+
+
+class SyncedIndexesTests(unittest.TestCase):
+    def setUp(self):
+        self.working_dir = tempfile.mkdtemp(prefix='synced-tests')
+        self.storage_dir = os.path.join(self.working_dir, 'storage')
+        os.makedirs(self.storage_dir)
+
+        # As left by the importer
+        self.synced_dir = os.path.join(self.working_dir, 'importer', 'extra-indexes')
+        files = {}
+        for path, content in (('main/Contents-amd64.gz', 'contents'),
+                              ('main/i18n/Translation-en.bz2', 'translated')):
+            full_path = os.path.join(self.synced_dir, path)
+            os.makedirs(os.path.dirname(full_path))
+            open(full_path, 'w').write(content)
+            files[path] = {'path': path, 'size': len(content),
+                           'digests': {'md5': 'm', 'sha1': 's', 'sha256': path.replace('/', '')}}
+
+        self.units = [_unit(self.storage_dir, 'foo', 'amd64', sha256='aaa')]
+        self.repo = mock.Mock(id='test-repo', working_dir=self.working_dir)
+        self.conduit = mock.Mock()
+        self.conduit.get_units.side_effect = lambda **kw: iter(self.units)
+        self.conduit.get_repo_scratchpad.return_value = {
+            constants.SCRATCHPAD_EXTRA_INDEXES: {'root': self.synced_dir, 'files': files}}
+        self.config = PluginCallConfiguration({}, {
+            constants.CONFIG_HTTP_DIR: os.path.join(self.working_dir, 'http'),
+            constants.CONFIG_BY_HASH: 'false',
+        })
+
+    def tearDown(self):
+        shutil.rmtree(self.working_dir)
+
+    def _publish(self):
+        run = publish.PackagePublishRun(self.repo, self.conduit, self.config)
+        run.perform_publish()
+        self.assertEqual(run.progress_report.metadata_state, constants.STATE_SUCCESS)
+        dist_dir = run.dist_dir(run.current_dir())
+        release = Release(open(os.path.join(dist_dir, 'Release')))
+        return dist_dir, dict([(f['name'], f['sha256']) for f in release['SHA256']])
+
+    def test_published_verbatim(self):
+        dist_dir, listed = self._publish()
+
+        path = os.path.join(dist_dir, 'main/i18n/Translation-en.bz2')
+        self.assertEqual(open(path).read(), 'translated')
+        self.assertEqual(listed['main/i18n/Translation-en.bz2'], 'maini18nTranslation-en.bz2')
+        self.assertEqual(listed['main/Contents-amd64.gz'], 'mainContents-amd64.gz')
+
+    def test_generated_contents_preferred(self):
+        self.config.repo_plugin_config[constants.CONFIG_GENERATE_CONTENTS] = 'true'
+        self.config.repo_plugin_config[constants.CONFIG_CONTENTS_WORKERS] = 1
+
+        with mock.patch.object(publish.contents.debfile, 'file_list', return_value=['usr/foo']):
+            dist_dir, listed = self._publish()
+
+        self.assertNotEqual(listed['main/Contents-amd64.gz'], 'mainContents-amd64.gz')
+        self.assertTrue('main/i18n/Translation-en.bz2' in listed)
+
+    def test_missing_synced_index(self):
+        os.remove(os.path.join(self.synced_dir, 'main/i18n/Translation-en.bz2'))
+
+        dist_dir, listed = self._publish()
+
+        self.assertFalse('main/i18n/Translation-en.bz2' in listed)
+
+
+class ByHashTests(unittest.TestCase):
+    def setUp(self):
+        self.working_dir = tempfile.mkdtemp(prefix='by-hash-tests')
+        self.storage_dir = os.path.join(self.working_dir, 'storage')
+        os.makedirs(self.storage_dir)
+
+        self.units = [_unit(self.storage_dir, 'foo', 'amd64')]
+        self.repo = mock.Mock(id='test-repo', working_dir=self.working_dir)
+        self.conduit = mock.Mock()
+        self.conduit.get_repo_scratchpad.return_value = {}
+        self.conduit.get_units.side_effect = lambda **kw: iter(self.units)
+        self.config = PluginCallConfiguration({}, {
+            constants.CONFIG_HTTP_DIR: os.path.join(self.working_dir, 'http'),
+            constants.CONFIG_BY_HASH_GENERATIONS: 1,
+            constants.CONFIG_BY_HASH_GRACE: 0,
+        })
+        self.generation = 0
+
+    def tearDown(self):
+        shutil.rmtree(self.working_dir)
+
+    def _publish(self):
+        run = publish.PackagePublishRun(self.repo, self.conduit, self.config)
+        # Generations published within the same microsecond would collide
+        self.generation += 1
+        run.generation = '%06d' % self.generation
+        run.perform_publish()
+        self.assertEqual(run.progress_report.metadata_state, constants.STATE_SUCCESS)
+        return run.dist_dir(run.current_dir())
+
+    def _by_hash(self, dist_dir):
+        by_hash = os.path.join(dist_dir, 'main/binary-amd64/by-hash/SHA256')
+        return sorted(os.listdir(by_hash))
+
+    def _release(self, dist_dir):
+        return Release(open(os.path.join(dist_dir, 'Release')))
+
+    def test_by_hash(self):
+        dist_dir = self._publish()
+
+        release = self._release(dist_dir)
+        self.assertEqual(release['Acquire-By-Hash'], 'yes')
+
+        listed = [f for f in release['SHA256'] if f['name'].startswith('main/binary-amd64/')]
+        self.assertEqual(self._by_hash(dist_dir), sorted([f['sha256'] for f in listed]))
+        for f in listed:
+            by_hash = os.path.join(dist_dir, 'main/binary-amd64/by-hash/SHA256', f['sha256'])
+            self.assertEqual(open(by_hash).read(), open(os.path.join(dist_dir, f['name'])).read())
+
+    def test_previous_generations(self):
+        first = self._by_hash(self._publish())
+
+        self.units.append(_unit(self.storage_dir, 'bar', 'amd64'))
+        second = self._by_hash(self._publish())
+        self.assertEqual(len(second), 2 * len(first))
+        self.assertTrue(set(first) < set(second))
+
+        # Only one previous generation is kept
+        self.units.append(_unit(self.storage_dir, 'baz', 'amd64'))
+        third = self._by_hash(self._publish())
+        self.assertEqual(len(third), 2 * len(first))
+        self.assertFalse(set(first) & set(third))
+
+    def test_grace_period(self):
+        self.config.repo_plugin_config[constants.CONFIG_BY_HASH_GENERATIONS] = 0
+        self.config.repo_plugin_config[constants.CONFIG_BY_HASH_GRACE] = 3600
+
+        first = self._by_hash(self._publish())
+        for name in ('bar', 'baz'):
+            self.units.append(_unit(self.storage_dir, name, 'amd64'))
+            self._publish()
+
+        self.assertTrue(set(first) < set(self._by_hash(self._publish())))
+
+    def test_disabled(self):
+        self.config.repo_plugin_config[constants.CONFIG_BY_HASH] = 'false'
+        dist_dir = self._publish()
+
+        self.assertFalse('Acquire-By-Hash' in self._release(dist_dir))
+        self.assertFalse(os.path.exists(os.path.join(dist_dir, 'main/binary-amd64/by-hash')))
@@ -0,0 +1,211 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright © 2013 Bouvet ASA
+#
+# This software is licensed to you under the GNU General Public
+# License as published by the Free Software Foundation; either version
+# 2 of the License (GPLv2) or (at your option) any later version.
+# There is NO WARRANTY for this software, express or implied,
+# including the implied warranties of MERCHANTABILITY,
+# NON-INFRINGEMENT, or FITNESS FOR A PARTICULAR PURPOSE. You should
+# have received a copy of GPLv2 along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+
+
+import hashlib
+import os
+import shutil
+import subprocess
+import tempfile
+import unittest
+
+import mock
+from pulp.plugins.config import PluginCallConfiguration
+
+from pulp_deb.common import constants
+from pulp_deb.plugins.distributors import publish, signing
+
+
+class LocalSigner(signing.Signer):
+    """
+    Stand-in signer for tests, "signing" with the SHA256 of the Release file.
+    """
+
+    def __init__(self):
+        self.batches = []
+        self.closed = False
+
+    def sign(self, release_paths):
+        self.batches.append(list(release_paths))
+        for path in release_paths:
+            digest = hashlib.sha256(open(path, 'rb').read()).hexdigest()
+            detached, inline = signing.signature_paths(path)
+            open(detached, 'w').write(digest + '\n')
+            open(inline, 'w').write(open(path).read() + digest + '\n')
+
+    def close(self):
+        self.closed = True
+
+
+def _gpg_available():
+    try:
+        subprocess.Popen(['gpg', '--version'], stdout=subprocess.PIPE).communicate()
+    except OSError:
+        return False
+    return True
+
+
+class GetSignerTests(unittest.TestCase):
+    def test_unsigned(self):
+        self.assertEqual(signing.get_signer(PluginCallConfiguration({}, {})), None)
+
+    def test_signer(self):
+        config = PluginCallConfiguration({}, {constants.CONFIG_GPG_KEY: 'ABCD1234',
+                                              constants.CONFIG_GPG_HOME: '/var/lib/pulp/gnupg'})
+
+        signer = signing.get_signer(config)
+
+        self.assertTrue(isinstance(signer, signing.GpgSigner))
+        self.assertEqual(signer.key_id, 'ABCD1234')
+        self.assertEqual(signer.homedir, '/var/lib/pulp/gnupg')
+
+    def test_parse_sexp(self):
+        self.assertEqual(signing._parse_sexp('(7:sig-val(5:eddsa(1:r2:())(1:s1:\x00)))'),
+                         ['sig-val', ['eddsa', ['r', '()'], ['s', '\x00']]])
+        self.assertRaises(signing.SigningError, signing._parse_sexp, '(3:abc')
+
+    def test_mpi(self):
+        self.assertEqual(signing._mpi('\x00\x01\xff'), '\x00\x09\x01\xff')
+        self.assertEqual(signing._mpi('\x80'), '\x00\x08\x80')
+
+    def test_cleartext(self):
+        text = signing._cleartext('Suite: stable \n-x\n')
+
+        self.assertEqual(text, 'Suite: stable\n-x')
+        self.assertEqual(signing._dash_escape(text), 'Suite: stable\n- -x')
+
+    def test_signature_paths(self):
+        self.assertEqual(signing.signature_paths('/a/dists/stable/Release'),
+                         ('/a/dists/stable/Release.gpg', '/a/dists/stable/InRelease'))
+
+
+@unittest.skipUnless(_gpg_available(), 'gpg is not installed')
+class GpgSignerTests(unittest.TestCase):
+    def setUp(self):
+        self.working_dir = tempfile.mkdtemp(prefix='signing-tests')
+        self.homedir = os.path.join(self.working_dir, 'gnupg')
+        os.makedirs(self.homedir, 0700)
+        self.env = dict(os.environ, GNUPGHOME=self.homedir)
+
+        subprocess.check_call(['gpg', '--batch', '--passphrase', '', '--quick-gen-key',
+                               'Test Signer <signer@example.com>', 'ed25519', 'sign', 'never'],
+                              env=self.env, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+        self.releases = []
+        for dist in ('stable', 'testing'):
+            path = os.path.join(self.working_dir, 'dists', dist, 'Release')
+            os.makedirs(os.path.dirname(path))
+            open(path, 'w').write('Suite: %s\n' % dist)
+            self.releases.append(path)
+
+    def tearDown(self):
+        subprocess.call(['gpgconf', '--kill', 'gpg-agent'], env=self.env)
+        shutil.rmtree(self.working_dir)
+
+    def _verify(self, *args):
+        return subprocess.call(['gpg', '--batch', '--verify'] + list(args), env=self.env,
+                               stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+    def test_sign(self):
+        signer = signing.GpgSigner('signer@example.com', self.homedir)
+
+        try:
+            signer.sign(self.releases[:1])
+            agent = signer._agent
+            signer.sign(self.releases[1:])
+            # One connection to the agent signs everything
+            self.assertTrue(signer._agent is agent)
+        finally:
+            signer.close()
+        self.assertEqual(signer._agent, None)
+
+        for path in self.releases:
+            detached, inline = signing.signature_paths(path)
+            self.assertEqual(self._verify(detached, path), 0)
+            self.assertEqual(self._verify(inline), 0)
+            self.assertTrue(open(inline).read().startswith('-----BEGIN PGP SIGNED MESSAGE-----'))
+
+    def test_sign_rsa(self):
+        subprocess.check_call(['gpg', '--batch', '--passphrase', '', '--quick-gen-key',
+                               'RSA Signer <rsa@example.com>', 'rsa2048', 'sign', 'never'],
+                              env=self.env, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        signer = signing.GpgSigner('rsa@example.com', self.homedir)
+
+        try:
+            signer.sign(self.releases)
+        finally:
+            signer.close()
+
+        detached, inline = signing.signature_paths(self.releases[0])
+        self.assertEqual(self._verify(detached, self.releases[0]), 0)
+        self.assertEqual(self._verify(inline), 0)
+
+    def test_tampered(self):
+        signer = signing.GpgSigner('signer@example.com', self.homedir)
+        try:
+            signer.sign(self.releases)
+        finally:
+            signer.close()
+
+        open(self.releases[0], 'a').write('Label: other\n')
+        detached, inline = signing.signature_paths(self.releases[0])
+        self.assertNotEqual(self._verify(detached, self.releases[0]), 0)
+
+    def test_unknown_key(self):
+        signer = signing.GpgSigner('nobody@example.com', self.homedir)
+
+        self.assertRaises(signing.SigningError, signer.sign, self.releases)
+        signer.close()
+
+
+class PublishSigningTests(unittest.TestCase):
+    def setUp(self):
+        self.working_dir = tempfile.mkdtemp(prefix='signing-tests')
+        self.repo = mock.Mock(id='test-repo', working_dir=self.working_dir)
+        self.conduit = mock.Mock()
+        self.conduit.get_repo_scratchpad.return_value = {}
+        self.conduit.get_units.side_effect = lambda **kw: iter([])
+        self.config = PluginCallConfiguration({}, {
+            constants.CONFIG_HTTP_DIR: os.path.join(self.working_dir, 'http'),
+            constants.CONFIG_GPG_KEY: 'ABCD1234',
+        })
+        self.signer = LocalSigner()
+
+    def tearDown(self):
+        shutil.rmtree(self.working_dir)
+
+    def _publish(self):
+        run = publish.PackagePublishRun(self.repo, self.conduit, self.config)
+        with mock.patch.object(signing, 'get_signer', return_value=self.signer):
+            run.perform_publish()
+        return run
+
+    def test_signed(self):
+        run = self._publish()
+
+        self.assertEqual(run.progress_report.metadata_state, constants.STATE_SUCCESS)
+        release = os.path.join(run.dist_dir(run.current_dir()), 'Release')
+        self.assertEqual(self.signer.batches, [[os.path.join(run.dist_dir(), 'Release')]])
+        for path in signing.signature_paths(release):
+            self.assertTrue(os.path.exists(path))
+        self.assertTrue(self.signer.closed)
+
+    def test_signing_failed(self):
+        self.signer.sign = mock.Mock(side_effect=signing.SigningError('gpg failed'))
+
+        run = self._publish()
+
+        # The generation being served, if any, is kept
+        self.assertEqual(run.progress_report.metadata_state, constants.STATE_FAILED)
+        self.assertFalse(os.path.exists(run.current_dir()))
+        self.assertTrue(self.signer.closed)
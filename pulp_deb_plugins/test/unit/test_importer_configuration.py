@@ -82,6 +82,206 @@ class RemoveMissingTests(unittest.TestCase):
         self.assertTrue(constants.CONFIG_REMOVE_MISSING in msg)
 
 
+class QueriesTests(unittest.TestCase):
+    def test_validate_queries(self):
+        config = PluginCallConfiguration({constants.CONFIG_QUERIES: ['name=lib*']}, {})
+        result, msg = configuration._validate_queries(config)
+
+        self.assertTrue(result)
+        self.assertTrue(msg is None)
+
+    def test_validate_queries_not_list(self):
+        config = PluginCallConfiguration({constants.CONFIG_QUERIES: 'name=lib*'}, {})
+        result, msg = configuration._validate_queries(config)
+
+        self.assertTrue(not result)
+        self.assertTrue(constants.CONFIG_QUERIES in msg)
+
+    def test_validate_queries_unparsable(self):
+        config = PluginCallConfiguration({constants.CONFIG_QUERIES: ['name~(']}, {})
+        result, msg = configuration._validate_queries(config)
+
+        self.assertTrue(not result)
+        self.assertTrue('name~(' in msg)
+
+    def test_validate_queries_bad_version(self):
+        config = PluginCallConfiguration({constants.CONFIG_QUERIES: ['version>=a!!b']}, {})
+        result, msg = configuration._validate_queries(config)
+
+        self.assertTrue(not result)
+        self.assertTrue('version>=a!!b' in msg)
+
+    def test_validate_queries_not_strings(self):
+        config = PluginCallConfiguration({constants.CONFIG_QUERIES: [42]}, {})
+        result, msg = configuration._validate_queries(config)
+
+        self.assertTrue(not result)
+        self.assertTrue('42' in msg)
+
+
+class RetainVersionsTests(unittest.TestCase):
+    def test_validate_retain_versions(self):
+        config = PluginCallConfiguration({constants.CONFIG_RETAIN_VERSIONS: '2'}, {})
+        result, msg = configuration._validate_retain_versions(config)
+
+        self.assertTrue(result)
+        self.assertTrue(msg is None)
+
+    def test_validate_retain_versions_missing(self):
+        config = PluginCallConfiguration({}, {})
+        result, msg = configuration._validate_retain_versions(config)
+
+        self.assertTrue(result)
+        self.assertTrue(msg is None)
+
+    def test_validate_retain_versions_invalid(self):
+        for value in ('foo', '-1'):
+            config = PluginCallConfiguration({constants.CONFIG_RETAIN_VERSIONS: value}, {})
+            result, msg = configuration._validate_retain_versions(config)
+
+            self.assertTrue(not result)
+            self.assertTrue(constants.CONFIG_RETAIN_VERSIONS in msg)
+
+
+class IndexCacheSizeTests(unittest.TestCase):
+    def test_validate_index_cache_size(self):
+        config = PluginCallConfiguration({constants.CONFIG_INDEX_CACHE_SIZE: '0'}, {})
+        result, msg = configuration._validate_index_cache_size(config)
+
+        self.assertTrue(result)
+        self.assertTrue(msg is None)
+
+    def test_validate_index_cache_size_invalid(self):
+        config = PluginCallConfiguration({constants.CONFIG_INDEX_CACHE_SIZE: 'big'}, {})
+        result, msg = configuration._validate_index_cache_size(config)
+
+        self.assertTrue(not result)
+        self.assertTrue(constants.CONFIG_INDEX_CACHE_SIZE in msg)
+
+
+class IndexCompressionTests(unittest.TestCase):
+    def test_validate_index_compression(self):
+        config = PluginCallConfiguration({constants.CONFIG_INDEX_COMPRESSION: 'cpu'}, {})
+        result, msg = configuration._validate_index_compression(config)
+
+        self.assertTrue(result)
+        self.assertTrue(msg is None)
+
+    def test_validate_index_compression_invalid(self):
+        config = PluginCallConfiguration({constants.CONFIG_INDEX_COMPRESSION: 'xz'}, {})
+        result, msg = configuration._validate_index_compression(config)
+
+        self.assertTrue(not result)
+        self.assertTrue(constants.CONFIG_INDEX_COMPRESSION in msg)
+
+
+class ExtraIndexesTests(unittest.TestCase):
+    def test_validate_extra_indexes(self):
+        config = PluginCallConfiguration({constants.CONFIG_EXTRA_INDEXES: ['translation']}, {})
+        result, msg = configuration._validate_extra_indexes(config)
+
+        self.assertTrue(result)
+        self.assertTrue(msg is None)
+
+    def test_validate_extra_indexes_invalid(self):
+        config = PluginCallConfiguration({constants.CONFIG_EXTRA_INDEXES: ['changelogs']}, {})
+        result, msg = configuration._validate_extra_indexes(config)
+
+        self.assertTrue(not result)
+        self.assertTrue(constants.CONFIG_EXTRA_INDEXES in msg)
+
+
+class UploadWorkersTests(unittest.TestCase):
+    def test_validate_upload_workers(self):
+        config = PluginCallConfiguration({constants.CONFIG_UPLOAD_WORKERS: 4}, {})
+        result, msg = configuration._validate_upload_workers(config)
+
+        self.assertTrue(result)
+        self.assertTrue(msg is None)
+
+    def test_validate_upload_workers_invalid(self):
+        config = PluginCallConfiguration({constants.CONFIG_UPLOAD_WORKERS: -1}, {})
+        result, msg = configuration._validate_upload_workers(config)
+
+        self.assertTrue(not result)
+        self.assertTrue(constants.CONFIG_UPLOAD_WORKERS in msg)
+
+
+class MaxDownloadsTests(unittest.TestCase):
+    def test_validate_max_downloads(self):
+        config = PluginCallConfiguration({constants.CONFIG_MAX_DOWNLOADS: 4}, {})
+        result, msg = configuration._validate_max_downloads(config)
+
+        self.assertTrue(result)
+        self.assertTrue(msg is None)
+
+    def test_validate_max_downloads_invalid(self):
+        config = PluginCallConfiguration({constants.CONFIG_MAX_DOWNLOADS: 0}, {})
+        result, msg = configuration._validate_max_downloads(config)
+
+        self.assertTrue(not result)
+        self.assertTrue(constants.CONFIG_MAX_DOWNLOADS in msg)
+
+
+class ProfileTests(unittest.TestCase):
+    def test_validate_profile_sync(self):
+        config = PluginCallConfiguration({constants.CONFIG_PROFILE_SYNC: 'true'}, {})
+        result, msg = configuration._validate_profile_sync(config)
+
+        self.assertTrue(result)
+        self.assertTrue(msg is None)
+
+    def test_validate_profile_sync_invalid(self):
+        config = PluginCallConfiguration({constants.CONFIG_PROFILE_SYNC: 'sometimes'}, {})
+        result, msg = configuration._validate_profile_sync(config)
+
+        self.assertTrue(not result)
+        self.assertTrue(constants.CONFIG_PROFILE_SYNC in msg)
+
+    def test_validate_profile_hotspots_invalid(self):
+        config = PluginCallConfiguration({constants.CONFIG_PROFILE_HOTSPOTS: -1}, {})
+        result, msg = configuration._validate_profile_hotspots(config)
+
+        self.assertTrue(not result)
+        self.assertTrue(constants.CONFIG_PROFILE_HOTSPOTS in msg)
+
+
+class LocalPlacementTests(unittest.TestCase):
+    def test_validate_local_placement(self):
+        config = PluginCallConfiguration({constants.CONFIG_LOCAL_PLACEMENT: 'reflink'}, {})
+        result, msg = configuration._validate_local_placement(config)
+
+        self.assertTrue(result)
+        self.assertTrue(msg is None)
+
+    def test_validate_local_placement_invalid(self):
+        config = PluginCallConfiguration({constants.CONFIG_LOCAL_PLACEMENT: 'symlink'}, {})
+        result, msg = configuration._validate_local_placement(config)
+
+        self.assertTrue(not result)
+        self.assertTrue(constants.CONFIG_LOCAL_PLACEMENT in msg)
+
+
+class LocalWorkersTests(unittest.TestCase):
+    def test_validate_local_workers(self):
+        config = PluginCallConfiguration({constants.CONFIG_LOCAL_WORKERS: 8,
+                                          constants.CONFIG_LOCAL_INFLIGHT_BYTES: 1024}, {})
+
+        self.assertEqual(configuration._validate_local_workers(config), (True, None))
+        self.assertEqual(configuration._validate_local_inflight_bytes(config), (True, None))
+
+    def test_validate_local_workers_invalid(self):
+        config = PluginCallConfiguration({constants.CONFIG_LOCAL_WORKERS: 0,
+                                          constants.CONFIG_LOCAL_INFLIGHT_BYTES: 'lots'}, {})
+
+        result, msg = configuration._validate_local_workers(config)
+        self.assertTrue(not result)
+        self.assertTrue(constants.CONFIG_LOCAL_WORKERS in msg)
+
+        result, msg = configuration._validate_local_inflight_bytes(config)
+        self.assertTrue(not result)
+        self.assertTrue(constants.CONFIG_LOCAL_INFLIGHT_BYTES in msg)
+
 class FullValidationTests(unittest.TestCase):
 
     @mock.patch('pulp_deb.plugins.importers.configuration._validate_resources')
@@ -13,6 +13,8 @@
 
 import unittest
 
+import mock
+
 from pulp_deb.plugins.importers.downloaders import factory
 from pulp_deb.plugins.importers.downloaders.exceptions import  UnsupportedURLType, InvalidURL
 from pulp_deb.plugins.importers.downloaders.local import LocalDownloader
@@ -46,3 +48,20 @@ class DownloadersFactoryTests(unittest.TestCase):
             self.fail()
         except UnsupportedURLType, e:
             self.assertEqual(e.url_type, 'jdob')
+
+    @mock.patch('stevedore.extension.ExtensionManager')
+    def test_namespace_scanned_once(self, mock_manager):
+        file_extension = mock.Mock()
+        file_extension.name = 'file'
+        file_extension.plugin = LocalDownloader
+        mock_manager.return_value = [file_extension]
+
+        factory._DRIVERS = None
+        try:
+            for i in range(3):
+                self.assertEqual(factory.get_url_type_downloader('file'), LocalDownloader)
+            self.assertRaises(UnsupportedURLType, factory.get_url_type_downloader, 'jdob')
+        finally:
+            factory._DRIVERS = None
+
+        mock_manager.assert_called_once_with(factory.NAMESPACE)
@@ -11,16 +11,21 @@
 # have received a copy of GPLv2 along with this software; if not, see
 # http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
 
+import BaseHTTPServer
 import os
 import pycurl
 import shutil
+import SimpleHTTPServer
+import SocketServer
 import tempfile
+import threading
 import unittest
 
 import mock
+from pulp.plugins.config import PluginCallConfiguration
 
 import base_downloader
-from pulp_deb.common import samples
+from pulp_deb.common import constants, samples
 from pulp_deb.plugins.importers.downloaders import exceptions
 from pulp_deb.plugins.importers.downloaders import web
 from pulp_deb.plugins.importers.downloaders.web import HttpDownloader
@@ -57,6 +62,31 @@ class HttpDownloaderTests(base_downloader.BaseDownloaderTests):
         self.assertEqual(self.mock_progress_report.query_total_count, 3)
         self.assertEqual(self.mock_progress_report.update_progress.call_count, 4)
 
+    @mock.patch('pycurl.Curl')
+    def test_download_resources_reuses_handle(self, mock_curl_constructor):
+        mock_curl = mock.MagicMock()
+        mock_curl.getinfo.return_value = 200
+        mock_curl_constructor.return_value = mock_curl
+
+        self.downloader.download_resources(self.dist.get_indexes(), self.mock_progress_report)
+        self.downloader.download_resources(self.dist.get_indexes(), self.mock_progress_report)
+
+        self.assertEqual(mock_curl_constructor.call_count, 1)
+        self.assertEqual(mock_curl.perform.call_count, 6)
+        self.assertEqual(mock_curl.close.call_count, 0)
+
+    @mock.patch('pycurl.Curl')
+    def test_close(self, mock_curl_constructor):
+        mock_curl = mock.MagicMock()
+        mock_curl.getinfo.return_value = 200
+        mock_curl_constructor.return_value = mock_curl
+
+        self.downloader.download_resources(self.dist.get_indexes(), self.mock_progress_report)
+        self.downloader.close()
+
+        self.assertEqual(mock_curl.close.call_count, 1)
+        self.assertEqual(self.downloader._curls, [])
+
     @mock.patch('pycurl.Curl')
     def test_download_resources_404(self, mock_curl_constructor):
         # Setup
@@ -200,6 +230,13 @@ class HttpDownloaderTests(base_downloader.BaseDownloaderTests):
         self.assertEqual(opts_by_key[pycurl.LOW_SPEED_LIMIT], 1000)
         self.assertEqual(opts_by_key[pycurl.LOW_SPEED_TIME], 5 * 60)
 
+    def test_download_filename(self):
+        name = web._download_filename(URL + '/dists/precise/main/binary-i386/Packages.xz')
+
+        self.assertEqual(name, 'ubuntu.uib.no_archive_dists_precise_main_binary-i386_Packages.xz')
+        self.assertNotEqual(name, web._download_filename(
+            URL + '/dists/precise/main/binary-amd64/Packages.xz'))
+
     def test_create_download_tmp_dir(self):
         # Test
         created = web._create_download_tmp_dir(self.working_dir)
@@ -209,6 +246,80 @@ class HttpDownloaderTests(base_downloader.BaseDownloaderTests):
         self.assertEqual(created, os.path.join(self.working_dir, web.DOWNLOAD_TMP_DIR))
 
 
+class ConcurrentDownloadTests(base_downloader.BaseDownloaderTests):
+    """
+    Downloads over several connections from a local HTTP server.
+    """
+
+    def setUp(self):
+        super(ConcurrentDownloadTests, self).setUp()
+        self.served_dir = os.path.join(self.working_dir, 'served')
+        os.makedirs(self.served_dir)
+        for i in range(10):
+            open(os.path.join(self.served_dir, 'file%d' % i), 'w').write('content %d\n' % i * 100)
+
+        served_dir = self.served_dir
+
+        class Handler(SimpleHTTPServer.SimpleHTTPRequestHandler):
+            def translate_path(self, path):
+                return os.path.join(served_dir, path.lstrip('/'))
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+        self.url = 'http://127.0.0.1:%d' % self.server.server_address[1]
+
+        self.config = PluginCallConfiguration({}, {constants.CONFIG_MAX_DOWNLOADS: 3})
+        self.downloader = HttpDownloader(self.repo, None, self.config, self.mock_cancelled_callback)
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        super(ConcurrentDownloadTests, self).tearDown()
+
+    def test_download_resources(self):
+        resources = [{'url': '%s/file%d' % (self.url, i)} for i in range(10)]
+
+        self.downloader.download_resources(resources, self.mock_progress_report)
+
+        for i, resource in enumerate(resources):
+            self.assertEqual(open(resource['path']).read(), 'content %d\n' % i * 100)
+        self.assertEqual(self.mock_progress_report.query_finished_count, 10)
+        self.assertEqual(len(self.downloader._curls), 3)
+
+    def test_download_resources_in_memory(self):
+        resources = [{'url': '%s/file%d' % (self.url, i)} for i in range(2)]
+
+        self.downloader.download_resources(resources, self.mock_progress_report, in_memory=True)
+
+        self.assertEqual(resources[1]['content'], ['content 1'] * 100 + [''])
+
+    def test_download_resources_404(self):
+        resources = [{'url': '%s/file%d' % (self.url, i)} for i in range(10)]
+        resources[4]['url'] += '_'
+
+        try:
+            self.downloader.download_resources(resources, self.mock_progress_report)
+            self.fail()
+        except exceptions.FileNotFoundException, e:
+            self.assertEqual(e.location, resources[4]['url'])
+
+        self.assertFalse('path' in resources[4])
+        # Nothing is started after the failure
+        self.assertFalse('path' in resources[9])
+        tmp_dir = os.path.join(self.working_dir, web.DOWNLOAD_TMP_DIR)
+        self.assertEqual(sorted(os.listdir(tmp_dir)),
+                         sorted([os.path.basename(r['path']) for r in resources if 'path' in r]))
+
+
+class ThreadingHTTPServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+
+
 class InMemoryDownloadedContentTests(unittest.TestCase):
     def test_update(self):
         # Setup
@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright © 2013 Bouvet ASA
+#
+# This software is licensed to you under the GNU General Public
+# License as published by the Free Software Foundation; either version
+# 2 of the License (GPLv2) or (at your option) any later version.
+# There is NO WARRANTY for this software, express or implied,
+# including the implied warranties of MERCHANTABILITY,
+# NON-INFRINGEMENT, or FITNESS FOR A PARTICULAR PURPOSE. You should
+# have received a copy of GPLv2 along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+
+import multiprocessing
+import threading
+import time
+import unittest
+
+import mock
+from pulp.plugins.config import PluginCallConfiguration
+
+from pulp_deb.common import constants
+from pulp_deb.plugins.importers import sync
+
+
+class ByteBudgetTests(unittest.TestCase):
+    def _acquire_in_thread(self, budget, size):
+        acquired = threading.Event()
+
+        def acquire():
+            budget.acquire(size)
+            acquired.set()
+
+        thread = threading.Thread(target=acquire)
+        thread.daemon = True
+        thread.start()
+        return acquired
+
+    def test_waits_for_room(self):
+        budget = sync._ByteBudget(100)
+        budget.acquire(60)
+
+        acquired = self._acquire_in_thread(budget, 60)
+        time.sleep(0.05)
+        self.assertFalse(acquired.is_set())
+
+        budget.release(60)
+        self.assertTrue(acquired.wait(5) or acquired.is_set())
+        self.assertEqual(budget.in_flight, 60)
+
+    def test_oversize_alone(self):
+        budget = sync._ByteBudget(100)
+
+        budget.acquire(500)
+        self.assertEqual(budget.in_flight, 500)
+
+        acquired = self._acquire_in_thread(budget, 1)
+        time.sleep(0.05)
+        self.assertFalse(acquired.is_set())
+
+        budget.release(500)
+        self.assertTrue(acquired.wait(5) or acquired.is_set())
+
+
+class ParseWorkersTests(unittest.TestCase):
+    def _parse_workers(self, config):
+        run = mock.Mock(config=PluginCallConfiguration({}, config))
+        return sync.PackageSyncRun._parse_workers.im_func(run)
+
+    def test_default(self):
+        self.assertEqual(self._parse_workers({}), constants.DEFAULT_PARSE_WORKERS)
+
+    def test_configured(self):
+        self.assertEqual(self._parse_workers({constants.CONFIG_PARSE_WORKERS: '3'}), 3)
+
+    def test_zero_per_cpu(self):
+        self.assertEqual(self._parse_workers({constants.CONFIG_PARSE_WORKERS: 0}),
+                         multiprocessing.cpu_count())
+
+
+class AddInBatchesTests(unittest.TestCase):
+    def setUp(self):
+        self.run = mock.MagicMock()
+        self.run._download_batch.side_effect = (
+            lambda downloader, resources: sync.PackageSyncRun._download_batch.im_func(
+                self.run, downloader, resources))
+        self.packages = []
+        for i in range(10):
+            package = mock.Mock()
+            package.get_resources.return_value = [{'url': 'http://x/%d.deb' % i}]
+            self.packages.append(package)
+
+    def _add_in_batches(self, concurrency):
+        downloader = mock.Mock()
+        downloader.concurrency.return_value = concurrency
+        sync.PackageSyncRun._add_in_batches.im_func(self.run, downloader, self.packages)
+        return downloader
+
+    def test_batches(self):
+        downloader = self._add_in_batches(2)
+
+        batches = [len(c[0][0]) for c in downloader.download_resources.call_args_list]
+        self.assertEqual(batches, [2 * sync.DOWNLOAD_BATCH_FACTOR, 2])
+        self.assertEqual(self.run._add_new_package.call_count, 10)
+        package, resources = self.run._add_new_package.call_args_list[3][0][1:]
+        self.assertTrue(package is self.packages[3])
+        self.assertEqual(resources, [{'url': 'http://x/3.deb'}])
+
+    def test_serial(self):
+        downloader = self._add_in_batches(1)
+
+        self.assertEqual(downloader.download_resources.call_count, 0)
+        self.assertEqual(self.run._add_new_package.call_count, 10)
+
+    def test_failed_batch(self):
+        self.run._add_new_package.side_effect = [None, IOError()] + [None] * 8
+        downloader = mock.Mock()
+        downloader.concurrency.return_value = 4
+        downloader.download_resources.side_effect = IOError()
+
+        sync.PackageSyncRun._add_in_batches.im_func(self.run, downloader, self.packages)
+
+        # Every package is still tried, and only the one failing is recorded
+        self.assertEqual(self.run._add_new_package.call_count, 10)
+        self.assertEqual(self.run._package_failed.call_count, 1)
+        self.assertTrue(self.run._package_failed.call_args[0][0] is self.packages[1])
+        self.assertEqual(self.run._package_added.call_count, 9)
+
+
+class UpdateDistTests(unittest.TestCase):
+    def setUp(self):
+        self.run = mock.MagicMock(config=PluginCallConfiguration({}, {}))
+        downloader = self.run._create_downloader.return_value
+        downloader.download_resources.return_value = [{'type': 'packages'},
+                                                      {'type': 'translation'}]
+        self.run._parse_resources.return_value = []
+
+    def test_success(self):
+        self.assertTrue(sync.PackageSyncRun._update_dist.im_func(self.run))
+        self.assertEqual(self.run.progress_report.metadata_state, constants.STATE_SUCCESS)
+        self.assertEqual(self.run._store_extra_indexes.call_args[0][0], [{'type': 'translation'}])
+
+    def test_extra_indexes_failed(self):
+        self.run._store_extra_indexes.side_effect = IOError()
+
+        self.assertFalse(sync.PackageSyncRun._update_dist.im_func(self.run))
+        self.assertEqual(self.run.progress_report.metadata_state, constants.STATE_FAILED)
+
+    def test_failure_stops_sync(self):
+        self.run._update_dist.return_value = False
+        self.run.dist.packages = [mock.Mock()]
+
+        with mock.patch.object(sync.profiling, 'get_profiler', return_value=None):
+            sync.PackageSyncRun.perform_sync.im_func(self.run)
+
+        self.assertEqual(self.run._import_packages.call_count, 0)
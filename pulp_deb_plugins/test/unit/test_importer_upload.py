@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright © 2013 Bouvet ASA
+#
+# This software is licensed to you under the GNU General Public
+# License as published by the Free Software Foundation; either version
+# 2 of the License (GPLv2) or (at your option) any later version.
+# There is NO WARRANTY for this software, express or implied,
+# including the implied warranties of MERCHANTABILITY,
+# NON-INFRINGEMENT, or FITNESS FOR A PARTICULAR PURPOSE. You should
+# have received a copy of GPLv2 along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+
+
+import os
+import shutil
+import StringIO
+import tarfile
+import tempfile
+import unittest
+
+import mock
+
+from pulp_deb.common import constants, debfile
+from pulp_deb.plugins.importers import upload
+
+
+CONTROL = """Package: libfoo1
+Source: foo (1.0-1)
+Version: 1:1.0-1
+Architecture: amd64
+Maintainer: Someone <someone@example.com>
+Section: libs
+Description: does things
+"""
+
+CHECKSUMS = {'size': 1234, 'md5sum': 'a' * 32, 'sha1': 'b' * 40, 'sha256': 'c' * 64}
+
+
+class HandleUploadedUnitTests(unittest.TestCase):
+    def setUp(self):
+        self.working_dir = tempfile.mkdtemp(prefix='upload-tests')
+        self.file_path = os.path.join(self.working_dir, 'upload')
+        open(self.file_path, 'w').write('deb')
+        self.storage_dir = os.path.join(self.working_dir, 'storage')
+
+        self.conduit = mock.Mock()
+        self.conduit.init_unit.side_effect = lambda type_id, key, metadata, path: mock.Mock(
+            type_id=type_id, unit_key=key, metadata=metadata,
+            storage_path=os.path.join(self.storage_dir, path))
+
+        patcher = mock.patch.object(debfile, 'inspect', return_value=(CONTROL, CHECKSUMS))
+        self.inspect = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.working_dir)
+
+    def _upload(self, unit_key=None, metadata=None):
+        upload.handle_uploaded_unit(mock.Mock(working_dir=self.working_dir), constants.TYPE_DEB,
+                                    unit_key or {}, metadata or {}, self.file_path, self.conduit)
+
+    def test_upload(self):
+        self._upload()
+
+        self.inspect.assert_called_once_with(self.file_path)
+        type_id, unit_key, metadata, relative_path = self.conduit.init_unit.call_args[0]
+        self.assertEqual(unit_key, {'package': 'libfoo1', 'version': '1:1.0-1',
+                                    'maintainer': 'Someone <someone@example.com>'})
+        self.assertEqual(relative_path, 'libf/libfoo1_1.0-1_amd64.deb')
+        self.assertEqual(metadata['architecture'], 'amd64')
+        self.assertEqual(metadata['sha256'], 'c' * 64)
+        self.assertEqual(metadata['size'], '1234')
+
+        unit = self.conduit.save_unit.call_args[0][0]
+        self.assertEqual(open(unit.storage_path).read(), 'deb')
+
+    def test_metadata_overrides_control(self):
+        self._upload(metadata={'section': 'oldlibs', 'sha256': 'forged'})
+
+        metadata = self.conduit.init_unit.call_args[0][2]
+        self.assertEqual(metadata['section'], 'oldlibs')
+        self.assertEqual(metadata['sha256'], 'c' * 64)
+
+    def test_metadata_keeps_unit_key(self):
+        self._upload(metadata={'Package': 'libbar1', 'version': '2.0', 'maintainer': 'Mallory',
+                               'architecture': 'i386'})
+
+        type_id, unit_key, metadata, relative_path = self.conduit.init_unit.call_args[0]
+        self.assertEqual(unit_key, {'package': 'libfoo1', 'version': '1:1.0-1',
+                                    'maintainer': 'Someone <someone@example.com>'})
+        self.assertEqual(metadata['architecture'], 'amd64')
+        self.assertEqual(relative_path, 'libf/libfoo1_1.0-1_amd64.deb')
+
+    def test_unit_key_mismatch(self):
+        self.assertRaises(ValueError, self._upload, unit_key={'package': 'libbar1'})
+        self.assertFalse(self.conduit.save_unit.called)
+
+    def test_not_deb(self):
+        self.inspect.side_effect = debfile.InvalidDebFile('not an ar archive')
+
+        self.assertRaises(ValueError, self._upload)
+        self.assertFalse(self.conduit.init_unit.called)
+
+    def test_wrong_type(self):
+        self.assertRaises(NotImplementedError, upload.handle_uploaded_unit, None, 'rpm',
+                          {}, {}, self.file_path, self.conduit)
+
+
+def _inspect(path):
+    """
+    Reads the fake packages of the bundle tests, holding "<name> <sha256>".
+    """
+    content = open(path).read()
+    if content == 'broken':
+        raise debfile.InvalidDebFile('not an ar archive')
+    name, digest = content.split()
+    control = 'Package: %s\nVersion: 1.0\nArchitecture: all\nMaintainer: me\n' % name
+    return control, dict(CHECKSUMS, sha256=digest)
+
+
+class HandleUploadedBundleTests(unittest.TestCase):
+    def setUp(self):
+        self.working_dir = tempfile.mkdtemp(prefix='upload-tests')
+        self.repo = mock.Mock(working_dir=os.path.join(self.working_dir, 'repo'))
+        os.makedirs(self.repo.working_dir)
+        self.storage_dir = os.path.join(self.working_dir, 'storage')
+
+        self.conduit = mock.Mock()
+        self.conduit.init_unit.side_effect = lambda type_id, key, metadata, path: mock.Mock(
+            type_id=type_id, unit_key=key, metadata=metadata,
+            storage_path=os.path.join(self.storage_dir, path))
+        self.conduit.get_units.return_value = [mock.Mock(metadata={'sha256': 'old'})]
+
+        patcher = mock.patch.object(debfile, 'inspect', side_effect=_inspect)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def tearDown(self):
+        shutil.rmtree(self.working_dir)
+
+    def _tarball(self, files):
+        path = os.path.join(self.working_dir, 'bundle.tar.gz')
+        tar = tarfile.open(path, 'w:gz')
+        for name, content in files:
+            info = tarfile.TarInfo(name)
+            info.size = len(content)
+            tar.addfile(info, StringIO.StringIO(content))
+        tar.close()
+        return path
+
+    def _saved(self):
+        return sorted(c[0][0].unit_key['package'] for c in self.conduit.save_unit.call_args_list)
+
+    def test_tarball(self):
+        path = self._tarball([('debs/foo.deb', 'foo aaa'), ('../bar.deb', 'bar bbb'),
+                              ('README', 'not a package')])
+
+        upload.handle_uploaded_unit(self.repo, constants.TYPE_DEB, {}, {}, path, self.conduit,
+                                    None)
+
+        self.assertEqual(self._saved(), ['bar', 'foo'])
+        for call in self.conduit.save_unit.call_args_list:
+            unit = call[0][0]
+            self.assertEqual(open(unit.storage_path).read().split()[0],
+                             unit.unit_key['package'])
+        # The extracted files are cleaned up
+        self.assertEqual(os.listdir(self.repo.working_dir), [])
+
+    def test_duplicates(self):
+        path = self._tarball([('foo.deb', 'foo aaa'), ('foo-again.deb', 'foo aaa'),
+                              ('present.deb', 'present old')])
+
+        summary = upload.handle_uploaded_bundle(self.repo, {}, path, self.conduit)
+
+        self.assertEqual(summary, {'added': 1, 'skipped': 2})
+        self.assertEqual(self._saved(), ['foo'])
+
+    def test_batches(self):
+        files = [('p%d.deb' % i, 'p%d %d' % (i, i)) for i in range(5)]
+
+        with mock.patch.object(upload, 'SAVE_BATCH_SIZE', 2):
+            summary = upload.handle_uploaded_bundle(self.repo, {}, self._tarball(files),
+                                                    self.conduit)
+
+        self.assertEqual(summary, {'added': 5, 'skipped': 0})
+        self.assertEqual(self.conduit.save_unit.call_count, 5)
+
+    def test_broken_package(self):
+        path = self._tarball([('foo.deb', 'foo aaa'), ('broken.deb', 'broken')])
+
+        self.assertRaises(ValueError, upload.handle_uploaded_bundle, self.repo, {}, path,
+                          self.conduit)
+
+        # The readable packages are still imported
+        self.assertEqual(self._saved(), ['foo'])
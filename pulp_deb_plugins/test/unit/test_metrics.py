@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright © 2013 Bouvet ASA
+#
+# This software is licensed to you under the GNU General Public
+# License as published by the Free Software Foundation; either version
+# 2 of the License (GPLv2) or (at your option) any later version.
+# There is NO WARRANTY for this software, express or implied,
+# including the implied warranties of MERCHANTABILITY,
+# NON-INFRINGEMENT, or FITNESS FOR A PARTICULAR PURPOSE. You should
+# have received a copy of GPLv2 along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+
+import os
+import shutil
+import socket
+import tempfile
+import unittest
+
+import mock
+from pulp.plugins.config import PluginCallConfiguration
+
+from pulp_deb.common import constants
+from pulp_deb.common.sync_progress import SyncProgressReport
+from pulp_deb.plugins import metrics
+
+
+class HistogramTests(unittest.TestCase):
+    def test_add(self):
+        histogram = metrics.Histogram((0.1, 1.0))
+        for value in (0.05, 0.1, 0.5, 2.0):
+            histogram.add(value)
+
+        self.assertEqual(histogram.to_dict(), {
+            'count': 4,
+            'total': 2.65,
+            'min': 0.05,
+            'max': 2.0,
+            'mean': 2.65 / 4,
+            'buckets': [[0.1, 2], [1.0, 1], [None, 1]],
+        })
+
+    def test_empty(self):
+        self.assertEqual(metrics.Histogram().to_dict()['mean'], None)
+
+
+class MetricsTests(unittest.TestCase):
+    def test_timer(self):
+        m = metrics.Metrics()
+
+        with m.timer('package.download') as timer:
+            timer.bytes = 100
+        with m.timer('package.download', bytes=50):
+            pass
+        m.count('packages.added', 2)
+
+        report = m.report()
+        self.assertEqual(report['timers']['package.download']['count'], 2)
+        self.assertEqual(report['timers']['package.download']['bytes'], 150)
+        self.assertTrue(report['timers']['package.download']['total'] >= 0)
+        self.assertEqual(report['counters'], {'packages.added': 2})
+
+    def test_timer_failing_block(self):
+        m = metrics.Metrics()
+
+        def fail():
+            with m.timer('package.verify'):
+                raise ValueError()
+        self.assertRaises(ValueError, fail)
+
+        self.assertEqual(m.report()['timers']['package.verify']['count'], 1)
+
+    def test_sink(self):
+        sink = mock.Mock()
+        m = metrics.Metrics(sink)
+
+        m.record('index.parse', 0.25, bytes=10)
+        m.count('index.cached')
+        m.close()
+
+        sink.timing.assert_called_once_with('pulp_deb.sync.index.parse', 0.25)
+        self.assertEqual(sink.count.call_args_list,
+                         [mock.call('pulp_deb.sync.index.parse.bytes', 10),
+                          mock.call('pulp_deb.sync.index.cached', 1)])
+        sink.close.assert_called_once_with()
+
+    def test_final_report(self):
+        m = metrics.Metrics()
+        m.count('packages.added')
+        progress_report = SyncProgressReport(mock.Mock())
+
+        progress_report.metrics = m.report()
+        progress_report.build_final_report()
+
+        details = progress_report.conduit.build_failure_report.call_args[0][1]
+        self.assertEqual(details['metrics']['counters'], {'packages.added': 1})
+
+
+class SinkTests(unittest.TestCase):
+    def setUp(self):
+        self.working_dir = tempfile.mkdtemp(prefix='metrics-tests')
+
+    def tearDown(self):
+        shutil.rmtree(self.working_dir)
+
+    def test_parse_sink_url(self):
+        self.assertEqual(metrics.parse_sink_url('statsd://localhost'),
+                         ('statsd', ('localhost', 8125)))
+        self.assertEqual(metrics.parse_sink_url('statsd://stats.example.com:9125'),
+                         ('statsd', ('stats.example.com', 9125)))
+        self.assertEqual(metrics.parse_sink_url('file:///var/log/metrics'),
+                         ('file', '/var/log/metrics'))
+        self.assertRaises(ValueError, metrics.parse_sink_url, 'http://localhost')
+
+    def test_get_sink(self):
+        self.assertEqual(metrics.get_sink(PluginCallConfiguration({}, {})), None)
+
+        path = os.path.join(self.working_dir, 'metrics')
+        config = PluginCallConfiguration({}, {constants.CONFIG_METRICS_SINK: 'file://' + path})
+        sink = metrics.get_sink(config)
+        self.assertTrue(isinstance(sink, metrics.FileSink))
+        self.assertEqual(sink.path, path)
+
+    def test_file_sink(self):
+        path = os.path.join(self.working_dir, 'metrics')
+        sink = metrics.FileSink(path)
+
+        sink.timing('index.parse', 0.0125)
+        sink.count('packages.added', 3)
+        sink.close()
+
+        self.assertEqual(open(path).read(), 'index.parse:12.500|ms\npackages.added:3|c\n')
+
+    def test_statsd_sink(self):
+        server = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        server.bind(('127.0.0.1', 0))
+        server.settimeout(5)
+        sink = metrics.StatsdSink('127.0.0.1', server.getsockname()[1])
+        try:
+            sink.count('packages.added', 1)
+
+            self.assertEqual(server.recv(1024), 'packages.added:1|c')
+        finally:
+            sink.close()
+            server.close()
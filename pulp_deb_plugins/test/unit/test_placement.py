@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright © 2013 Bouvet ASA
+#
+# This software is licensed to you under the GNU General Public
+# License as published by the Free Software Foundation; either version
+# 2 of the License (GPLv2) or (at your option) any later version.
+# There is NO WARRANTY for this software, express or implied,
+# including the implied warranties of MERCHANTABILITY,
+# NON-INFRINGEMENT, or FITNESS FOR A PARTICULAR PURPOSE. You should
+# have received a copy of GPLv2 along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+
+import errno
+import os
+import shutil
+import tempfile
+import unittest
+
+import mock
+
+from pulp_deb.common import constants
+from pulp_deb.plugins import placement
+
+
+class PlacerTests(unittest.TestCase):
+    def setUp(self):
+        self.working_dir = tempfile.mkdtemp(prefix='placement-tests')
+        self.source = os.path.join(self.working_dir, 'feed', 'foo_1.0_amd64.deb')
+        os.makedirs(os.path.dirname(self.source))
+        self.content = os.urandom(100000)
+        open(self.source, 'wb').write(self.content)
+        self.path = os.path.join(self.working_dir, 'storage', 'f', 'foo_1.0_amd64.deb')
+
+    def tearDown(self):
+        shutil.rmtree(self.working_dir)
+
+    def _same_file(self):
+        return os.stat(self.source).st_ino == os.stat(self.path).st_ino
+
+    def test_auto(self):
+        method = placement.Placer(constants.PLACEMENT_AUTO).place(self.source, self.path)
+
+        self.assertTrue(method in (placement.METHOD_REFLINK, placement.METHOD_HARDLINK))
+        self.assertEqual(open(self.path, 'rb').read(), self.content)
+        self.assertEqual(self._same_file(), method == placement.METHOD_HARDLINK)
+
+    def test_reflink_mode(self):
+        method = placement.Placer(constants.PLACEMENT_REFLINK).place(self.source, self.path)
+
+        self.assertTrue(method in (placement.METHOD_REFLINK, placement.METHOD_KERNEL_COPY,
+                                   placement.METHOD_COPY))
+        self.assertEqual(open(self.path, 'rb').read(), self.content)
+        self.assertFalse(self._same_file())
+
+    def test_copy_mode(self):
+        method = placement.Placer(constants.PLACEMENT_COPY).place(self.source, self.path)
+
+        self.assertEqual(method, placement.METHOD_COPY)
+        self.assertEqual(open(self.path, 'rb').read(), self.content)
+        self.assertFalse(self._same_file())
+
+    def test_replaces(self):
+        os.makedirs(os.path.dirname(self.path))
+        open(self.path, 'w').write('old')
+
+        placement.Placer(constants.PLACEMENT_COPY).place(self.source, self.path)
+
+        self.assertEqual(open(self.path, 'rb').read(), self.content)
+
+    def test_move(self):
+        method = placement.Placer().place(self.source, self.path, move=True)
+
+        self.assertEqual(method, placement.METHOD_RENAME)
+        self.assertEqual(open(self.path, 'rb').read(), self.content)
+        self.assertFalse(os.path.exists(self.source))
+
+    @mock.patch('os.rename', side_effect=OSError(errno.EXDEV, 'Invalid cross-device link'))
+    def test_move_across_devices(self, mock_rename):
+        method = placement.Placer(constants.PLACEMENT_COPY).place(self.source, self.path,
+                                                                   move=True)
+
+        self.assertEqual(method, placement.METHOD_COPY)
+        self.assertEqual(open(self.path, 'rb').read(), self.content)
+        self.assertFalse(os.path.exists(self.source))
+
+    def test_unsupported_remembered(self):
+        reflink = mock.Mock(side_effect=IOError(errno.EOPNOTSUPP, 'Operation not supported'))
+        hardlink = mock.Mock(side_effect=OSError(errno.EXDEV, 'Invalid cross-device link'))
+        placer = placement.Placer(constants.PLACEMENT_AUTO)
+
+        with mock.patch.dict(placement._METHODS, {placement.METHOD_REFLINK: reflink,
+                                                  placement.METHOD_HARDLINK: hardlink}):
+            for i in range(3):
+                method = placer.place(self.source, self.path)
+
+                self.assertTrue(method in (placement.METHOD_KERNEL_COPY, placement.METHOD_COPY))
+                self.assertEqual(open(self.path, 'rb').read(), self.content)
+
+        self.assertEqual(reflink.call_count, 1)
+        self.assertEqual(hardlink.call_count, 1)
+
+    def test_failure_raised(self):
+        reflink = mock.Mock(side_effect=IOError(errno.EIO, 'Input/output error'))
+        placer = placement.Placer(constants.PLACEMENT_AUTO)
+
+        with mock.patch.dict(placement._METHODS, {placement.METHOD_REFLINK: reflink}):
+            self.assertRaises(IOError, placer.place, self.source, self.path)
+
+    @unittest.skipIf(placement._libc_copy_file_range is None and placement._libc_sendfile is None,
+                     'the C library has neither copy_file_range nor sendfile')
+    def test_kernel_copy(self):
+        os.makedirs(os.path.dirname(self.path))
+
+        # Spans several calls
+        with mock.patch.object(placement, 'KERNEL_COPY_CHUNK', 30000):
+            placement._kernel_copy(self.source, self.path)
+
+        self.assertEqual(open(self.path, 'rb').read(), self.content)
+
+    @unittest.skipIf(placement._libc_sendfile is None, 'the C library has no sendfile')
+    def test_kernel_copy_sendfile(self):
+        os.makedirs(os.path.dirname(self.path))
+
+        with mock.patch.object(placement, '_libc_copy_file_range', None):
+            placement._kernel_copy(self.source, self.path)
+
+        self.assertEqual(open(self.path, 'rb').read(), self.content)
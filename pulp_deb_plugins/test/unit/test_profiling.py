@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright © 2013 Bouvet ASA
+#
+# This software is licensed to you under the GNU General Public
+# License as published by the Free Software Foundation; either version
+# 2 of the License (GPLv2) or (at your option) any later version.
+# There is NO WARRANTY for this software, express or implied,
+# including the implied warranties of MERCHANTABILITY,
+# NON-INFRINGEMENT, or FITNESS FOR A PARTICULAR PURPOSE. You should
+# have received a copy of GPLv2 along with this software; if not, see
+# http://www.gnu.org/licenses/old-licenses/gpl-2.0.txt.
+
+import os
+import pstats
+import shutil
+import tempfile
+import unittest
+
+import mock
+from pulp.plugins.config import PluginCallConfiguration
+
+from pulp_deb.common import constants
+from pulp_deb.common.sync_progress import SyncProgressReport
+from pulp_deb.plugins import profiling
+
+
+def busy(n):
+    return sum([i * i for i in range(n)])
+
+
+class GetProfilerTests(unittest.TestCase):
+    def test_disabled(self):
+        self.assertEqual(profiling.get_profiler(PluginCallConfiguration({}, {})), None)
+        config = PluginCallConfiguration({}, {constants.CONFIG_PROFILE_SYNC: 'false'})
+        self.assertEqual(profiling.get_profiler(config), None)
+
+    def test_enabled(self):
+        config = PluginCallConfiguration({}, {constants.CONFIG_PROFILE_SYNC: 'true',
+                                              constants.CONFIG_PROFILE_HOTSPOTS: 5})
+
+        profiler = profiling.get_profiler(config)
+
+        self.assertTrue(isinstance(profiler, profiling.Profiler))
+        self.assertEqual(profiler.count, 5)
+
+
+class ProfilerTests(unittest.TestCase):
+    def setUp(self):
+        self.working_dir = tempfile.mkdtemp(prefix='profiling-tests')
+
+    def tearDown(self):
+        shutil.rmtree(self.working_dir)
+
+    def _profile(self, count=3):
+        profiler = profiling.Profiler(count)
+        profiler.start()
+        for i in range(20):
+            busy(1000)
+        profiler.stop()
+        return profiler
+
+    def test_hotspots(self):
+        hotspots = self._profile().hotspots()
+
+        self.assertEqual(len(hotspots), 3)
+        own_times = [h['own_time'] for h in hotspots]
+        self.assertEqual(own_times, sorted(own_times, reverse=True))
+        busy_spots = [h for h in hotspots if h['function'].endswith('(busy)')]
+        self.assertEqual(len(busy_spots), 1)
+        self.assertEqual(busy_spots[0]['calls'], 20)
+        self.assertTrue(busy_spots[0]['cumulative_time'] >= busy_spots[0]['own_time'])
+
+    def test_report(self):
+        path = os.path.join(self.working_dir, profiling.PROFILE_FILENAME)
+
+        report = self._profile().report(path)
+
+        self.assertEqual(report['path'], path)
+        self.assertEqual(len(report['hotspots']), 3)
+        functions = [key[2] for key in pstats.Stats(path).stats]
+        self.assertTrue('busy' in functions)
+
+    def test_report_unwritable(self):
+        path = os.path.join(self.working_dir, 'missing', profiling.PROFILE_FILENAME)
+
+        report = self._profile().report(path)
+
+        self.assertEqual(report['path'], None)
+        self.assertEqual(len(report['hotspots']), 3)
+
+    def test_final_report(self):
+        progress_report = SyncProgressReport(mock.Mock())
+
+        progress_report.profile = self._profile().report(
+            os.path.join(self.working_dir, profiling.PROFILE_FILENAME))
+        progress_report.build_final_report()
+
+        details = progress_report.conduit.build_failure_report.call_args[0][1]
+        self.assertEqual(len(details['profile']['hotspots']), 3)